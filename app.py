@@ -1,25 +1,130 @@
 import os
 import re
-import requests
+import json
+import math
 import subprocess
 import hashlib
-from dotenv import load_dotenv
-from flask import Flask, request, render_template, jsonify, send_file
+import shutil
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from flask import Flask, Response, g, request, render_template, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
+from cache import AnalysisCache, content_key, stream_key
+from clip_store import ClipStore
+from config import ENV, ROOT, flag
+from cutter import ClipCutter
+from batch import RateLimiter, run_batch
+from bulk import make_workdir, merged_span, stream_clips_zip
+from keywords import KeywordTables
+import metrics
+from moments import MomentIndex
+from jobs import JobManager, QueueFull, run_with_progress
+from scoring import CachedScorer, make_scorer
+from subtitles import iter_subtitle_stream, parse_timestamp
+import transcripts
 
-load_dotenv()
+# numpy (with ranking and dedup), requests and the scorer backends are imported where
+# they are first used, so a cold start only pays for Flask
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output_clips'
+app.config['CACHE_PATH'] = ENV.get("CACHE_PATH", os.path.join('cache', 'analysis.sqlite3'))
+# Let the front server send clip files (X-Sendfile: Apache mod_xsendfile, lighttpd)
+app.config['USE_X_SENDFILE'] = flag(ENV.get("USE_X_SENDFILE"))
 
-# Create directories if they don't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+# output_clips/ and cache/ are created on first write (serverless file systems are read-only
+# outside /tmp)
 
-HF_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
+HF_TOKEN = ENV.get("HUGGINGFACE_API_TOKEN")
 HF_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+HF_BATCH_SIZE = int(ENV.get("HF_BATCH_SIZE") or "16")
+HF_MAX_WORKERS = int(ENV.get("HF_MAX_WORKERS") or "4")
+# Point scoring/transcripts at another endpoint (a proxy, or local stubs for load tests)
+HF_API_URL = ENV.get("HF_API_URL") or None
+YOUTUBE_BASE_URL = ENV.get("YOUTUBE_BASE_URL") or None
+SCORER_BACKEND = ENV.get("SCORER_BACKEND") or "remote"
+SCORER_THREADS = int(ENV.get("SCORER_THREADS") or "0") or None
+
+DOWNLOAD_WORKERS = int(ENV.get("DOWNLOAD_WORKERS") or "2")
+DOWNLOAD_QUEUE_SIZE = int(ENV.get("DOWNLOAD_QUEUE_SIZE") or "20")
+DOWNLOAD_TIMEOUT = int(ENV.get("DOWNLOAD_TIMEOUT") or "300")
+CUT_WORKERS = int(ENV.get("CUT_WORKERS") or os.cpu_count() or 2)
+# Relative paths are resolved against the app folder, not the working directory
+KEYWORDS_PATH = os.path.join(ROOT, ENV.get("KEYWORDS_PATH") or 'keywords.json')
+CLIP_CACHE_MAX_MB = int(ENV.get("CLIP_CACHE_MAX_MB") or "2048")
+CACHE_MAX_MB = int(ENV.get("CACHE_MAX_MB") or "256")
+CACHE_TTL_HOURS = float(ENV.get("CACHE_TTL_HOURS") or "168")
+BATCH_WORKERS = int(ENV.get("BATCH_WORKERS") or "4")
+BATCH_MAX_VIDEOS = int(ENV.get("BATCH_MAX_VIDEOS") or "500")
+TRANSCRIPT_RATE = float(ENV.get("TRANSCRIPT_RATE") or "2")
+TRANSCRIPT_RETRIES = int(ENV.get("TRANSCRIPT_RETRIES") or "4")
+PLAYLIST_TIMEOUT = int(ENV.get("PLAYLIST_TIMEOUT") or "120")
+# nginx internal location aliased to OUTPUT_FOLDER; clips are then sent with X-Accel-Redirect
+CLIP_ACCEL_PREFIX = ENV.get("CLIP_ACCEL_PREFIX", "")
+CLIP_MAX_AGE = int(ENV.get("CLIP_MAX_AGE") or "86400")
+# Captions at least this similar share one sentiment score (1 = exact repeats only)
+DEDUP_THRESHOLD = float(ENV.get("DEDUP_THRESHOLD") or "0.8")
+# Clips whose lines are more alike than this are dropped in favour of the better one
+CLIP_MAX_SIMILARITY = float(ENV.get("CLIP_MAX_SIMILARITY") or "0.5")
+# Share of a caption's value that comes from how lively the audio under it is (when there is audio)
+AUDIO_WEIGHT = float(ENV.get("AUDIO_WEIGHT") or "0.3")
+# Find clips in a video's audio when it has no transcript, instead of returning mock clips
+AUDIO_FALLBACK = flag(ENV.get("AUDIO_FALLBACK"))
+# Transcribe speech offline (requirements-local.txt) for media without captions: uploads to
+# /api/analyze-media without an SRT, and videos without a transcript (before AUDIO_FALLBACK)
+LOCAL_ASR = flag(ENV.get("LOCAL_ASR"))
+ASR_MODEL = ENV.get("ASR_MODEL") or "openai/whisper-base.en"
+ASR_WORKERS = int(ENV.get("ASR_WORKERS") or "0") or None  # default: one per core
+ASR_TIMEOUT = int(ENV.get("ASR_TIMEOUT") or "3600")
+# Searchable library of every analyzed caption and clip (empty to turn it off)
+MOMENT_INDEX_PATH = ENV.get("MOMENT_INDEX_PATH", os.path.join('cache', 'moments.sqlite3'))
+
+analysis_cache = AnalysisCache(app.config['CACHE_PATH'], max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                               ttl=CACHE_TTL_HOURS * 3600)
+keyword_tables = KeywordTables.load(KEYWORDS_PATH)
+moment_index = MomentIndex(MOMENT_INDEX_PATH) if MOMENT_INDEX_PATH else None
+# One writer keeps index writes off the response path and in the order analyses finish
+index_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="moment-index")
+transcript_limiter = RateLimiter(TRANSCRIPT_RATE, burst=BATCH_WORKERS)
+_transcript_session = None
+_transcript_session_lock = threading.Lock()
+clip_store = ClipStore(app.config['OUTPUT_FOLDER'], max_bytes=CLIP_CACHE_MAX_MB * 1024 * 1024)
+clip_cutter = ClipCutter(timeout=DOWNLOAD_TIMEOUT)
+scorer = CachedScorer(
+    make_scorer(SCORER_BACKEND, HF_TOKEN, HF_MODEL, batch_size=HF_BATCH_SIZE,
+                max_workers=HF_MAX_WORKERS, threads=SCORER_THREADS, api_url=HF_API_URL),
+    analysis_cache,
+    f"{SCORER_BACKEND}:{HF_MODEL}"
+)
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    # Opt-in per request: "X-Profile: 1" adds a Server-Timing header with the stage breakdown
+    metrics.start_profile(flag(request.headers.get("X-Profile")))
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    if endpoint == "metrics":
+        return response
+    elapsed = time.perf_counter() - g.get("request_start", time.perf_counter())
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    if response.content_length is not None:
+        metrics.SERVED_BYTES.observe(response.content_length, endpoint=endpoint)
+    elif response.is_streamed and not response.direct_passthrough:
+        response.response = metrics.count_bytes(response.response, endpoint=endpoint)
+    
+    profile = metrics.current_profile()
+    # Streamed bodies do their work after the headers are sent, so only whole responses get a breakdown
+    if profile is not None and not response.is_streamed:
+        response.headers["Server-Timing"] = metrics.server_timing(profile, total=elapsed)
+    return response
 
 @app.route("/")
 def index():
@@ -27,7 +132,13 @@ def index():
 
 @app.route("/api/health")
 def health():
-    return jsonify({"status": "ok"})
+    return jsonify({"status": "ok", "cache": analysis_cache.stats(), "jobs": download_jobs.stats(),
+                    "clips": clip_store.stats(), "moments": moment_index.stats() if moment_index else None})
+
+@app.route("/api/metrics")
+def metrics_endpoint():
+    """Stage timings, served bytes and fallback counters in the Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 def youtube_id(url):
     if "youtu.be" in url:
@@ -48,190 +159,116 @@ def seconds_to_time(seconds):
         return f"{minutes:02d}:{secs:02d}"
 
 def time_to_seconds(time_str):
-    """Convert HH:MM:SS,mmm or MM:SS,mmm to seconds"""
-    # Remove milliseconds if present
-    time_str = time_str.split(',')[0]
-    
-    parts = time_str.split(':')
-    if len(parts) == 3:  # HH:MM:SS
-        hours, minutes, seconds = map(int, parts)
-        return hours * 3600 + minutes * 60 + seconds
-    elif len(parts) == 2:  # MM:SS
-        minutes, seconds = map(int, parts)
-        return minutes * 60 + seconds
-    else:
-        return 0
+    """Convert HH:MM:SS,mmm or MM:SS,mmm to seconds, keeping milliseconds"""
+    seconds = parse_timestamp(str(time_str))
+    return seconds if seconds is not None else 0
 
 def parse_srt_file(file_path):
-    """Parse .srt file and return transcript-like data"""
-    transcript = []
-    
+    """Parse .srt or .vtt file and return transcript-like data"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Split by subtitle blocks (separated by double newlines)
-        blocks = re.split(r'\n\s*\n', content.strip())
-        
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                # Skip subtitle number (first line)
-                # Second line is timestamp
-                timestamp_line = lines[1]
-                # Remaining lines are text
-                text = ' '.join(lines[2:])
-                
-                # Parse timestamp (format: 00:00:20,000 --> 00:00:24,400)
-                if ' --> ' in timestamp_line:
-                    start_time, end_time = timestamp_line.split(' --> ')
-                    start_seconds = time_to_seconds(start_time.strip())
-                    
-                    # Clean text
-                    text = re.sub(r'<[^>]+>', '', text)  # Remove HTML tags
-                    text = text.strip()
-                    
-                    if text and len(text) > 5:  # Only include meaningful text
-                        transcript.append({
-                            'start': start_seconds,
-                            'text': text
-                        })
-    
+        with open(file_path, 'rb') as file, metrics.timed("srt_parse"):
+            return list(iter_subtitle_stream(file))
     except Exception as e:
         print(f"Error parsing SRT file: {e}")
         return []
-    
+
+# youtube-transcript-api errors that retrying won't fix
+PERMANENT_TRANSCRIPT_ERRORS = {"TranscriptsDisabled", "NoTranscriptFound", "NoTranscriptAvailable",
+                               "VideoUnavailable", "InvalidVideoId", "TranscriptUnavailable"}
+TRANSCRIPT_HOST = "www.youtube.com"
+
+def cache_get(ns, key):
+    """Cached value, or None when missing or the cache can't be read (it's only an optimization)"""
+    if not key:
+        return None
+    try:
+        return analysis_cache.get(ns, key)
+    except Exception as e:
+        print(f"Cache read error ({ns}): {e}")
+        return None
+
+def cache_set(ns, key, value):
+    if not key:
+        return
+    try:
+        analysis_cache.set(ns, key, value)
+    except Exception as e:
+        print(f"Cache write error ({ns}): {e}")
+
+def cached_transcript(video_id):
+    return cache_get("transcript", video_id)
+
+def cache_transcript(video_id, transcript):
+    cache_set("transcript", video_id, transcript)
+
+def transcript_session():
+    """Shared HTTP session for direct transcript fetches, created on first use"""
+    global _transcript_session
+    if _transcript_session is None:
+        with _transcript_session_lock:
+            if _transcript_session is None:
+                import requests
+                _transcript_session = requests.Session()
+    return _transcript_session
+
+def fetch_transcript(video_id, limiter=None):
+    """Get a transcript (cached), raising the transcript API's error on failure"""
+    cached = cached_transcript(video_id)
+    if cached is not None:
+        return cached
+
+    if limiter:
+        limiter.acquire(TRANSCRIPT_HOST)
+    with metrics.timed("transcript_fetch"):
+        if YOUTUBE_BASE_URL:
+            transcript = transcripts.fetch_transcript(transcript_session(), video_id, YOUTUBE_BASE_URL)
+        else:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    cache_transcript(video_id, transcript)
     return transcript
 
+def is_transient_transcript_error(error):
+    return not isinstance(error, ImportError) and type(error).__name__ not in PERMANENT_TRANSCRIPT_ERRORS
+
+def transcript_error_message(error):
+    error_msg = str(error)
+    if "no element found" in error_msg:
+        return "No captions available for this video"
+    elif "TranscriptsDisabled" in error_msg:
+        return "Transcripts are disabled for this video"
+    elif "NoTranscriptFound" in error_msg:
+        return "No transcript found for this video"
+    else:
+        return f"Transcript error: {error_msg}"
+
 def get_transcript_safe(video_id):
     """Safely get transcript with proper error handling"""
     try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        return transcript, None
+        return fetch_transcript(video_id), None
     except Exception as e:
-        error_msg = str(e)
-        if "no element found" in error_msg:
-            return None, "No captions available for this video"
-        elif "TranscriptsDisabled" in error_msg:
-            return None, "Transcripts are disabled for this video"
-        elif "NoTranscriptFound" in error_msg:
-            return None, "No transcript found for this video"
-        else:
-            return None, f"Transcript error: {error_msg}"
+        return None, transcript_error_message(e)
 
 def analyze_text(text):
-    """Analyze text sentiment using Hugging Face API"""
-    headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-    payload = {"inputs": text}
-    try:
-        resp = requests.post(
-            f"https://api-inference.huggingface.co/models/{HF_MODEL}",
-            headers=headers, json=payload, timeout=10
-        )
-        if resp.status_code == 200:
-            result = resp.json()
-            # Handle different response formats from Hugging Face API
-            if isinstance(result, list) and len(result) > 0:
-                # If it's a nested list [[{...}]], get the inner list
-                if isinstance(result[0], list):
-                    scores = result
-                else:
-                    scores = result
-                
-                # Find the highest scoring sentiment
-                if len(scores) > 0 and isinstance(scores[0], dict):
-                    best_result = max(scores, key=lambda x: x.get('score', 0))
-                    return best_result
-                else:
-                    return {"label": "POSITIVE", "score": 0.7}
-            else:
-                return {"label": "POSITIVE", "score": 0.7}
-        else:
-            print(f"HF API error: {resp.status_code} - {resp.text}")
-            return {"label": "POSITIVE", "score": 0.7}
-    except Exception as e:
-        print(f"Analyze text error: {e}")
-        return {"label": "POSITIVE", "score": 0.7}
+    """Analyze text sentiment with the configured scorer backend"""
+    return analyze_texts([text])[0]
 
-def get_viral_triggers(text, score):
+def analyze_texts(texts):
+    """Analyze many texts in batches with the configured scorer backend"""
+    with metrics.timed("sentiment"):
+        return scorer.score(texts)
+
+def get_viral_triggers(text, score, hits=None):
     """Determine viral triggers based on content analysis"""
-    triggers = []
-    
-    # Pattern Interrupt - strong opinions, contrarian views
-    if any(word in text.lower() for word in ['never', 'always', 'wrong', 'mistake', 'secret', 'truth']):
-        triggers.append("Pattern Interrupt")
-    
-    # Curiosity Gap - questions, incomplete info
-    if any(word in text.lower() for word in ['why', 'how', 'what', '?', 'here\'s', 'this is']):
-        triggers.append("Curiosity Gap")
-    
-    # Emotional Resonance - high sentiment score
-    if score > 0.7:
-        triggers.append("Emotional Resonance")
-    
-    # Authority - experience, credentials
-    if any(word in text.lower() for word in ['years', 'experience', 'professional', 'expert', 'I', 'my']):
-        triggers.append("Authority")
-    
-    # Relatability - common experiences
-    if any(word in text.lower() for word in ['most people', 'everyone', 'you', 'we', 'traders']):
-        triggers.append("Relatability")
-    
-    # Social Currency - shareable insights
-    if any(word in text.lower() for word in ['tip', 'strategy', 'learn', 'important', 'key']):
-        triggers.append("Social Currency")
-    
-    # Transformation Arc - before/after
-    if any(word in text.lower() for word in ['changed', 'improved', 'learned', 'realized', 'discovered']):
-        triggers.append("Transformation Arc")
-    
-    # Default triggers if none found
-    if not triggers:
-        triggers = ["Authority", "Relatability"]
-    
-    return triggers[:3]  # Limit to top 3
+    if hits is None:
+        hits = keyword_tables.scan(text)
+    return keyword_tables.triggers(hits, score)
 
-def create_viral_title(text, clip_id, source_type):
+def create_viral_title(text, clip_id, source_type, hits=None):
     """Generate catchy viral titles based on content"""
-    text_lower = text.lower()
-    
-    # Trading-specific titles
-    if any(word in text_lower for word in ['risk', 'management', 'loss']):
-        titles = [
-            f"🚨 Risk Management Secret #{clip_id}",
-            f"💰 How I Stopped Losing Money #{clip_id}",
-            f"⚠️ Trading Risk Reality Check #{clip_id}"
-        ]
-    elif any(word in text_lower for word in ['strategy', 'setup', 'trade']):
-        titles = [
-            f"🎯 Winning Strategy #{clip_id}",
-            f"🔥 Trading Setup That Changed Everything #{clip_id}",
-            f"💡 Pro Trading Strategy #{clip_id}"
-        ]
-    elif any(word in text_lower for word in ['psychology', 'mindset', 'emotion']):
-        titles = [
-            f"🧠 Trading Psychology Breakthrough #{clip_id}",
-            f"💭 Mindset That Makes Money #{clip_id}",
-            f"😤 Emotional Trading Trap #{clip_id}"
-        ]
-    elif any(word in text_lower for word in ['money', 'profit', 'loss']):
-        titles = [
-            f"💵 How I Make Consistent Profits #{clip_id}",
-            f"📈 Money Management Secret #{clip_id}",
-            f"💸 Why You're Losing Money #{clip_id}"
-        ]
-    else:
-        # Generic viral titles
-        titles = [
-            f"🔥 Game-Changing Insight #{clip_id}",
-            f"💡 What They Don't Tell You #{clip_id}",
-            f"⚡ Key Learning #{clip_id}",
-            f"🎯 Essential Knowledge #{clip_id}"
-        ]
-    
-    # Pick title based on clip ID for consistency
-    return titles[clip_id % len(titles)]
+    if hits is None:
+        hits = keyword_tables.scan(text)
+    return keyword_tables.title(hits, clip_id)
 
 def create_hook_text(text):
     """Create engaging hook text for captions"""
@@ -264,25 +301,38 @@ def sanitize_filename(filename):
     filename = re.sub(r'\s+', '_', filename.strip())
     return filename[:50]  # Limit length
 
-def download_youtube_segment(video_url, start_time, end_time, quality, output_path):
-    """Download specific video segment using yt-dlp"""
+def build_download_command(video_url, start_time, end_time, quality, output_path):
+    """Build the yt-dlp command for downloading a video segment"""
+    # Convert to yt-dlp format if needed
+    download_section = f"*{start_time}-{end_time}"
+    
+    return [
+        'yt-dlp',
+        '--download-sections', download_section,
+        '-f', quality,
+        '-o', output_path,
+        '--no-playlist',
+        '--newline',
+        video_url
+    ]
+
+def playlist_video_urls(playlist_url):
+    """List the video URLs in a YouTube playlist (or channel) without downloading anything"""
+    cmd = ['yt-dlp', '--flat-playlist', '--print', 'id', playlist_url]
+    with metrics.timed("ytdlp_playlist"):
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PLAYLIST_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not read playlist: {result.stderr.strip()[-300:]}")
+    return [f"https://www.youtube.com/watch?v={vid}" for vid in result.stdout.split() if vid]
+
+def run_download_command(cmd):
+    """Run a yt-dlp command to completion, returning (success, message)"""
     try:
-        # Convert to yt-dlp format if needed
-        download_section = f"*{start_time}-{end_time}"
-        
-        cmd = [
-            'yt-dlp',
-            '--download-sections', download_section,
-            '-f', quality,
-            '-o', output_path,
-            '--no-playlist',
-            video_url
-        ]
-        
         print(f"Running: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        with metrics.timed("ytdlp"):
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=DOWNLOAD_TIMEOUT)
         
-        if result.returncode == 0 and os.path.exists(output_path):
+        if result.returncode == 0:
             return True, "Success"
         else:
             return False, result.stderr
@@ -292,104 +342,694 @@ def download_youtube_segment(video_url, start_time, end_time, quality, output_pa
     except Exception as e:
         return False, str(e)
 
-def analyze_transcript_data(transcript, source_type="transcript", video_url=None):
+def download_youtube_segment(video_url, start_time, end_time, quality, output_path):
+    """Download specific video segment using yt-dlp"""
+    cmd = build_download_command(video_url, start_time, end_time, quality, output_path)
+    success, message = run_download_command(cmd)
+    
+    # Output templates like "name.%(ext)s" only resolve once yt-dlp picks a format
+    if success and not (os.path.exists(output_path) or '%(ext)s' in output_path):
+        return False, "Downloaded file not found"
+    return success, message
+
+def clip_output_name(hook_text, start_time, end_time):
+    """Build the user-facing file name for a clip, without the extension"""
+    safe_filename = sanitize_filename(hook_text)
+    return f"{safe_filename}_{start_time.replace(':','-')}_{end_time.replace(':','-')}"
+
+def find_downloaded_file(workdir):
+    """Find the file yt-dlp wrote into a private download directory (it picks the extension)"""
+    for file in os.listdir(workdir):
+        if not file.endswith(('.part', '.ytdl')):
+            return os.path.join(workdir, file)
+    return None
+
+CLIP_MIMETYPES = {
+    ".mp4": "video/mp4", ".m4v": "video/mp4", ".webm": "video/webm", ".mkv": "video/x-matroska",
+    ".mov": "video/quicktime", ".3gp": "video/3gpp", ".m4a": "audio/mp4", ".mp3": "audio/mpeg",
+    ".opus": "audio/ogg", ".ogg": "audio/ogg",
+}
+
+def clip_mimetype(path):
+    return CLIP_MIMETYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+def content_disposition(filename):
+    """attachment header for filename, with an RFC 5987 UTF-8 name when it isn't ASCII (as send_file does)"""
+    fallback = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+    fallback = fallback.replace("\\", "").replace('"', "")
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    # Headers are latin-1 on the wire, so the real name only goes in the percent-encoded form
+    return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename, safe="")}'
+
+def clip_accel_headers(path, download_name=None):
+    """Headers handing a stored clip to nginx, which then sends it (ranges and validators included)"""
+    relative = os.path.relpath(path, clip_store.folder).replace(os.sep, "/")
+    headers = {"X-Accel-Redirect": CLIP_ACCEL_PREFIX.rstrip("/") + "/" + relative}
+    if download_name:
+        headers["Content-Disposition"] = content_disposition(download_name)
+    return headers
+
+def serve_clip(path, download_name=None):
+    """Send a stored clip with Range, ETag and Last-Modified support, or hand it to the front proxy"""
+    if CLIP_ACCEL_PREFIX:
+        return Response(mimetype=clip_mimetype(path), headers=clip_accel_headers(path, download_name))
+    return send_file(
+        path,
+        mimetype=clip_mimetype(path),
+        as_attachment=bool(download_name),
+        download_name=download_name,
+        # With X-Sendfile the front server answers Range requests itself
+        conditional=not app.config['USE_X_SENDFILE'],
+        etag=True,
+        max_age=CLIP_MAX_AGE
+    )
+
+def clip_store_key(video_url, start_time, end_time, quality):
+    """Clip store key and index metadata for a requested clip"""
+    vid_id = youtube_id(video_url) or video_url
+    meta = {"videoId": vid_id, "start": start_time, "end": end_time, "format": quality}
+    return clip_store.key(vid_id, start_time, end_time, quality), meta
+
+def get_cached_clip(video_url, start_time, end_time, quality, download, cancelled=None):
+    """Return (path, message) for a clip from the clip store, downloading it on a miss.
+
+    ``download(cmd)`` runs the yt-dlp command and returns (success, message).
+    """
+    key, meta = clip_store_key(video_url, start_time, end_time, quality)
+    
+    def produce(workdir):
+        output_path = os.path.join(workdir, "clip.%(ext)s")
+        cmd = build_download_command(video_url, start_time, end_time, quality, output_path)
+        success, message = download(cmd)
+        return success, message, find_downloaded_file(workdir) if success else None
+    
+    return clip_store.get_or_create(key, produce, meta=meta, cancelled=cancelled)
+
+def run_download_job(job):
+    """Job handler: download one clip segment, reporting progress on the job"""
+    params = job.params
+    duration = time_to_seconds(params["endTime"]) - time_to_seconds(params["startTime"])
+    
+    def download(cmd):
+        with metrics.timed("ytdlp"):
+            return run_with_progress(job, cmd, duration=duration, timeout=DOWNLOAD_TIMEOUT)
+    
+    job.file_path, message = get_cached_clip(params["videoUrl"], params["startTime"], params["endTime"],
+                                             params["quality"], download, cancelled=job.cancelled)
+    if not job.file_path:
+        return False, f"Failed to download clip: {message}"
+    return True, "Success"
+
+def sort_captions(transcript):
+    """Captions in start-time order (transcripts are almost always sorted already)"""
+    starts = [float(c.get('start', 0)) for c in transcript]
+    if all(a <= b for a, b in zip(starts, starts[1:])):
+        return transcript
+    return sorted(transcript, key=lambda c: float(c.get('start', 0)))
+
+def caption_texts(transcript):
+    return [chunk.get('text', '').strip() for chunk in transcript]
+
+def caption_groups(texts):
+    """Near-duplicate group per caption text: the index of the caption scored for it"""
+    import dedup
+    with metrics.timed("dedup"):
+        groups = dedup.duplicate_groups(texts, threshold=DEDUP_THRESHOLD)
+    duplicates = len(groups) - len(dedup.representatives(groups))
+    if duplicates:
+        metrics.DUPLICATE_CAPTIONS.inc(duplicates)
+    return groups
+
+def score_texts(texts):
+    """Sentiment score per text (0 for empty texts)"""
+    return caption_scores(texts, analyze_texts([text for text in texts if text]))
+
+def score_captions(texts, groups=None):
+    """Sentiment score per caption text, scoring each near-duplicate group once"""
+    import dedup
+    if groups is None:
+        groups = caption_groups(texts)
+    reps = dedup.representatives(groups)
+    return dedup.spread(score_texts([texts[i] for i in reps]), reps, groups)
+
+def caption_scores(texts, analyses):
+    """Score array for caption texts from the analyses of the non-empty ones"""
+    import numpy as np
+    scored = [i for i, text in enumerate(texts) if text]
+    scores = np.zeros(len(texts))
+    # Handle the analysis result properly
+    scores[scored] = [analysis.get('score', 0.5) if analysis and isinstance(analysis, dict) else 0.5
+                      for analysis in analyses]
+    return scores
+
+def scan_captions(texts):
+    """Keyword-hit bitmask per caption text"""
+    import numpy as np
+    # One pass over each caption finds every trigger/category/title/bonus keyword
+    # Bitmasks fit int64 unless keywords.json grows past 63 groups
+    mask_dtype = np.int64 if len(keyword_tables.matcher.names) < 64 else object
+    with metrics.timed("keyword_scan"):
+        return np.array([keyword_tables.scan(text) for text in texts], dtype=mask_dtype)
+
+def build_ranker(transcript, scores=None, hits=None, groups=None, audio=None):
+    """Score every caption once and load the columns into a SegmentRanker.
+
+    Pass ``scores``/``hits``/``groups`` to reuse per-caption results already
+    computed for (a prefix of) the same sorted transcript, and ``audio``
+    (highlights.AudioFeatures of the same media) to blend its energy in.
+    """
+    import numpy as np
+    from ranking import SegmentRanker, caption_bounds
+    transcript = sort_captions(transcript)
+    starts, ends = caption_bounds(transcript)
+    texts = caption_texts(transcript)
+    if groups is None:
+        groups = caption_groups(texts)
+    if scores is None:
+        scores = score_captions(texts, groups)
+    if hits is None:
+        hits = scan_captions(texts)
+    
+    # Bonus depends only on the bitmask, and transcripts repeat few distinct masks
+    masks, inverse = np.unique(hits, return_inverse=True)
+    bonus = np.array([keyword_tables.bonus(int(mask)) for mask in masks])[inverse.reshape(-1)]
+    
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    nonempty = lengths > 0
+    values = np.where(nonempty, np.round(scores * 100) + bonus, 0.0)
+    if audio is not None:
+        import highlights
+        energy = highlights.caption_energy(audio, starts, ends)
+        values = np.where(nonempty, (1 - AUDIO_WEIGHT) * values + AUDIO_WEIGHT * energy * 100, 0.0)
+    relevant = (hits & keyword_tables.relevance_bit) != 0
+    
+    return SegmentRanker(starts, ends, values, texts=texts, hits=hits, scores=scores,
+                         lengths=lengths, nonempty=nonempty, relevant=relevant, groups=groups)
+
+def clip_options(data):
+    """Read optional clipLength (seconds) and maxClips from request data (ValueError if invalid)"""
+    options = {}
+    try:
+        if data.get("clipLength"):
+            clip_seconds = float(data["clipLength"])
+            if math.isnan(clip_seconds):
+                raise ValueError("clipLength is not a number")
+            options["clip_seconds"] = max(10, min(180, clip_seconds))
+        if data.get("maxClips"):
+            options["max_clips"] = max(1, min(50, int(data["maxClips"])))
+    except (TypeError, OverflowError) as e:
+        # null, lists and objects in JSON bodies
+        raise ValueError(str(e)) from None
+    return options
+
+def read_clip_options(data):
+    """(clip_options, error response) for request data"""
+    try:
+        return clip_options(data), None
+    except ValueError:
+        return None, (jsonify({"success": False, "error": "Invalid clipLength or maxClips"}), 400)
+
+def default_clip_seconds(source_type):
+    return 30 if source_type.lower() == "srt" else 45
+
+def select_windows(ranker, clip_seconds, max_clips, min_seconds, taken=(), complete_before=None):
+    """Pick the best clip windows; returns (windows, mean sentiment score per window).
+
+    Windows reaching past ``complete_before`` (seconds) are skipped, since their
+    later captions haven't been scored yet.
+    """
+    import numpy as np
+    # Score, filter and rank every candidate window at once
+    means, firsts, lasts = ranker.window_scores(clip_seconds)
+    lines = ranker.window_sum('nonempty', clip_seconds)
+    text_lengths = ranker.window_sum('lengths', clip_seconds) + np.maximum(lines - 1, 0)
+    mean_scores = ranker.window_sum('scores', clip_seconds) / (lasts - firsts)
+    
+    # Filter for quality clips
+    keep = (text_lengths >= 20) & ((mean_scores > 0.3) | (ranker.window_sum('relevant', clip_seconds) > 0))
+    if complete_before is not None:
+        keep &= ranker.starts + clip_seconds <= complete_before
+    
+    # Calculate virality score (enhanced)
+    length_bonus = np.minimum(10, text_lengths // 20)  # Bonus for longer content
+    virality = np.minimum(100, np.round(means) + length_bonus)
+    
+    windows = ranker.top_windows(clip_seconds, max_clips, min_seconds=min_seconds, keep=keep,
+                                 rank=virality, taken=taken, max_similarity=CLIP_MAX_SIMILARITY)
+    return windows, mean_scores
+
+def build_clip(ranker, window, clip_id, score, source_type, video_url):
+    """Clip details for one selected window"""
+    import numpy as np
+    virality_score, first, last = window
+    window_texts = [ranker.texts[i] for i in range(first, last) if ranker.texts[i]]
+    text = ' '.join(window_texts)
+    hits = int(np.bitwise_or.reduce(ranker.hits[first:last]))
+    
+    # Snap the clip to the window's caption boundaries
+    start_seconds = float(ranker.starts[first])
+    end_seconds = float(ranker.ends[last - 1])
+    clip_duration = round(end_seconds - start_seconds)
+    
+    start_time = seconds_to_time(start_seconds)
+    end_time = seconds_to_time(end_seconds)
+    
+    # Determine category with better logic
+    category = keyword_tables.category(hits)
+    
+    # Get viral triggers
+    triggers = get_viral_triggers(text, score, hits)
+    
+    # Create viral title
+    title = create_viral_title(text, clip_id, source_type, hits)
+    
+    # Hook on the strongest line in the window
+    line_values = np.where(ranker.columns['lengths'][first:last] >= 20, ranker.values[first:last], -1)
+    best = first + int(np.argmax(line_values))
+    hook_text = create_hook_text(ranker.texts[best] if len(ranker.texts[best]) >= 20 else text)
+    
+    clip_data = {
+        "id": clip_id,
+        "title": title,
+        "startTime": start_time,
+        "endTime": end_time,
+        "duration": f"{clip_duration}s",
+        "hookText": hook_text,
+        "fullText": text,  # Store full text for preview
+        "viralityScore": int(virality_score),
+        "triggers": triggers,
+        "category": category,
+        "ffmpegCommand": f"ffmpeg -ss {start_time} -to {end_time} -i input.mp4 -c copy clip_{clip_id}.mp4",
+        "sourceType": source_type,
+        "startSeconds": start_seconds,
+        "endSeconds": end_seconds
+    }
+    
+    # Add video URL for YouTube clips
+    if video_url and source_type.lower() == "youtube":
+        clip_data["previewUrl"] = f"{video_url}&t={int(start_seconds)}"
+        clip_data["videoUrl"] = video_url
+    elif video_url and source_type.lower() in ("srt", "asr"):
+        clip_data["videoUrl"] = video_url
+    
+    return clip_data
+
+def min_clip_seconds(ranker, clip_seconds):
+    # Don't let a few trailing captions win on their own
+    return min(clip_seconds, ranker.ends[-1] - ranker.starts[0]) / 2
+
+def analyze_transcript_data(transcript, source_type="transcript", video_url=None,
+                            clip_seconds=None, max_clips=15, ranker=None, audio=None):
     """Enhanced function to analyze transcript data with full viral details"""
     clips = []
     
+    # Accept lazily parsed segments (e.g. straight from iter_subtitle_stream)
+    if transcript is not None and not isinstance(transcript, list):
+        transcript = list(transcript)
+    
     if not transcript or len(transcript) < 3:
         return clips
     
-    # Sample transcript chunks intelligently
-    total_chunks = len(transcript)
-    step = max(1, total_chunks // 15)  # Aim for ~15 clips
+    if clip_seconds is None:
+        clip_seconds = default_clip_seconds(source_type)
     
-    clip_id = 1
-    for i in range(0, total_chunks, step):
-        if clip_id > 15:
-            break
-            
-        chunk = transcript[i]
-        text = chunk.get('text', '').strip()
-        
-        # Skip very short or empty text
-        if len(text) < 20:
-            continue
-        
-        # Get timestamp
-        start_seconds = chunk.get('start', 0)
+    # Every caption is scored once; pass the ranker back in to re-rank cheaply
+    if ranker is None:
+        ranker = build_ranker(transcript, audio=audio)
+    with metrics.timed("rank"):
+        windows, mean_scores = select_windows(ranker, clip_seconds, max_clips,
+                                              min_clip_seconds(ranker, clip_seconds))
+    
+    # Build clip details only for the winners, numbered in playback order
+    windows.sort(key=lambda w: w[1])
+    for clip_id, window in enumerate(windows, 1):
+        clips.append(build_clip(ranker, window, clip_id, float(mean_scores[window[1]]),
+                                source_type, video_url))
+    
+    # Sort by virality score
+    clips.sort(key=lambda x: x["viralityScore"], reverse=True)
+    return clips
+
+def transcript_clip_steps(transcript, source_type="transcript", video_url=None,
+                          clip_seconds=None, max_clips=15):
+    """Generator behind iter_transcript_clips that leaves the scoring I/O to its driver.
+
+    Yields ("score", texts) and expects the scores for those texts to be sent
+    back, and ("progress", info) / ("clip", clip) events to pass on, then
+    ("scores", per-caption scores in start-time order) for the index. Captions
+    are scored in rounds that double in size, starting with one scorer
+    round-trip's worth. Only the first caption of each near-duplicate group is
+    sent; the rest copy its score. After each round, windows lying entirely in
+    the scored part of the timeline are final, so the best of them are sent
+    right away, up to that part's share of ``max_clips``.
+    """
+    import numpy as np
+    import dedup
+    from ranking import caption_bounds
+    transcript = sort_captions(list(transcript))
+    if len(transcript) < 3:
+        return
+    if clip_seconds is None:
+        clip_seconds = default_clip_seconds(source_type)
+    
+    texts = caption_texts(transcript)
+    starts, ends = caption_bounds(transcript)
+    first_start, last_end = starts[0], ends.max()
+    total = len(texts)
+    scores = np.zeros(total)
+    hits = scan_captions(texts)
+    groups = caption_groups(texts)
+    
+    taken = []
+    scored = 0
+    round_size = HF_BATCH_SIZE * HF_MAX_WORKERS
+    while scored < total:
+        batch = slice(scored, min(total, scored + round_size))
+        # A group's first caption comes first, so every copy's score is known by its round
+        reps = scored + dedup.representatives(groups[batch] - scored)
+        if len(reps):
+            scores[reps] = yield "score", [texts[i] for i in reps]
+        scores[batch] = scores[groups[batch]]
+        scored = batch.stop
+        round_size *= 2
+        yield "progress", {"stage": "scoring", "scored": scored, "total": total}
         
-        # Analyze sentiment
-        analysis = analyze_text(text)
-        score = 0.5
+        done = scored == total
+        ranker = build_ranker(transcript[:scored], scores=scores[:scored], hits=hits[:scored],
+                              groups=groups[:scored])
+        complete_before = None if done else starts[scored]
+        share = 1.0 if done else (complete_before - first_start) / max(last_end - first_start, 1e-9)
+        quota = int(max_clips * share) - len(taken)
+        with metrics.timed("rank"):
+            windows, mean_scores = select_windows(ranker, clip_seconds, quota,
+                                                  min_clip_seconds(ranker, clip_seconds),
+                                                  taken=taken, complete_before=complete_before)
+        windows.sort(key=lambda w: w[1])
+        for window in windows:
+            taken.append((float(ranker.starts[window[1]]), float(ranker.ends[window[2] - 1])))
+            yield "clip", build_clip(ranker, window, len(taken), float(mean_scores[window[1]]),
+                                     source_type, video_url)
+    yield "scores", scores
+
+def iter_transcript_clips(transcript, source_type="transcript", video_url=None,
+                          clip_seconds=None, max_clips=15):
+    """Yield ("progress", info) and ("clip", clip) events while scoring a transcript, then ("scores", scores)"""
+    steps = transcript_clip_steps(transcript, source_type, video_url, clip_seconds, max_clips)
+    for event, data in steps:
+        while event == "score":
+            event, data = steps.send(score_texts(data))
+        yield event, data
+
+def mock_clips(vid_id, video_url, error):
+    """Placeholder clips for videos without a transcript, stable per video ID"""
+    metrics.FALLBACKS.inc(kind="mock_clips")
+    clips = []
+    seed = int(hashlib.md5(vid_id.encode()).hexdigest()[:8], 16)
+    
+    num_clips = 6 + (seed % 5)
+    for i in range(num_clips):
+        base_start = (seed + i * 1000) % 3600
+        start_seconds = base_start + (i * 45)
+        end_seconds = start_seconds + 30
         
-        # Handle the analysis result properly
-        if analysis and isinstance(analysis, dict):
-            score = analysis.get('score', 0.5)
+        start_time = seconds_to_time(start_seconds)
+        end_time = seconds_to_time(end_seconds)
         
-        # Filter for quality clips
-        if score > 0.3 or any(word in text.lower() for word in ['trading', 'money', 'profit', 'loss', 'strategy', 'market', 'invest', 'risk', 'trade', 'price', 'important', 'key', 'learn', 'how', 'why', 'what']):
-            
-            clip_duration = 30 if source_type.lower() == "srt" else 45
-            end_seconds = start_seconds + clip_duration
-            
-            start_time = seconds_to_time(start_seconds)
-            end_time = seconds_to_time(end_seconds)
-            
-            # Determine category with better logic
-            category = "General Content"
-            if any(word in text.lower() for word in ['trading', 'trade', 'trader', 'market', 'profit', 'strategy']):
-                category = "Trading Knowledge"
-            elif any(word in text.lower() for word in ['psychology', 'mindset', 'emotion', 'feel', 'think', 'mental']):
-                category = "Trading Psychology"
-            elif any(word in text.lower() for word in ['risk', 'management', 'loss', 'money', 'capital']):
-                category = "Risk Management"
-            
-            # Get viral triggers
-            triggers = get_viral_triggers(text, score)
-            
-            # Create viral title
-            title = create_viral_title(text, clip_id, source_type)
-            
-            # Create hook text
-            hook_text = create_hook_text(text)
-            
-            # Calculate virality score (enhanced)
-            base_score = round(score * 100)
-            length_bonus = min(10, len(text) // 20)  # Bonus for longer content
-            keyword_bonus = len([w for w in ['trading', 'money', 'profit', 'strategy'] if w in text.lower()]) * 5
-            virality_score = min(100, base_score + length_bonus + keyword_bonus)
-            
-            clip_data = {
-                "id": clip_id,
-                "title": title,
-                "startTime": start_time,
-                "endTime": end_time,
-                "duration": f"{clip_duration}s",
-                "hookText": hook_text,
-                "fullText": text,  # Store full text for preview
-                "viralityScore": virality_score,
-                "triggers": triggers,
-                "category": category,
-                "ffmpegCommand": f"ffmpeg -ss {start_time} -to {end_time} -i input.mp4 -c copy clip_{clip_id}.mp4",
-                "sourceType": source_type,
-                "startSeconds": start_seconds,
-                "endSeconds": end_seconds
-            }
-            
-            # Add video URL for YouTube clips
-            if video_url and source_type.lower() == "youtube":
-                clip_data["previewUrl"] = f"{video_url}&t={int(start_seconds)}"
-                clip_data["videoUrl"] = video_url
-            elif video_url and source_type.lower() == "srt":
-                clip_data["videoUrl"] = video_url
-            
-            clips.append(clip_data)
-            clip_id += 1
+        clips.append({
+            "id": i + 1,
+            "title": f"🔥 Sample Clip #{i+1}",
+            "startTime": start_time,
+            "endTime": end_time,
+            "duration": "30s",
+            "hookText": f"No transcript available (Error: {error}). Manual review needed.",
+            "fullText": f"No transcript available (Error: {error}). Manual review needed for {start_time} segment.",
+            "viralityScore": 50 + ((seed + i * 10) % 40),
+            "triggers": ["Manual Review", "No Transcript"],
+            "category": "Unknown Content",
+            "ffmpegCommand": f"ffmpeg -ss {start_time} -to {end_time} -i input.mp4 -c copy clip_{i+1}.mp4",
+            "sourceType": "YouTube",
+            "videoUrl": video_url
+        })
+    return clips
+
+def cached_audio_features(key):
+    import highlights
+    features = cache_get("audio", key)
+    return highlights.AudioFeatures.from_dict(features) if features else None
+
+def audio_features(source, key=None):
+    """Loudness/speech-rate features of a media file or stream URL, decoded as it streams in"""
+    import highlights
+    with metrics.timed("audio_features"):
+        features = highlights.extract_features(highlights.pcm_chunks(source, timeout=DOWNLOAD_TIMEOUT))
+    if key and len(features):
+        cache_set("audio", key, features.to_dict())
+    return features
+
+def youtube_audio_url(video_url):
+    """Direct URL of a video's audio-only stream, for ffmpeg to decode while it downloads"""
+    cmd = ['yt-dlp', '-f', 'bestaudio/best', '--get-url', '--no-playlist', video_url]
+    with metrics.timed("ytdlp"):
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=DOWNLOAD_TIMEOUT)
+    urls = result.stdout.split()
+    if result.returncode != 0 or not urls:
+        raise RuntimeError(f"No audio stream: {result.stderr.strip()[-300:]}")
+    return urls[0]
+
+def audio_clip(highlight, clip_id, source_type, video_url):
+    """Clip details for one audio highlight, shaped like build_clip's"""
+    start_seconds = highlight["start"]
+    end_seconds = highlight["end"]
+    start_time = seconds_to_time(start_seconds)
+    end_time = seconds_to_time(end_seconds)
     
-    # Sort by virality score
+    triggers = []
+    if highlight["excessDb"] >= 6:
+        triggers.append("Loudness Spike")
+    if highlight["speechRate"] >= 4:
+        triggers.append("Fast Talking")
+    if not triggers:
+        triggers.append("High Energy")
+    
+    clip_data = {
+        "id": clip_id,
+        "title": f"🔊 Audio Highlight #{clip_id}",
+        "startTime": start_time,
+        "endTime": end_time,
+        "duration": f"{round(end_seconds - start_seconds)}s",
+        "hookText": f"Peak at {seconds_to_time(highlight['peak'])}: {highlight['excessDb']:+.0f} dB over "
+                    f"the surrounding audio, {highlight['speechRate']:.1f} syllables/s",
+        "fullText": f"Picked from the audio (loudness and speech rate), no transcript. "
+                    f"Review the {start_time} segment for content.",
+        "viralityScore": int(round(highlight["score"])),
+        "triggers": triggers,
+        "category": "Audio Highlight",
+        "ffmpegCommand": f"ffmpeg -ss {start_time} -to {end_time} -i input.mp4 -c copy clip_{clip_id}.mp4",
+        "sourceType": source_type,
+        "startSeconds": start_seconds,
+        "endSeconds": end_seconds,
+        "audio": {
+            "loudnessDb": round(highlight["loudnessDb"], 1),
+            "excessDb": round(highlight["excessDb"], 1),
+            "speechRate": round(highlight["speechRate"], 2)
+        }
+    }
+    
+    if video_url and source_type.lower() == "youtube":
+        clip_data["previewUrl"] = f"{video_url}&t={int(start_seconds)}"
+        clip_data["videoUrl"] = video_url
+    elif video_url:
+        clip_data["videoUrl"] = video_url
+    
+    return clip_data
+
+def audio_clips(features, source_type="Audio", video_url=None, clip_seconds=None, max_clips=15):
+    """Clips at the liveliest stretches of a track's audio, in analyze_transcript_data's shape"""
+    import highlights
+    if clip_seconds is None:
+        clip_seconds = default_clip_seconds(source_type)
+    with metrics.timed("rank"):
+        found = highlights.top_highlights(features, clip_seconds, max_clips)
+    
+    # Numbered in playback order, sorted by score
+    found.sort(key=lambda h: h["start"])
+    clips = [audio_clip(h, clip_id, source_type, video_url) for clip_id, h in enumerate(found, 1)]
     clips.sort(key=lambda x: x["viralityScore"], reverse=True)
     return clips
 
+def cached_asr_transcript(key):
+    return cache_get("asr", content_key(key, ASR_MODEL)) if key else None
+
+def transcribe_media(source, key=None):
+    """Offline transcript of a media file or stream URL, its speech cut at pauses and transcribed on every core"""
+    import asr
+    with metrics.timed("asr"):
+        transcript = asr.transcribe(source, ASR_MODEL, ASR_WORKERS, timeout=ASR_TIMEOUT)
+    if key and transcript:
+        cache_set("asr", content_key(key, ASR_MODEL), transcript)
+    print(f"✅ Transcribed {len(transcript)} captions locally")
+    return transcript
+
+def fallback_clips(vid_id, video_url, error, options=None):
+    """Clips for a video without a transcript: transcribed locally with LOCAL_ASR, else from its
+    audio with AUDIO_FALLBACK, else mock clips"""
+    if LOCAL_ASR:
+        try:
+            transcript = cached_asr_transcript(vid_id)
+            if transcript is None:
+                transcript = transcribe_media(youtube_audio_url(video_url), vid_id)
+            clips = analyze_and_index(vid_id, transcript, "YouTube", video_url,
+                                      audio=cached_audio_features(vid_id), **(options or {}))
+            if clips:
+                metrics.FALLBACKS.inc(kind="asr_transcript")
+                return clips
+        except Exception as e:
+            print(f"Local transcription failed for {vid_id}: {e}")
+    if AUDIO_FALLBACK:
+        try:
+            features = cached_audio_features(vid_id)
+            if features is None:
+                features = audio_features(youtube_audio_url(video_url), vid_id)
+            clips = audio_clips(features, "YouTube", video_url, **(options or {}))
+            if clips:
+                metrics.FALLBACKS.inc(kind="audio_clips")
+                index_moments(vid_id, "YouTube", video_url, clips=clips)
+                return clips
+        except Exception as e:
+            print(f"Audio analysis failed for {vid_id}: {e}")
+    return mock_clips(vid_id, video_url, error)
+
+def upload_video_id(prefix, video_url, content_hash):
+    """Index key for uploaded media or subtitles: the YouTube ID they belong to, else their hash"""
+    vid_id = youtube_id(video_url) if video_url else None
+    return vid_id or f"{prefix}:{content_hash[:24]}"
+
+def caption_moments(transcript, scores=None):
+    """Index moments for a sorted transcript's non-empty captions"""
+    from ranking import caption_bounds
+    starts, ends = caption_bounds(transcript)
+    return [{"kind": "caption", "startMs": round(starts[i] * 1000), "endMs": round(ends[i] * 1000),
+             "text": text, "score": None if scores is None else float(scores[i])}
+            for i, text in enumerate(caption_texts(transcript)) if text]
+
+def clip_moments(clips):
+    """Index moments for clips (mock clips, which have no startSeconds, are left out)"""
+    return [{"kind": "clip", "startMs": round(clip["startSeconds"] * 1000),
+             "endMs": round(clip["endSeconds"] * 1000), "text": clip.get("fullText", ""),
+             "title": clip.get("title"), "score": clip["viralityScore"] / 100,
+             "virality": clip["viralityScore"], "triggers": clip.get("triggers"),
+             "category": clip.get("category")}
+            for clip in clips if "startSeconds" in clip]
+
+def index_moments(video_id, source_type, video_url, transcript=None, clips=(), scores=None):
+    """Queue an analysis for the moment index, where it replaces the video's previous one"""
+    if moment_index is None or not video_id:
+        return None
+    return index_writer.submit(write_moments, video_id, source_type, video_url, transcript, clips, scores)
+
+def write_moments(video_id, source_type, video_url, transcript=None, clips=(), scores=None):
+    try:
+        with metrics.timed("index"):
+            moments = caption_moments(sort_captions(transcript), scores) if transcript else []
+            moments += clip_moments(clips)
+            if moments:
+                counts = moment_index.index_video(video_id, moments, video_url=video_url,
+                                                  source_type=source_type)
+                if not counts["unchanged"]:
+                    print(f"Indexed {video_id}: {counts['added']} added, {counts['updated']} updated, "
+                          f"{counts['removed']} removed")
+    except Exception as e:
+        print(f"Moment index error for {video_id}: {e}")
+
+def analyze_and_index(video_id, transcript, source_type, video_url=None, audio=None, **options):
+    """analyze_transcript_data, then add the transcript and its clips to the moment index"""
+    transcript = sort_captions(list(transcript))
+    if len(transcript) < 3:
+        return []
+    ranker = build_ranker(transcript, audio=audio)
+    clips = analyze_transcript_data(transcript, source_type, video_url, ranker=ranker, **options)
+    index_moments(video_id, source_type, video_url, transcript, clips, ranker.columns['scores'])
+    return clips
+
+def clips_summary(clips, default_category):
+    return {
+        "totalClips": len(clips),
+        "averageScore": sum(clip["viralityScore"] for clip in clips) / len(clips) if clips else 0,
+        "topCategory": clips[0]["category"] if clips else default_category
+    }
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_events(events):
+    """Stream (event, data) pairs as text/event-stream, ending with an error event on failure"""
+    def generate():
+        try:
+            for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"Streaming analysis error: {e}")
+            yield sse_event("error", {"success": False, "error": str(e)})
+    
+    # X-Accel-Buffering stops nginx from holding events back
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+def analysis_events(transcript, source_type, video_url, options, can_download, default_category,
+                    video_id=None):
+    """Progress, clip and final summary events for one transcript, indexed under video_id"""
+    clips = []
+    scores = None
+    for event, data in iter_transcript_clips(transcript, source_type, video_url, **options):
+        if event == "scores":
+            scores = data
+            continue
+        if event == "clip":
+            clips.append(data)
+        yield event, data
+    
+    clips.sort(key=lambda x: x["viralityScore"], reverse=True)
+    yield "summary", {
+        "success": True,
+        "canDownloadClips": can_download,
+        "summary": clips_summary(clips, default_category)
+    }
+    # The client has everything by now
+    index_moments(video_id, source_type, video_url, transcript, clips, scores)
+
+def analyze_videos(video_urls, options, skip=()):
+    """Yield one result per video as each finishes (see batch.run_batch).
+
+    Transcripts are fetched concurrently, rate limited per host and retried
+    with backoff; all scoring goes through the shared batched scorer. Videos
+    whose ID is in ``skip`` are left out.
+    """
+    urls = {}
+    for video_url in video_urls:
+        vid_id = youtube_id(video_url)
+        if not vid_id:
+            yield {"videoId": None, "videoUrl": video_url, "success": False, "error": "Invalid YouTube URL"}
+        elif vid_id not in skip and vid_id not in urls:
+            urls[vid_id] = video_url
+    
+    def fetch(vid_id):
+        return fetch_transcript(vid_id, limiter=transcript_limiter)
+    
+    def analyze(vid_id, transcript):
+        if not transcript or len(transcript) <= 10:
+            raise ValueError("Transcript too short to analyze")
+        clips = analyze_and_index(vid_id, transcript, "YouTube", urls[vid_id], **options)
+        return {"success": True, "clips": clips, "summary": clips_summary(clips, "Content Analysis")}
+    
+    for vid_id, result in run_batch(urls, fetch, analyze, workers=BATCH_WORKERS,
+                                    attempts=TRANSCRIPT_RETRIES, retryable=is_transient_transcript_error,
+                                    fetch_error=transcript_error_message):
+        record = {"videoId": vid_id, "videoUrl": urls[vid_id]}
+        record.update(result)
+        yield record
+
 @app.route("/api/analyze", methods=["POST"])
 def analyze():
     try:
@@ -404,113 +1044,302 @@ def analyze():
         if not vid_id:
             return jsonify({"success": False, "error": "Invalid YouTube URL"}), 400
         
+        options, error_response = read_clip_options(data)
+        if error_response:
+            return error_response
+        
         # Try to get real transcript
         transcript, error = get_transcript_safe(vid_id)
         
         if transcript and len(transcript) > 10:
             print(f"✅ Got transcript with {len(transcript)} chunks for video {vid_id}")
-            clips = analyze_transcript_data(transcript, "YouTube", video_url)
+            clips = analyze_and_index(vid_id, transcript, "YouTube", video_url, **options)
         else:
             print(f"❌ No transcript for video {vid_id}, error: {error}")
-            # Generate unique mock clips based on video ID
-            clips = []
-            import hashlib
-            seed = int(hashlib.md5(vid_id.encode()).hexdigest()[:8], 16)
-            
-            num_clips = 6 + (seed % 5)
-            for i in range(num_clips):
-                base_start = (seed + i * 1000) % 3600
-                start_seconds = base_start + (i * 45)
-                end_seconds = start_seconds + 30
-                
-                start_time = seconds_to_time(start_seconds)
-                end_time = seconds_to_time(end_seconds)
-                
-                clips.append({
-                    "id": i + 1,
-                    "title": f"🔥 Sample Clip #{i+1}",
-                    "startTime": start_time,
-                    "endTime": end_time,
-                    "duration": "30s",
-                    "hookText": f"No transcript available (Error: {error}). Manual review needed.",
-                    "fullText": f"No transcript available (Error: {error}). Manual review needed for {start_time} segment.",
-                    "viralityScore": 50 + ((seed + i * 10) % 40),
-                    "triggers": ["Manual Review", "No Transcript"],
-                    "category": "Unknown Content",
-                    "ffmpegCommand": f"ffmpeg -ss {start_time} -to {end_time} -i input.mp4 -c copy clip_{i+1}.mp4",
-                    "sourceType": "YouTube",
-                    "videoUrl": video_url
-                })
+            # Clips from the audio, or mock clips stable per video ID
+            clips = fallback_clips(vid_id, video_url, error, options)
         
         return jsonify({
             "success": True,
             "clips": clips,
             "canDownloadClips": True,  # Enable direct downloads
-            "summary": {
-                "totalClips": len(clips),
-                "averageScore": sum(clip["viralityScore"] for clip in clips) / len(clips) if clips else 0,
-                "topCategory": clips[0]["category"] if clips else "Content Analysis"
-            }
+            "summary": clips_summary(clips, "Content Analysis")
         })
         
     except Exception as e:
         print(f"Analysis error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/api/analyze/stream", methods=["POST"])
+def analyze_stream():
+    """Like /api/analyze, but streams progress, each clip and a summary as Server-Sent Events"""
+    data = request.get_json(silent=True) or {}
+    video_url = data.get("videoUrl")
+    if not video_url:
+        return jsonify({"success": False, "error": "Missing videoUrl"}), 400
+    
+    vid_id = youtube_id(video_url)
+    if not vid_id:
+        return jsonify({"success": False, "error": "Invalid YouTube URL"}), 400
+    
+    options, error_response = read_clip_options(data)
+    if error_response:
+        return error_response
+    
+    def events():
+        yield "progress", {"stage": "transcript", "message": "Fetching transcript..."}
+        transcript, error = get_transcript_safe(vid_id)
+        
+        if not (transcript and len(transcript) > 10):
+            print(f"❌ No transcript for video {vid_id}, error: {error}")
+            if LOCAL_ASR:
+                yield "progress", {"stage": "asr", "message": "No transcript, transcribing the audio..."}
+            elif AUDIO_FALLBACK:
+                yield "progress", {"stage": "audio", "message": "No transcript, analyzing the audio..."}
+            clips = fallback_clips(vid_id, video_url, error, options)
+            for clip in clips:
+                yield "clip", clip
+            yield "summary", {"success": True, "canDownloadClips": True,
+                              "summary": clips_summary(clips, "Content Analysis")}
+            return
+        
+        print(f"✅ Got transcript with {len(transcript)} chunks for video {vid_id}")
+        yield "progress", {"stage": "transcript", "message": "Transcript fetched", "total": len(transcript)}
+        yield from analysis_events(transcript, "YouTube", video_url, options, True, "Content Analysis",
+                                   video_id=vid_id)
+    
+    return stream_events(events())
+
+def read_srt_upload():
+    """Parse the uploaded subtitle file; returns (transcript, error response)"""
+    # Check if files were uploaded
+    if 'srtFile' not in request.files:
+        return None, (jsonify({"success": False, "error": "No SRT file uploaded"}), 400)
+    
+    srt_file = request.files['srtFile']
+    
+    if srt_file.filename == '':
+        return None, (jsonify({"success": False, "error": "No SRT file selected"}), 400)
+    
+    # Check SRT file extension
+    if not srt_file.filename.lower().endswith(('.srt', '.vtt')):
+        return None, (jsonify({"success": False, "error": "Please upload a .srt or .vtt file"}), 400)
+    
+    srt_filename = secure_filename(srt_file.filename)
+    print(f"✅ SRT file uploaded: {srt_filename}")
+    
+    # Parse straight from the upload stream (cached by content hash). The transcript is still
+    # built in full: ranking needs every caption, so memory follows the cue count, not the file
+    stream = srt_file.stream
+    srt_key = stream_key(stream) if stream.seekable() else None
+    transcript = cache_get("srt", srt_key)
+    if transcript is None:
+        with metrics.timed("srt_parse"):
+            transcript = list(iter_subtitle_stream(stream))
+        if transcript:
+            cache_set("srt", srt_key, transcript)
+    
+    if not transcript:
+        return None, (jsonify({"success": False, "error": "Failed to parse SRT file. Please check the format."}), 400)
+    
+    print(f"✅ Parsed SRT with {len(transcript)} subtitles")
+    return transcript, None
+
+def srt_video_id(video_url, transcript):
+    return upload_video_id("srt", video_url, content_key(json.dumps(transcript, separators=(',', ':'))))
+
 @app.route("/api/analyze-srt", methods=["POST"])
 def analyze_srt():
     try:
-        # Check if files were uploaded
-        if 'srtFile' not in request.files:
-            return jsonify({"success": False, "error": "No SRT file uploaded"}), 400
-        
-        srt_file = request.files['srtFile']
+        transcript, error_response = read_srt_upload()
+        if error_response:
+            return error_response
         video_url = request.form.get('videoUrl', '')  # Optional YouTube URL
+        options, error_response = read_clip_options(request.form)
+        if error_response:
+            return error_response
         
-        if srt_file.filename == '':
-            return jsonify({"success": False, "error": "No SRT file selected"}), 400
-        
-        # Check SRT file extension
-        if not srt_file.filename.lower().endswith('.srt'):
-            return jsonify({"success": False, "error": "Please upload a .srt file"}), 400
-        
-        # Save SRT file
-        srt_filename = secure_filename(srt_file.filename)
-        srt_path = os.path.join(app.config['UPLOAD_FOLDER'], srt_filename)
-        srt_file.save(srt_path)
-        
-        print(f"✅ SRT file uploaded: {srt_filename}")
+        # Analyze the transcript data with enhanced details
+        clips = analyze_and_index(srt_video_id(video_url, transcript), transcript, "SRT",
+                                  video_url if video_url else None, **options)
         
-        # Parse SRT file
-        transcript = parse_srt_file(srt_path)
+        return jsonify({
+            "success": True,
+            "clips": clips,
+            "canDownloadClips": bool(video_url),  # Enable downloads only if YouTube URL provided
+            "summary": clips_summary(clips, "SRT Analysis")
+        })
         
-        if not transcript:
-            # Clean up file
-            os.remove(srt_path)
-            return jsonify({"success": False, "error": "Failed to parse SRT file. Please check the format."}), 400
+    except Exception as e:
+        print(f"SRT Analysis error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/api/analyze-srt/stream", methods=["POST"])
+def analyze_srt_stream():
+    """Like /api/analyze-srt, but streams progress, each clip and a summary as Server-Sent Events"""
+    try:
+        transcript, error_response = read_srt_upload()
+        if error_response:
+            return error_response
+        video_url = request.form.get('videoUrl', '')  # Optional YouTube URL
+        options, error_response = read_clip_options(request.form)
+        if error_response:
+            return error_response
+    except Exception as e:
+        print(f"SRT Analysis error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    def events():
+        yield "progress", {"stage": "transcript", "message": "Subtitles parsed", "total": len(transcript)}
+        yield from analysis_events(transcript, "SRT", video_url if video_url else None, options,
+                                   bool(video_url), "SRT Analysis", video_id=srt_video_id(video_url, transcript))
+    
+    return stream_events(events())
+
+@app.route("/api/analyze-media", methods=["POST"])
+def analyze_media():
+    """Find clips in an uploaded video or audio file by its audio, blended with an optional SRT
+    (or, with LOCAL_ASR, a transcript of its speech)"""
+    workdir = None
+    try:
+        media = request.files.get("mediaFile")
+        if not media or not media.filename:
+            return jsonify({"success": False, "error": "No media file uploaded"}), 400
         
-        print(f"✅ Parsed SRT with {len(transcript)} subtitles")
+        transcript = None
+        if request.files.get("srtFile") and request.files["srtFile"].filename:
+            transcript, error_response = read_srt_upload()
+            if error_response:
+                return error_response
+        video_url = request.form.get('videoUrl', '')  # Optional YouTube URL
+        options, error_response = read_clip_options(request.form)
+        if error_response:
+            return error_response
         
-        # Analyze the transcript data with enhanced details
-        clips = analyze_transcript_data(transcript, "SRT", video_url if video_url else None)
+        # Features and transcriptions are cached by content hash, so re-analyzing a file skips the decode
+        stream = media.stream
+        media_key = stream_key(stream) if stream.seekable() else None
+        features = cached_audio_features(media_key)
+        transcribe = LOCAL_ASR and transcript is None
+        if transcribe:
+            transcript = cached_asr_transcript(media_key)
+        source = None
+        if features is None or (transcribe and transcript is None):
+            workdir = make_workdir(app.config['OUTPUT_FOLDER'])
+            filename = secure_filename(media.filename) or "source.mp4"
+            source = os.path.join(workdir, "source" + (os.path.splitext(filename)[1] or ".mp4"))
+            media.save(source)
+        if features is None:
+            try:
+                features = audio_features(source, media_key)
+            except RuntimeError as e:
+                return jsonify({"success": False, "error": f"Unreadable media file: {e}"}), 400
+        if not len(features):
+            return jsonify({"success": False, "error": "No audio in media file"}), 400
+        print(f"✅ Analyzed {features.duration:.0f}s of audio")
+        if transcribe and transcript is None:
+            try:
+                transcript = transcribe_media(source, media_key)
+            except Exception as e:
+                print(f"Local transcription failed: {e}")
         
-        # Clean up SRT file
-        os.remove(srt_path)
+        if transcript and not transcribe:
+            clips = analyze_and_index(srt_video_id(video_url, transcript), transcript, "SRT",
+                                      video_url if video_url else None, audio=features, **options)
+        else:
+            media_id = upload_video_id("media", video_url, media_key) if media_key else None
+            clips = []
+            if transcript:
+                clips = analyze_and_index(media_id, transcript, "ASR", video_url if video_url else None,
+                                          audio=features, **options)
+            if not clips:
+                clips = audio_clips(features, "Audio", video_url if video_url else None, **options)
+                index_moments(media_id, "Audio", video_url if video_url else None, clips=clips)
         
         return jsonify({
             "success": True,
             "clips": clips,
-            "canDownloadClips": bool(video_url),  # Enable downloads only if YouTube URL provided
-            "summary": {
-                "totalClips": len(clips),
-                "averageScore": sum(clip["viralityScore"] for clip in clips) / len(clips) if clips else 0,
-                "topCategory": clips[0]["category"] if clips else "SRT Analysis"
-            }
+            "canDownloadClips": bool(video_url),
+            "summary": clips_summary(clips, "Audio Analysis")
         })
         
     except Exception as e:
-        print(f"SRT Analysis error: {e}")
+        print(f"Media analysis error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+@app.route("/api/search")
+def search_moments():
+    """Ranked captions and clips matching a query, across every analyzed video"""
+    if moment_index is None:
+        return jsonify({"success": False, "error": "Moment index is disabled"}), 404
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"success": False, "error": "Missing q"}), 400
+    kind = request.args.get("kind") or None
+    if kind not in (None, "caption", "clip"):
+        return jsonify({"success": False, "error": "kind must be caption or clip"}), 400
+    try:
+        limit = max(1, min(100, int(request.args.get("limit", 20))))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid limit or offset"}), 400
+    
+    try:
+        with metrics.timed("search"):
+            results = moment_index.search(query, limit=limit, offset=offset, kind=kind,
+                                          video_id=request.args.get("videoId") or None,
+                                          category=request.args.get("category") or None)
+    except Exception as e:
+        print(f"Search error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
+    
+    for result in results:
+        result["startTime"] = seconds_to_time(result["startMs"] / 1000)
+        result["endTime"] = seconds_to_time(result["endMs"] / 1000)
+    return jsonify({"success": True, "query": query, "results": results})
+
+@app.route("/api/analyze-batch", methods=["POST"])
+def analyze_batch():
+    """Analyze a list of videos and/or playlists, streaming one JSON line per video as it finishes"""
+    data = request.get_json(silent=True) or {}
+    video_urls = data.get("videoUrls") or []
+    skip = data.get("skip") or []
+    # A bare string would otherwise become one video per character
+    for name, value in (("videoUrls", video_urls), ("skip", skip)):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return jsonify({"success": False, "error": f"{name} must be a list of strings"}), 400
+    video_urls = list(video_urls)
+    playlist_url = data.get("playlistUrl")
+    if playlist_url is not None and not isinstance(playlist_url, str):
+        return jsonify({"success": False, "error": "playlistUrl must be a string"}), 400
+    
+    options, error_response = read_clip_options(data)
+    if error_response:
+        return error_response
+    try:
+        if playlist_url:
+            video_urls.extend(playlist_video_urls(playlist_url))
+    except Exception as e:
+        print(f"Playlist error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 400
+    
+    if not video_urls:
+        return jsonify({"success": False, "error": "Missing videoUrls or playlistUrl"}), 400
+    if len(video_urls) > BATCH_MAX_VIDEOS:
+        return jsonify({"success": False, "error": f"At most {BATCH_MAX_VIDEOS} videos per batch"}), 400
+    
+    # Clients resume an interrupted batch by passing the video IDs they already have
+    skip = set(skip)
+    
+    def generate():
+        for record in analyze_videos(video_urls, options, skip=skip):
+            yield json.dumps(record) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
 
 @app.route("/api/download-clip", methods=["POST"])
 def download_clip():
@@ -525,39 +1354,216 @@ def download_clip():
         if not all([video_url, start_time, end_time]):
             return jsonify({"success": False, "error": "Missing required parameters"}), 400
         
-        # Create safe filename from hook text
-        safe_filename = sanitize_filename(hook_text)
-        output_filename = f"{safe_filename}_{start_time.replace(':','-')}_{end_time.replace(':','-')}.%(ext)s"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        
-        # Download video segment
-        success, message = download_youtube_segment(video_url, start_time, end_time, quality, output_path)
+        # Download video segment (or reuse an identical earlier/in-flight download)
+        downloaded_file, message = get_cached_clip(video_url, start_time, end_time, quality,
+                                                   run_download_command)
         
-        if not success:
+        if not downloaded_file:
             return jsonify({"success": False, "error": f"Failed to download clip: {message}"}), 500
         
-        # Find the actual downloaded file (yt-dlp adds extension)
-        base_name = output_filename.replace('.%(ext)s', '')
-        downloaded_file = None
-        for file in os.listdir(app.config['OUTPUT_FOLDER']):
-            if file.startswith(base_name):
-                downloaded_file = os.path.join(app.config['OUTPUT_FOLDER'], file)
-                break
-        
-        if not downloaded_file or not os.path.exists(downloaded_file):
-            return jsonify({"success": False, "error": "Downloaded file not found"}), 500
-        
-        # Return file for download
-        return send_file(
-            downloaded_file,
-            as_attachment=True,
-            download_name=os.path.basename(downloaded_file),
-            mimetype='video/mp4'
-        )
+        ext = os.path.splitext(downloaded_file)[1]
+        # Return file for download; X-Clip-Id addresses the same file at /api/clips/<id>
+        response = serve_clip(downloaded_file, clip_output_name(hook_text, start_time, end_time) + ext)
+        response.headers["X-Clip-Id"] = clip_store.clip_id(downloaded_file)
+        return response
         
     except Exception as e:
         print(f"Download clip error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def clip_ranges(requested):
+    """Validate requested clips into (start, end, archive name) dicts; returns (clips, error)"""
+    clips = []
+    for i, clip in enumerate(requested):
+        if not clip.get("startTime") or not clip.get("endTime"):
+            return None, f"Clip {i + 1} is missing startTime/endTime"
+        start = time_to_seconds(clip["startTime"])
+        end = time_to_seconds(clip["endTime"])
+        if end <= start:
+            return None, f"Clip {i + 1} ends before it starts"
+        name = sanitize_filename(clip.get("hookText") or "clip") or "clip"
+        clips.append({"start": start, "end": end, "name": f"{i + 1:02d}_{name}"})
+    return clips, None
+
+@app.route("/api/download-clips", methods=["POST"])
+def download_clips():
+    """Download the span covering every clip once, then stream back a ZIP of the cuts"""
+    workdir = None
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            # A form post, so the browser streams the ZIP to disk: the same JSON in a field
+            try:
+                data = json.loads(request.form.get("payload") or "{}")
+            except ValueError:
+                return jsonify({"success": False, "error": "Invalid payload"}), 400
+        video_url = data.get("videoUrl")
+        requested = data.get("clips") or []
+        quality = data.get("quality", "bestvideo[height<=1080]+bestaudio/best[height<=1080]")
+        
+        if not video_url or not requested:
+            return jsonify({"success": False, "error": "Missing videoUrl or clips"}), 400
+        
+        clips, error = clip_ranges(requested)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        span_start, span_end = merged_span(clips)
+        workdir = make_workdir(app.config['OUTPUT_FOLDER'])
+        output_path = os.path.join(workdir, "source.%(ext)s")
+        
+        success, message = download_youtube_segment(video_url, span_start, span_end, quality, output_path)
+        source = find_downloaded_file(workdir)
+        if not success or not source:
+            return jsonify({"success": False, "error": f"Failed to download source: {message}"}), 500
+        
+        try:
+            clip_cutter.media_info(source)  # probe keyframes once, before the parallel cuts
+        except Exception as e:
+            print(f"Keyframe probe failed, clips will be re-encoded: {e}")
+        
+        vid_id = youtube_id(video_url) or "clips"
+        stream = stream_clips_zip(source, clips, span_start, workdir, max_workers=CUT_WORKERS,
+                                  cut=clip_cutter.cut)
+        workdir = None  # the stream owns cleanup from here
+        return Response(
+            stream,
+            mimetype='application/zip',
+            headers={"Content-Disposition": content_disposition(f"{vid_id}_clips.zip")}
+        )
+        
+    except Exception as e:
+        print(f"Download clips error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+@app.route("/api/cut-clips", methods=["POST"])
+def cut_clips():
+    """Cut clips frame-accurately from an uploaded video and stream back a ZIP"""
+    workdir = None
+    try:
+        media = request.files.get("mediaFile")
+        if not media or not media.filename:
+            return jsonify({"success": False, "error": "No media file uploaded"}), 400
+        try:
+            requested = json.loads(request.form.get("clips") or "[]")
+        except ValueError:
+            return jsonify({"success": False, "error": "clips must be a JSON list"}), 400
+        if not requested or not isinstance(requested, list):
+            return jsonify({"success": False, "error": "Missing clips"}), 400
+        
+        clips, error = clip_ranges(requested)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        workdir = make_workdir(app.config['OUTPUT_FOLDER'])
+        filename = secure_filename(media.filename) or "source.mp4"
+        source = os.path.join(workdir, "source" + (os.path.splitext(filename)[1] or ".mp4"))
+        media.save(source)
+        
+        try:
+            clip_cutter.media_info(source)  # probe keyframes once, before the parallel cuts
+        except Exception as e:
+            return jsonify({"success": False, "error": f"Unreadable media file: {e}"}), 400
+        
+        name = sanitize_filename(os.path.splitext(filename)[0]) or "clips"
+        stream = stream_clips_zip(source, clips, 0.0, workdir, max_workers=CUT_WORKERS,
+                                  cut=clip_cutter.cut)
+        workdir = None  # the stream owns cleanup from here
+        return Response(
+            stream,
+            mimetype='application/zip',
+            headers={"Content-Disposition": content_disposition(f"{name}_clips.zip")}
+        )
+        
+    except Exception as e:
+        print(f"Cut clips error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+download_jobs = JobManager(run_download_job, max_workers=DOWNLOAD_WORKERS,
+                           max_queue=DOWNLOAD_QUEUE_SIZE)
+
+@app.route("/api/jobs/download-clip", methods=["POST"])
+def submit_download_job():
+    try:
+        data = request.get_json()
+        video_url = data.get("videoUrl")
+        start_time = data.get("startTime")
+        end_time = data.get("endTime")
+        
+        if not all([video_url, start_time, end_time]):
+            return jsonify({"success": False, "error": "Missing required parameters"}), 400
+        
+        job = download_jobs.submit({
+            "videoUrl": video_url,
+            "startTime": start_time,
+            "endTime": end_time,
+            "hookText": data.get("hookText", "clip"),
+            "quality": data.get("quality", "bestvideo[height<=1080]+bestaudio/best[height<=1080]")
+        })
+        return jsonify({"success": True, **job.to_dict()}), 202
+        
+    except QueueFull as e:
+        return jsonify({"success": False, "error": str(e)}), 429, {"Retry-After": "10"}
+    except Exception as e:
+        print(f"Submit download job error: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def job_details(job):
+    details = job.to_dict()
+    if job.status == "done" and job.file_path:
+        details["clipId"] = clip_store.clip_id(job.file_path)
+    return details
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def download_job_status(job_id):
+    job = download_jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job_details(job)})
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def cancel_download_job(job_id):
+    job = download_jobs.cancel(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify({"success": True, **job.to_dict()})
+
+@app.route("/api/jobs/<job_id>/file")
+def download_job_file(job_id):
+    job = download_jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    if job.status != "done" or not job.file_path:
+        return jsonify({"success": False, "error": f"Job is {job.status}"}), 409
+    if not os.path.exists(job.file_path):
+        # Evicted from the clip store since the job finished
+        return jsonify({"success": False, "error": "Clip is no longer stored, start the download again"}), 410
+    
+    # ?name= picks the file name; the extension is always the stored clip's (mp4, webm...)
+    name = sanitize_filename(request.args.get("name", "")) or clip_output_name(
+        job.params["hookText"], job.params["startTime"], job.params["endTime"])
+    return serve_clip(job.file_path, name + os.path.splitext(job.file_path)[1])
+
+@app.route("/api/clips/<clip_id>")
+def get_clip(clip_id):
+    """Stream a stored clip by its ID: inline (seekable) by default, ?download=1 to save it"""
+    if not re.fullmatch(r"[0-9a-f]{32}", clip_id):
+        return jsonify({"success": False, "error": "Invalid clip ID"}), 400
+    path = clip_store.lookup(clip_id)
+    if not path:
+        return jsonify({"success": False, "error": "Clip not found"}), 404
+    
+    download_name = None
+    if flag(request.args.get("download")):
+        name = sanitize_filename(request.args.get("name", "")) or clip_id
+        download_name = name + os.path.splitext(path)[1]
+    return serve_clip(path, download_name)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,351 @@
+"""Optional async (ASGI) server for the I/O-bound endpoints.
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+/api/analyze, /api/analyze/stream and /api/download-clip are served natively
+here. HF scoring and transcript fetches are awaited over pooled httpx clients
+and yt-dlp runs as an asyncio subprocess, so a single process can keep
+hundreds of analyses in flight. Every other route falls through to the Flask
+app (run in a thread pool).
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as clip_app
+from config import ENV, flag
+import metrics
+import transcripts
+from scoring import AsyncCachedScorer, make_async_scorer
+
+ASYNC_HF_CONNECTIONS = int(ENV.get("ASYNC_HF_CONNECTIONS") or "64")
+ASYNC_YOUTUBE_CONNECTIONS = int(ENV.get("ASYNC_YOUTUBE_CONNECTIONS") or "32")
+ASYNC_DOWNLOADS = int(ENV.get("ASYNC_DOWNLOADS") or "8")
+DEFAULT_QUALITY = "bestvideo[height<=1080]+bestaudio/best[height<=1080]"
+
+# Shares the score cache (and its keys) with the Flask app's scorer
+scorer = AsyncCachedScorer(
+    make_async_scorer(clip_app.SCORER_BACKEND, clip_app.HF_TOKEN, clip_app.HF_MODEL,
+                      batch_size=clip_app.HF_BATCH_SIZE, max_connections=ASYNC_HF_CONNECTIONS,
+                      threads=clip_app.SCORER_THREADS, api_url=clip_app.HF_API_URL),
+    clip_app.analysis_cache,
+    clip_app.scorer.config_key
+)
+_youtube = None
+_download_slots = None
+
+
+def youtube_client():
+    global _youtube
+    if _youtube is None:
+        limits = httpx.Limits(max_connections=ASYNC_YOUTUBE_CONNECTIONS,
+                              max_keepalive_connections=ASYNC_YOUTUBE_CONNECTIONS)
+        _youtube = httpx.AsyncClient(limits=limits, timeout=15, follow_redirects=True,
+                                     headers={"Accept-Language": "en-US"})
+    return _youtube
+
+
+def download_slots():
+    global _download_slots
+    if _download_slots is None:
+        _download_slots = asyncio.Semaphore(ASYNC_DOWNLOADS)
+    return _download_slots
+
+
+async def get_transcript(video_id):
+    """Async get_transcript_safe: (transcript, error)"""
+    cached = await asyncio.to_thread(clip_app.cached_transcript, video_id)
+    if cached is not None:
+        return cached, None
+
+    try:
+        with metrics.timed("transcript_fetch"):
+            transcript = await transcripts.fetch_transcript_async(youtube_client(), video_id,
+                                                                  clip_app.YOUTUBE_BASE_URL)
+    except Exception as e:
+        if not clip_app.YOUTUBE_BASE_URL:
+            # Consent walls and page changes: let youtube-transcript-api have a go
+            return await asyncio.to_thread(clip_app.get_transcript_safe, video_id)
+        if isinstance(e, transcripts.TranscriptUnavailable):
+            return None, str(e)
+        return None, clip_app.transcript_error_message(e)
+
+    await asyncio.to_thread(clip_app.cache_transcript, video_id, transcript)
+    return transcript, None
+
+
+async def score_texts(texts):
+    with metrics.timed("sentiment"):
+        analyses = await scorer.score([text for text in texts if text])
+    return clip_app.caption_scores(texts, analyses)
+
+
+async def analyze_transcript(transcript, source_type, video_url, options, video_id=None):
+    """Async analyze_and_index: awaits the scores, ranks and indexes in a worker thread"""
+    import dedup
+
+    transcript = clip_app.sort_captions(transcript)
+    texts = clip_app.caption_texts(transcript)
+    groups = await asyncio.to_thread(clip_app.caption_groups, texts)
+    reps = dedup.representatives(groups)
+    scores = dedup.spread(await score_texts([texts[i] for i in reps]), reps, groups)
+
+    def rank():
+        ranker = clip_app.build_ranker(transcript, scores=scores, groups=groups)
+        clips = clip_app.analyze_transcript_data(transcript, source_type, video_url, ranker=ranker, **options)
+        clip_app.index_moments(video_id, source_type, video_url, transcript, clips, scores)
+        return clips
+
+    # Keyword scans and window ranking are CPU work: keep them off the event loop
+    return await asyncio.to_thread(rank)
+
+
+def _advance(steps, value=None):
+    # StopIteration can't cross a thread/future boundary, so map it to None
+    try:
+        return steps.send(value)
+    except StopIteration:
+        return None
+
+
+async def transcript_clip_events(transcript, source_type, video_url, options):
+    """Async iter_transcript_clips driving the same transcript_clip_steps generator"""
+    steps = clip_app.transcript_clip_steps(transcript, source_type, video_url, **options)
+    step = await asyncio.to_thread(_advance, steps)
+    while step is not None:
+        event, data = step
+        if event == "score":
+            scores = await score_texts(data)
+            step = await asyncio.to_thread(_advance, steps, scores)
+        else:
+            yield event, data
+            step = await asyncio.to_thread(_advance, steps)
+
+
+async def run_download_command(cmd):
+    """Async run_download_command: await yt-dlp without holding a thread"""
+    async with download_slots():
+        print(f"Running: {' '.join(cmd)}")
+        try:
+            process = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            return False, str(e)
+        try:
+            with metrics.timed("ytdlp"):
+                _, stderr = await asyncio.wait_for(process.communicate(), clip_app.DOWNLOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return False, "Download timeout"
+    if process.returncode == 0:
+        return True, "Success"
+    return False, stderr.decode(errors="replace")
+
+
+def instrumented(endpoint):
+    """Request timing, served bytes and the opt-in X-Profile breakdown, as in the Flask app"""
+    def decorate(handler):
+        async def wrapper(request):
+            start = time.perf_counter()
+            metrics.start_profile(flag(request.headers.get("X-Profile")))
+            response = await handler(request)
+            elapsed = time.perf_counter() - start
+            metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+
+            if isinstance(response, FileResponse):
+                metrics.SERVED_BYTES.observe(os.path.getsize(response.path), endpoint=endpoint)
+            elif isinstance(response, StreamingResponse):
+                response.body_iterator = count_bytes_async(response.body_iterator, endpoint)
+            else:
+                metrics.SERVED_BYTES.observe(len(response.body), endpoint=endpoint)
+
+            profile = metrics.current_profile()
+            if profile is not None and not isinstance(response, StreamingResponse):
+                response.headers["Server-Timing"] = metrics.server_timing(profile, total=elapsed)
+            return response
+        return wrapper
+    return decorate
+
+
+async def count_bytes_async(chunks, endpoint):
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        metrics.SERVED_BYTES.observe(size, endpoint=endpoint)
+
+
+def error_response(message, status):
+    return JSONResponse({"success": False, "error": message}, status_code=status)
+
+
+async def read_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+async def read_analyze_request(request):
+    """(video_url, video id, options, error response) for the analyze endpoints"""
+    data = await read_json(request)
+    video_url = data.get("videoUrl") if data else None
+    if not video_url:
+        return None, None, None, error_response("Missing videoUrl", 400)
+
+    vid_id = clip_app.youtube_id(video_url)
+    if not vid_id:
+        return None, None, None, error_response("Invalid YouTube URL", 400)
+
+    try:
+        options = clip_app.clip_options(data)
+    except (ValueError, TypeError):
+        return None, None, None, error_response("Invalid clipLength or maxClips", 400)
+    return video_url, vid_id, options, None
+
+
+@instrumented("analyze")
+async def analyze(request):
+    video_url, vid_id, options, error = await read_analyze_request(request)
+    if error:
+        return error
+
+    try:
+        transcript, transcript_error = await get_transcript(vid_id)
+        if transcript and len(transcript) > 10:
+            print(f"✅ Got transcript with {len(transcript)} chunks for video {vid_id}")
+            clips = await analyze_transcript(transcript, "YouTube", video_url, options, video_id=vid_id)
+        else:
+            print(f"❌ No transcript for video {vid_id}, error: {transcript_error}")
+            clips = await asyncio.to_thread(clip_app.fallback_clips, vid_id, video_url, transcript_error,
+                                            options)
+
+        return JSONResponse({
+            "success": True,
+            "clips": clips,
+            "canDownloadClips": True,
+            "summary": clip_app.clips_summary(clips, "Content Analysis")
+        })
+    except Exception as e:
+        print(f"Analysis error: {e}")
+        return error_response(str(e), 500)
+
+
+@instrumented("analyze_stream")
+async def analyze_stream(request):
+    video_url, vid_id, options, error = await read_analyze_request(request)
+    if error:
+        return error
+
+    async def events():
+        yield "progress", {"stage": "transcript", "message": "Fetching transcript..."}
+        transcript, transcript_error = await get_transcript(vid_id)
+        scores = None
+
+        if not (transcript and len(transcript) > 10):
+            print(f"❌ No transcript for video {vid_id}, error: {transcript_error}")
+            if clip_app.LOCAL_ASR:
+                yield "progress", {"stage": "asr", "message": "No transcript, transcribing the audio..."}
+            elif clip_app.AUDIO_FALLBACK:
+                yield "progress", {"stage": "audio", "message": "No transcript, analyzing the audio..."}
+            clips = await asyncio.to_thread(clip_app.fallback_clips, vid_id, video_url, transcript_error,
+                                            options)
+            for clip in clips:
+                yield "clip", clip
+        else:
+            print(f"✅ Got transcript with {len(transcript)} chunks for video {vid_id}")
+            yield "progress", {"stage": "transcript", "message": "Transcript fetched", "total": len(transcript)}
+            clips = []
+            async for event, data in transcript_clip_events(transcript, "YouTube", video_url, options):
+                if event == "scores":
+                    scores = data
+                    continue
+                if event == "clip":
+                    clips.append(data)
+                yield event, data
+            clips.sort(key=lambda x: x["viralityScore"], reverse=True)
+
+        yield "summary", {"success": True, "canDownloadClips": True,
+                          "summary": clip_app.clips_summary(clips, "Content Analysis")}
+        if scores is not None:
+            clip_app.index_moments(vid_id, "YouTube", video_url, transcript, clips, scores)
+
+    async def generate():
+        try:
+            async for event, data in events():
+                yield clip_app.sse_event(event, data)
+        except Exception as e:
+            print(f"Streaming analysis error: {e}")
+            yield clip_app.sse_event("error", {"success": False, "error": str(e)})
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@instrumented("download_clip")
+async def download_clip(request):
+    data = await read_json(request) or {}
+    video_url = data.get("videoUrl")
+    start_time = data.get("startTime")
+    end_time = data.get("endTime")
+    hook_text = data.get("hookText", "clip")
+    quality = data.get("quality", DEFAULT_QUALITY)
+
+    if not all([video_url, start_time, end_time]):
+        return error_response("Missing required parameters", 400)
+
+    key, meta = clip_app.clip_store_key(video_url, start_time, end_time, quality)
+
+    async def produce(workdir):
+        output_path = os.path.join(workdir, "clip.%(ext)s")
+        cmd = clip_app.build_download_command(video_url, start_time, end_time, quality, output_path)
+        success, message = await run_download_command(cmd)
+        return success, message, clip_app.find_downloaded_file(workdir) if success else None
+
+    try:
+        path, message = await clip_app.clip_store.get_or_create_async(key, produce, meta=meta)
+    except Exception as e:
+        print(f"Download clip error: {e}")
+        return error_response(str(e), 500)
+    if not path:
+        return error_response(f"Failed to download clip: {message}", 500)
+
+    ext = os.path.splitext(path)[1]
+    filename = clip_app.clip_output_name(hook_text, start_time, end_time) + ext
+    if clip_app.CLIP_ACCEL_PREFIX:
+        headers = clip_app.clip_accel_headers(path, filename)
+        headers["X-Clip-Id"] = clip_app.clip_store.clip_id(path)
+        return Response(media_type=clip_app.clip_mimetype(path), headers=headers)
+    return FileResponse(path, media_type=clip_app.clip_mimetype(path), filename=filename,
+                        headers={"X-Clip-Id": clip_app.clip_store.clip_id(path)})
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    yield
+    await scorer.scorer.aclose()
+    if _youtube is not None:
+        await _youtube.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/analyze", analyze, methods=["POST"]),
+        Route("/api/analyze/stream", analyze_stream, methods=["POST"]),
+        Route("/api/download-clip", download_clip, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(clip_app.app)),
+    ],
+    lifespan=lifespan,
+)
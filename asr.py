@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from highlights import FRAME_SECONDS, SAMPLE_RATE, frame_energies, pcm_chunks
+
+# torch and transformers are imported by the worker processes that load the model
+
+DEFAULT_MODEL = "openai/whisper-base.en"
+# Whisper hears 30 seconds at a time, so chunks stay just under that
+MAX_CHUNK_SECONDS = 28
+# A cut lands at the quietest moment between MIN and MAX seconds into the audio left
+MIN_CHUNK_SECONDS = 10
+# Quietness is judged over this much audio, about a short pause between phrases
+PAUSE_SECONDS = 0.3
+# Chunks whose loudest frame is below this are silence and are not transcribed
+AUDIBLE_DBFS = -50.0
+# Chunks waiting for a worker, per worker, so decoding doesn't run far ahead of transcription
+QUEUED_PER_WORKER = 2
+
+
+def quietest_cut(samples, min_samples, sample_rate=SAMPLE_RATE):
+    """Sample index after min_samples at the centre of the quietest pause in samples"""
+    frame = max(1, int(round(sample_rate * FRAME_SECONDS)))
+    energy = frame_energies([samples], sample_rate)
+    pause = max(1, int(round(PAUSE_SECONDS / FRAME_SECONDS)))
+    first = min_samples // frame
+    if len(energy) - first < pause:
+        return len(samples)
+    windows = np.convolve(energy[first:], np.ones(pause) / pause, mode='valid')
+    return min(len(samples), (first + int(np.argmin(windows)) + pause // 2) * frame)
+
+
+def audible(samples, sample_rate=SAMPLE_RATE):
+    energy = frame_energies([samples], sample_rate)
+    return bool(len(energy)) and 10 * np.log10(float(energy.max()) + 1e-10) > AUDIBLE_DBFS
+
+
+def speech_chunks(chunks, sample_rate=SAMPLE_RATE, max_seconds=MAX_CHUNK_SECONDS,
+                  min_seconds=MIN_CHUNK_SECONDS):
+    """Re-cut a stream of PCM chunks at pauses into (offset seconds, samples) of at most max_seconds.
+
+    Only max_seconds of audio is buffered. Silent pieces are skipped, so
+    offsets are kept to place each piece's text back on the track.
+    """
+    max_samples = int(max_seconds * sample_rate)
+    min_samples = min(int(min_seconds * sample_rate), max_samples)
+    pending = []
+    buffered = 0
+    offset = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        buffered += len(chunk)
+        while buffered >= max_samples:
+            samples = np.concatenate(pending)
+            cut = quietest_cut(samples[:max_samples], min_samples, sample_rate)
+            if audible(samples[:cut], sample_rate):
+                yield offset / sample_rate, samples[:cut]
+            offset += cut
+            pending = [samples[cut:]]
+            buffered = len(samples) - cut
+    if buffered:
+        samples = np.concatenate(pending)
+        if audible(samples, sample_rate):
+            yield offset / sample_rate, samples
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model, threads=1):
+    """Load the speech recognition pipeline once per worker process"""
+    key = (model, os.getpid())
+    loaded = _models.get(key)
+    if loaded is None:
+        with _models_lock:
+            loaded = _models.get(key)
+            if loaded is None:
+                import torch
+                from transformers import pipeline
+
+                # The pool is sized to the cores, so each worker keeps to its own
+                torch.set_num_threads(threads)
+                loaded = pipeline("automatic-speech-recognition", model=model, device="cpu")
+                _models[key] = loaded
+                print(f"Loaded speech model {model} in worker {os.getpid()}")
+    return loaded
+
+
+def whisper_transcribe(samples, sample_rate, model):
+    """[{'start', 'end', 'text'}] for one chunk, in seconds from its start"""
+    recognizer = load_model(model)
+    result = recognizer({"raw": samples, "sampling_rate": sample_rate}, return_timestamps=True)
+    duration = len(samples) / sample_rate
+    segments = []
+    for piece in result.get("chunks") or [{"timestamp": (0.0, duration), "text": result.get("text", "")}]:
+        start, end = piece["timestamp"]
+        start = min(start or 0.0, duration)
+        # The last segment of a chunk often has no end timestamp
+        end = duration if end is None else min(end, duration)
+        segments.append({"start": start, "end": max(end, start), "text": piece["text"]})
+    return segments
+
+
+def transcribe_chunk(transcriber, model, offset, samples, sample_rate):
+    """Run transcriber on one chunk; captions placed on the track at offset"""
+    return [{"start": round(offset + s["start"], 3), "duration": round(s["end"] - s["start"], 3),
+             "text": s["text"].strip()}
+            for s in transcriber(samples, sample_rate, model) if s["text"].strip()]
+
+
+_pools = {}
+# Transcriptions using each pool, current or retired
+_pool_users = {}
+_pools_lock = threading.Lock()
+
+
+def acquire_pool(workers):
+    """Process pool of the given size, kept so models stay loaded; release it with release_pool"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # Fresh interpreters: forking a threaded server (or torch) can deadlock
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[workers] = pool
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+    return pool
+
+
+def release_pool(workers, pool, retire=False):
+    """Done with pool; retire it if a worker hung or died.
+
+    A retired pool gets no new transcriptions, but it is only stopped once
+    none of the ones already using it are left. A timeout therefore never
+    breaks other transcriptions that share the pool.
+    """
+    with _pools_lock:
+        _pool_users[pool] -= 1
+        if retire and _pools.get(workers) is pool:
+            del _pools[workers]
+        stop = not _pool_users[pool] and _pools.get(workers) is not pool
+        if stop:
+            del _pool_users[pool]
+    if stop:
+        # ProcessPoolExecutor can't cancel running tasks, so a hung worker is killed
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+        _pool_users.clear()
+
+
+def transcribe(source, model=DEFAULT_MODEL, workers=None, timeout=None, transcriber=whisper_transcribe,
+               stats=None):
+    """Transcribe a media file or URL offline, as [{'start', 'duration', 'text'}] in time order.
+
+    The audio is decoded as it streams in and cut at pauses; chunks are
+    transcribed in parallel on a process pool while decoding continues.
+    The whole transcription is stopped after ``timeout`` seconds.
+    ``transcriber`` must be a module-level function (it is sent to the
+    workers). ``stats``, if given, gets the audio and chunk counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    pool = acquire_pool(workers)
+    retire = False
+    deadline = time.monotonic() + timeout if timeout else None
+    futures = []
+    queued = set()
+    decoded = 0
+
+    def counted(chunks):
+        nonlocal decoded
+        for chunk in chunks:
+            decoded += len(chunk)
+            yield chunk
+
+    def remaining():
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError()
+        return left
+
+    try:
+        for offset, samples in speech_chunks(counted(pcm_chunks(source, timeout=timeout))):
+            if len(queued) >= workers * QUEUED_PER_WORKER:
+                done, queued = wait(queued, timeout=remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError()
+            future = pool.submit(transcribe_chunk, transcriber, model, offset, samples, SAMPLE_RATE)
+            futures.append(future)
+            queued.add(future)
+        captions = [caption for future in futures for caption in future.result(timeout=remaining())]
+    except BaseException as e:
+        for future in futures:
+            future.cancel()
+        # A worker hung or died (out of memory, say): later calls start a fresh pool
+        retire = isinstance(e, (TimeoutError, BrokenProcessPool))
+        if isinstance(e, TimeoutError):
+            raise RuntimeError("Transcription timeout") from None
+        raise
+    finally:
+        release_pool(workers, pool, retire)
+    if stats is not None:
+        stats.update(audioSeconds=decoded / SAMPLE_RATE, chunks=len(futures), captions=len(captions))
+    return sorted(captions, key=lambda caption: caption["start"])
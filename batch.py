@@ -0,0 +1,180 @@
+"""Analyze many YouTube videos in one run, writing one JSON line per video.
+
+    python batch.py URL [URL ...] --output results.jsonl
+    python batch.py --playlist PLAYLIST_URL --input more_urls.txt --output results.jsonl
+
+Videos already in the output file are skipped, so rerunning after a crash
+picks up where the last run stopped.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class RateLimiter:
+    """Token bucket per host: ``rate`` requests per second with bursts of ``burst``"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        """Block until a request to host is allowed"""
+        if not self.rate or self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                delay = (1 - tokens) / self.rate
+            time.sleep(delay)
+
+
+def retry_call(fn, attempts=4, backoff=1.0, max_delay=30.0, retryable=None):
+    """Call fn(), retrying with exponential backoff and jitter on retryable errors"""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == attempts - 1 or (retryable and not retryable(e)):
+                raise
+            delay = min(max_delay, backoff * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def run_batch(video_ids, fetch, analyze, workers=4, attempts=4, backoff=1.0, retryable=None,
+              fetch_error=str):
+    """Yield (video_id, result) for each video as soon as it is analyzed.
+
+    ``fetch(video_id)`` runs concurrently on ``workers`` threads (retried with
+    backoff); ``analyze(video_id, transcript)`` runs on the caller's thread in
+    completion order, so every video goes through the same batched scorer.
+    At most ``2 * workers`` fetched transcripts wait for analysis at a time.
+    Failures give ``{"success": False, "error": ...}``, with fetch errors
+    worded by ``fetch_error(exception)``.
+    """
+    pending_ids = iter(video_ids)
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-fetch")
+    in_flight = {}
+
+    def fill():
+        while len(in_flight) < 2 * max(1, workers):
+            video_id = next(pending_ids, None)
+            if video_id is None:
+                return
+            future = pool.submit(retry_call, lambda v=video_id: fetch(v), attempts=attempts,
+                                 backoff=backoff, retryable=retryable)
+            in_flight[future] = video_id
+
+    try:
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                video_id = in_flight.pop(future)
+                try:
+                    transcript = future.result()
+                except Exception as e:
+                    yield video_id, {"success": False, "error": fetch_error(e)}
+                    continue
+                try:
+                    result = analyze(video_id, transcript)
+                except Exception as e:
+                    result = {"success": False, "error": str(e)}
+                yield video_id, result
+            fill()
+    finally:
+        # Stop fetching if the consumer goes away (client disconnect, Ctrl-C)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def read_done(path, retry_failed=False):
+    """Video IDs that already have a result line in a JSONL output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Line cut short by a crash
+            if record.get("videoId") and (record.get("success") or not retry_failed):
+                done.add(record["videoId"])
+    return done
+
+
+class JsonlWriter:
+    """Appends one JSON object per line, flushed as each result arrives"""
+
+    def __init__(self, path):
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="*", help="YouTube video URLs")
+    parser.add_argument("--input", help="file with one video URL per line")
+    parser.add_argument("--playlist", action="append", default=[], help="playlist URL (repeatable)")
+    parser.add_argument("--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--clip-length", type=float, help="clip length in seconds")
+    parser.add_argument("--max-clips", type=int, help="clips per video")
+    parser.add_argument("--retry-failed", action="store_true", help="rerun videos that failed last time")
+    args = parser.parse_args()
+
+    # Imported here so app.py can import this module for the batch endpoint
+    import app
+
+    urls = list(args.urls)
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    for playlist_url in args.playlist:
+        urls.extend(app.playlist_video_urls(playlist_url))
+    if not urls:
+        parser.error("no videos given")
+
+    options = app.clip_options({"clipLength": args.clip_length, "maxClips": args.max_clips})
+    skip = read_done(args.output, retry_failed=args.retry_failed)
+    writer = JsonlWriter(args.output)
+    count = failed = 0
+    try:
+        for record in app.analyze_videos(urls, options, skip=skip):
+            writer.write(record)
+            count += 1
+            failed += not record["success"]
+            status = f"{len(record['clips'])} clips" if record["success"] else record["error"]
+            print(f"[{count}] {record['videoId']}: {status}", file=sys.stderr)
+    finally:
+        writer.close()
+    print(f"Done: {count} videos ({failed} failed), {len(skip)} skipped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure offline speech-to-text throughput at several worker counts.
+
+Transcribes a media file with asr.transcribe (no cache) and reports, per
+worker count: seconds of audio, wall time, the realtime factor (wall time per
+second of audio), core-seconds per second of audio (the realtime factor times
+the workers; flat means the work scales to more cores) and the speed-up over
+the first count. Needs ffmpeg, plus requirements-local.txt for the model:
+
+    python benchmarks/bench_asr.py --media talk.mp4 --workers 1 2 4 8
+    python benchmarks/bench_asr.py --media talk.mp4 --stub-rtf 0.2    # chunking and pool only
+
+The first transcription with each worker count loads the model in every
+worker and is not timed.
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asr  # noqa: E402
+from stubs import fake_transcribe  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--media", required=True, help="audio or video file ffmpeg can read")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--model", default=asr.DEFAULT_MODEL)
+    parser.add_argument("--runs", type=int, default=1, help="timed runs per worker count (best is kept)")
+    parser.add_argument("--stub-rtf", type=float, default=None,
+                        help="replace the model with a stand-in busy for this share of the audio")
+    args = parser.parse_args()
+
+    transcriber = asr.whisper_transcribe
+    if args.stub_rtf is not None:
+        transcriber = functools.partial(fake_transcribe, rtf=args.stub_rtf)
+
+    print(f"{'workers':>8} {'audio s':>9} {'chunks':>7} {'captions':>9} {'wall s':>8} {'RTF':>7} "
+          f"{'core-s/s':>9} {'speed-up':>9}")
+    baseline = None
+    try:
+        for workers in args.workers:
+            asr.transcribe(args.media, args.model, workers, transcriber=transcriber)  # warm-up
+            best = None
+            for _ in range(args.runs):
+                stats = {}
+                start = time.perf_counter()
+                asr.transcribe(args.media, args.model, workers, transcriber=transcriber, stats=stats)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            rtf = best / max(stats["audioSeconds"], 1e-9)
+            baseline = baseline or best
+            print(f"{workers:>8} {stats['audioSeconds']:>9.1f} {stats['chunks']:>7} {stats['captions']:>9} "
+                  f"{best:>8.2f} {rtf:>7.3f} {rtf * workers:>9.3f} {baseline / best:>8.2f}x")
+    finally:
+        asr.shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
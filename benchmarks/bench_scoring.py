@@ -0,0 +1,98 @@
+"""Compare serial per-text scoring against batched, concurrent scoring.
+
+Runs a local stub of the Hugging Face inference endpoint that sleeps a fixed
+latency per request, then scores the same texts both ways:
+
+    python benchmarks/bench_scoring.py --texts 60 --latency 0.3
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scoring import SentimentScorer, pick_best  # noqa: E402
+
+
+def fake_scores(text):
+    score = (len(text) % 50) / 100 + 0.4
+    return [
+        {"label": "LABEL_2", "score": score},
+        {"label": "LABEL_1", "score": (1 - score) / 2},
+        {"label": "LABEL_0", "score": (1 - score) / 2},
+    ]
+
+
+def make_handler(latency):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            inputs = json.loads(body)["inputs"]
+            time.sleep(latency)
+            if isinstance(inputs, list):
+                payload = [fake_scores(text) for text in inputs]
+            else:
+                payload = [fake_scores(inputs)]
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def serial_score(url, texts):
+    """The previous behaviour: one blocking request per text"""
+    results = []
+    for text in texts:
+        resp = requests.post(url, json={"inputs": text}, timeout=10)
+        results.append(pick_best(resp.json()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub seconds per request")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    texts = [f"Segment {i}: " + "the key to risk management is sizing " * (1 + i % 4)
+             for i in range(args.texts)]
+
+    start = time.perf_counter()
+    expected = serial_score(url, texts)
+    serial = time.perf_counter() - start
+
+    scorer = SentimentScorer("stub", "stub", batch_size=args.batch_size,
+                             max_workers=args.workers, api_url=url)
+    start = time.perf_counter()
+    got = scorer.score(texts)
+    batched = time.perf_counter() - start
+
+    server.shutdown()
+
+    assert got == expected, "batched results are not aligned with their inputs"
+    print(f"texts={args.texts} latency={args.latency}s "
+          f"batch_size={args.batch_size} workers={args.workers}")
+    print(f"serial:  {serial:.3f}s")
+    print(f"batched: {batched:.3f}s  ({serial / batched:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
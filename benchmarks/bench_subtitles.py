@@ -0,0 +1,117 @@
+"""Compare the streaming SRT/VTT parser against the old read-and-split parser.
+
+Generates multi-hour subtitle files and reports parse time and peak Python
+memory (tracemalloc) for each. "streaming" is the bare parser, consumed
+lazily. "endpoint" is what /api/analyze-srt does with it: hash the upload
+for the cache, then build the whole transcript, which ranking needs. Its
+memory grows with the cue count:
+
+    python benchmarks/bench_subtitles.py --hours 2 6 12
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import stream_key  # noqa: E402
+from subtitles import iter_subtitle_stream  # noqa: E402
+
+WORDS = ("the market moved against my position so I cut the loss early and "
+         "kept my risk per trade small because <i>discipline</i> beats prediction").split()
+
+
+def fmt(seconds, sep):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{sep}{millis:03d}"
+
+
+def write_subtitles(path, hours, vtt=False, cue_seconds=2.5):
+    sep = '.' if vtt else ','
+    with open(path, 'w', encoding='utf-8') as f:
+        if vtt:
+            f.write("WEBVTT\n\n")
+        t, i = 0.0, 1
+        while t < hours * 3600:
+            words = [WORDS[(i * 7 + k) % len(WORDS)] for k in range(6 + i % 8)]
+            f.write(f"{i}\n{fmt(t, sep)} --> {fmt(t + cue_seconds, sep)}\n")
+            f.write(' '.join(words[:5]) + "\n" + ' '.join(words[5:]) + "\n\n")
+            t += cue_seconds
+            i += 1
+    return i - 1
+
+
+def legacy_parse(file_path):
+    """The previous parse_srt_file: read everything, split blocks, regex each one"""
+    transcript = []
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read()
+    for block in re.split(r'\n\s*\n', content.strip()):
+        lines = block.strip().split('\n')
+        if len(lines) >= 3 and ' --> ' in lines[1]:
+            start = lines[1].split(' --> ')[0].strip().split(',')[0]
+            h, m, s = map(int, start.split(':'))
+            text = re.sub(r'<[^>]+>', '', ' '.join(lines[2:])).strip()
+            if text and len(text) > 5:
+                transcript.append({'start': h * 3600 + m * 60 + s, 'text': text})
+    return transcript
+
+
+def streaming_parse(file_path):
+    """Streaming parser fed the raw upload bytes, consumed lazily"""
+    count = 0
+    with open(file_path, 'rb') as f:
+        for _ in iter_subtitle_stream(f):
+            count += 1
+    return count
+
+
+def endpoint_parse(file_path):
+    """read_srt_upload's path: hash the upload for the cache key, then parse it into a list"""
+    with open(file_path, 'rb') as f:
+        stream_key(f)
+        return list(iter_subtitle_stream(f))
+
+
+def measure(fn, path):
+    # Time without tracemalloc (it slows allocation-heavy code), then measure memory
+    start = time.perf_counter()
+    result = fn(path)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = result if isinstance(result, int) else len(result)
+    return elapsed, peak, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, nargs="+", default=[2, 6, 12])
+    parser.add_argument("--vtt", action="store_true", help="generate WebVTT instead of SRT")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for hours in args.hours:
+            path = os.path.join(tmp, f"bench.{'vtt' if args.vtt else 'srt'}")
+            cues = write_subtitles(path, hours, vtt=args.vtt)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{hours:g}h: {cues} cues, {size_mb:.1f} MB")
+
+            runs = [("streaming", streaming_parse), ("endpoint", endpoint_parse)]
+            if not args.vtt:
+                runs.insert(0, ("legacy", legacy_parse))
+            for name, fn in runs:
+                elapsed, peak, count = measure(fn, path)
+                print(f"  {name:<10} {elapsed:7.3f}s  peak {peak / 1e6:8.2f} MB  ({count} segments)")
+
+
+if __name__ == "__main__":
+    main()
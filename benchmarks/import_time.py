@@ -0,0 +1,109 @@
+"""Check the cold-start cost of importing the app.
+
+Imports ``app`` (or ``asgi``) in fresh interpreters from an empty working
+directory and reports the median import time, the slowest modules from an
+``-X importtime`` run, and anything imported at startup that should only load
+when it's used (numpy, requests, the scorer backends...). It also checks that
+importing the app writes nothing to disk. Exits 1 when over budget or when any
+of these checks fail, so it can gate a deploy:
+
+    python benchmarks/import_time.py                  # 300 ms budget
+    python benchmarks/import_time.py --module asgi --budget-ms 600 --allow asyncio httpx
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by the code paths that need them, never at startup
+LAZY_MODULES = ("numpy", "requests", "torch", "transformers", "youtube_transcript_api", "yt_dlp",
+                "httpx", "asyncio", "dotenv", "ranking", "dedup", "highlights", "asr")
+
+TIMED_IMPORT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+'''
+
+
+def run_child(args, workdir):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, *args], capture_output=True, text=True, cwd=workdir, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip()[-2000:])
+    return result
+
+
+def timed_import(module, workdir):
+    """(seconds, loaded module names) for one import of module in a fresh interpreter"""
+    result = run_child(["-c", TIMED_IMPORT.format(root=ROOT, module=module)], workdir)
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["seconds"], data["modules"]
+
+
+def importtime_report(module, workdir):
+    """(self us, cumulative us, name) for every module imported, from -X importtime"""
+    result = run_child(["-X", "importtime", "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import {module}"],
+                       workdir)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="module to import (app or asgi)")
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=300, help="allowed median import time")
+    parser.add_argument("--allow", nargs="+", default=[], help="lazy modules the imported module may load")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="import_time_") as workdir:
+        # The first run warms the OS file cache; only the rest are timed
+        timed_import(args.module, workdir)
+        runs = [timed_import(args.module, workdir) for _ in range(args.runs)]
+        rows = importtime_report(args.module, workdir)
+        written = sorted(os.listdir(workdir))
+
+    times_ms = [seconds * 1000 for seconds, _ in runs]
+    median_ms = statistics.median(times_ms)
+    print(f"import {args.module}: median {median_ms:.1f} ms, min {min(times_ms):.1f} ms, "
+          f"max {max(times_ms):.1f} ms over {len(runs)} runs (budget {args.budget_ms:.0f} ms)")
+
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    print()
+
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    loaded = set(runs[0][1])
+    eager = [name for name in LAZY_MODULES if name in loaded and name not in args.allow]
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if written:
+        failures.append(f"import wrote to the working directory: {', '.join(written)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
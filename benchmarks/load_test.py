@@ -0,0 +1,131 @@
+"""Load-test /api/analyze under gunicorn (sync Flask) and uvicorn (asgi.py).
+
+Starts local stubs for the HF inference API and YouTube (watch page plus
+timed-text captions), each answering after a fixed latency, then boots each
+server against them and fires concurrent analyses of distinct videos (so
+neither the transcript nor the score cache helps). Reports requests per
+second and latency percentiles:
+
+    pip install -r requirements-async.txt
+    python benchmarks/load_test.py --requests 400 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from stubs import make_hf_handler, make_youtube_handler, start_stub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(url + "/api/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def run_load(url, total, concurrency, prefix):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"https://www.youtube.com/watch?v={prefix}{i:07d}")
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                video_url = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    resp = await client.post(url + "/api/analyze", json={"videoUrl": video_url})
+                    ok = resp.status_code == 200 and resp.json().get("success") and \
+                        resp.json()["clips"][0]["category"] != "Unknown Content"
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += not ok
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, sorted(latencies), errors
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--hf-latency", type=float, default=0.2, help="stub seconds per HF request")
+    parser.add_argument("--youtube-latency", type=float, default=0.1, help="stub seconds per YouTube request")
+    parser.add_argument("--captions", type=int, default=200, help="captions per stub transcript")
+    parser.add_argument("--gunicorn-workers", type=int, default=2)
+    parser.add_argument("--gunicorn-threads", type=int, default=8)
+    parser.add_argument("--modes", nargs="+", default=["gunicorn", "uvicorn"], choices=["gunicorn", "uvicorn"])
+    args = parser.parse_args()
+
+    hf, hf_url = start_stub(make_hf_handler(args.hf_latency))
+    youtube, youtube_url = start_stub(make_youtube_handler(args.youtube_latency, args.captions))
+
+    print(f"{args.requests} analyses, concurrency {args.concurrency}, {args.captions} captions each, "
+          f"HF {args.hf_latency}s, YouTube {args.youtube_latency}s")
+    for mode in args.modes:
+        port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, HUGGINGFACE_API_TOKEN="stub", HF_API_URL=hf_url + "/",
+                       YOUTUBE_BASE_URL=youtube_url, CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+                       MOMENT_INDEX_PATH=os.path.join(tmp, "moments.sqlite3"), SCORER_BACKEND="remote")
+            if mode == "gunicorn":
+                cmd = ["gunicorn", "-w", str(args.gunicorn_workers), "--threads", str(args.gunicorn_threads),
+                       "-b", f"127.0.0.1:{port}", "--timeout", "300", "app:app"]
+                label = f"gunicorn ({args.gunicorn_workers} workers x {args.gunicorn_threads} threads)"
+            else:
+                cmd = [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(port),
+                       "--log-level", "warning", "--backlog", "2048"]
+                label = "uvicorn asgi:app (1 process)"
+            process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL)
+            try:
+                url = f"http://127.0.0.1:{port}"
+                wait_ready(url, process)
+                elapsed, latencies, errors = asyncio.run(
+                    run_load(url, args.requests, args.concurrency, prefix=mode[0] * 4))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        print(f"{label}")
+        print(f"  {len(latencies) / elapsed:7.1f} req/s   p50 {percentile(latencies, 50):6.2f}s   "
+              f"p99 {percentile(latencies, 99):6.2f}s   errors {errors}")
+
+    hf.shutdown()
+    youtube.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Stand-ins for the services the pipeline talks to, shared by the benchmarks.
+
+- An HF inference endpoint and a YouTube watch page / timed-text endpoint,
+  served locally and answering after a fixed latency.
+- Synthetic transcripts and SRT files of any length.
+- Fake ``yt-dlp`` and ``ffmpeg`` executables. They sleep, then write a file of
+  the requested size where the real tools would.
+- A speech-to-text stand-in that keeps a core busy for a set share of each
+  chunk's length.
+"""
+import json
+import os
+import random
+import stat
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = ("the market moved against my position so I cut the loss early and kept my risk small "
+         "this secret changed everything why most traders fail is simple you need discipline").split()
+
+
+def caption_text(i, tag=""):
+    """Deterministic caption text, distinct per index (not near-duplicates either); ``tag``
+    keeps runs apart (no cache hits)"""
+    rng = random.Random(i)
+    words = [rng.choice(WORDS) for _ in range(8 + i % 6)]
+    return f"{tag} {' '.join(words)} ({i})".strip()
+
+
+def make_transcript(n, tag="", seconds=3.0):
+    """n captions of ``seconds`` each, shaped like youtube-transcript-api output"""
+    return [{"text": caption_text(i, tag), "start": i * seconds, "duration": seconds} for i in range(n)]
+
+
+def srt_timestamp(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_srt(path, n, tag="", seconds=3.0):
+    """Write an n-cue SRT file"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, caption in enumerate(make_transcript(n, tag, seconds), 1):
+            start = caption["start"]
+            f.write(f"{i}\n{srt_timestamp(start)} --> {srt_timestamp(start + seconds)}\n{caption['text']}\n\n")
+
+
+def fake_scores(text):
+    score = 0.4 + (len(text) % 50) / 100
+    return [{"label": "LABEL_2", "score": score},
+            {"label": "LABEL_1", "score": (1 - score) / 2},
+            {"label": "LABEL_0", "score": (1 - score) / 2}]
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def reply(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_hf_handler(latency):
+    class HFHandler(StubHandler):
+        def do_POST(self):
+            inputs = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["inputs"]
+            time.sleep(latency)
+            items = inputs if isinstance(inputs, list) else [inputs]
+            self.reply(json.dumps([fake_scores(text) for text in items]).encode(), "application/json")
+
+    return HFHandler
+
+
+def make_youtube_handler(latency, captions):
+    """Watch page listing one caption track, and that track as timed-text XML.
+
+    ``captions`` is the transcript length, or a function of the video ID giving it.
+    """
+    class YouTubeHandler(StubHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            video_id = parse_qs(url.query).get("v", [""])[0]
+            time.sleep(latency)
+            if url.path == "/watch":
+                base = f"http://{self.headers['Host']}/timedtext?v={video_id}"
+                tracks = {"playerCaptionsTracklistRenderer": {
+                    "captionTracks": [{"baseUrl": base, "languageCode": "en", "kind": "asr"}]}}
+                page = f'<html><script>var r = {{"captions":{json.dumps(tracks)},"videoDetails":{{}}}};</script></html>'
+                self.reply(page.encode(), "text/html")
+            else:
+                count = captions(video_id) if callable(captions) else captions
+                lines = [f'<text start="{c["start"]}" dur="{c["duration"]}">{c["text"]}</text>'
+                         for c in make_transcript(count, tag=video_id)]
+                self.reply(f"<transcript>{''.join(lines)}</transcript>".encode(), "text/xml")
+
+    return YouTubeHandler
+
+
+def start_stub(handler):
+    """Serve handler on a free local port; returns (server, base URL)"""
+    server = StubServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+FAKE_TOOL = '''#!{python}
+import sys, time
+args = sys.argv[1:]
+time.sleep({latency})
+if "-o" in args:
+    output = args[args.index("-o") + 1].replace("%(ext)s", "mp4")
+    print("[download] 100.0% of ~{size} bytes", flush=True)
+else:
+    output = args[-1]
+with open(output, "wb") as f:
+    f.write(b"\\0" * {size})
+'''
+
+
+def install_fake_tools(bin_dir, latency, size):
+    """Write fake yt-dlp and ffmpeg into bin_dir; put it first on PATH to use them"""
+    os.makedirs(bin_dir, exist_ok=True)
+    for name in ("yt-dlp", "ffmpeg"):
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write(FAKE_TOOL.format(python=sys.executable, latency=latency, size=int(size)))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return bin_dir
+
+
+def fake_transcribe(samples, sample_rate, model, rtf=0.1):
+    """Stand-in for asr.whisper_transcribe: busy for rtf x the chunk's length, one caption per 3 s"""
+    duration = len(samples) / sample_rate
+    # CPU time, so workers sharing a core take longer, as a real model would
+    deadline = time.process_time() + duration * rtf
+    while time.process_time() < deadline:
+        pass
+    return [{"start": start, "end": min(start + 3.0, duration), "text": caption_text(int(start * 10), model)}
+            for start in range(0, int(duration) or 1, 3)]
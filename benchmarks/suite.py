@@ -0,0 +1,407 @@
+"""Benchmark the analysis and download pipeline and compare against a baseline.
+
+Every case runs in its own process against a fresh cache and working
+directory. HF inference and YouTube are served by local stubs, and yt-dlp and
+ffmpeg are replaced by fakes; each answers after a configurable latency. Each
+case first runs one small warm-up request, then the measured ones. It reports:
+
+- latency: mean, p50, p95
+- throughput: requests per second, and captions per second for sized cases
+- peak RSS
+- stage timings per request, from the /api/metrics histograms
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --cases analyze_transcript --sizes 100000
+    python benchmarks/suite.py --output benchmarks/baseline.json   # refresh the baseline
+
+With ``--baseline``, it exits non-zero if any case regressed by more than
+``--threshold``. A regression is a slower p50, lower throughput or higher
+peak RSS.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from stubs import install_fake_tools, make_hf_handler, make_transcript, make_youtube_handler, start_stub, write_srt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 100000 is supported but slow: ~6k HF stub round trips per analysis (minutes per request)
+SIZES = [100, 1000, 10000]
+# metric -> True when a higher value is better
+COMPARED = {"p50": False, "throughput": True, "peakRssMb": False}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Case:
+    """One benchmarked operation: ``prepare(i)`` builds request i untimed, ``run`` times it"""
+
+    sized = True
+
+    def __init__(self, app, size, workdir, config):
+        self.app = app
+        self.size = size
+        self.workdir = workdir
+        self.config = config
+
+    def prepare(self, i):
+        return i
+
+    def run(self, data):
+        raise NotImplementedError
+
+    def srt_file(self, i):
+        path = os.path.join(self.workdir, f"bench_{i}.srt")
+        write_srt(path, self.size, tag=f"run{i}")
+        return path
+
+
+class ParseSrt(Case):
+    """parse_srt_file on an SRT of ``size`` cues"""
+
+    def prepare(self, i):
+        return self.srt_file(i)
+
+    def run(self, path):
+        transcript = self.app.parse_srt_file(path)
+        assert len(transcript) == self.size, f"parsed {len(transcript)} of {self.size} cues"
+
+
+class AnalyzeTranscript(Case):
+    """analyze_transcript_data on ``size`` captions (scoring through the HF stub)"""
+
+    def prepare(self, i):
+        return make_transcript(self.size, tag=f"run{i}")
+
+    def run(self, transcript):
+        assert self.app.analyze_transcript_data(transcript, "SRT"), "no clips"
+
+
+class ApiAnalyze(Case):
+    """POST /api/analyze for a video whose stub transcript has ``size`` captions"""
+
+    endpoint = "/api/analyze"
+
+    def prepare(self, i):
+        return f"https://www.youtube.com/watch?v=bench-{self.size}-{i}"
+
+    def run(self, video_url):
+        resp = self.app.app.test_client().post(self.endpoint, json={"videoUrl": video_url})
+        data = resp.get_json()
+        assert resp.status_code == 200 and data["success"], data
+        assert data["clips"][0]["category"] != "Unknown Content", "got mock clips"
+
+
+class ApiAnalyzeSrt(Case):
+    """POST /api/analyze-srt with an SRT of ``size`` cues"""
+
+    def prepare(self, i):
+        with open(self.srt_file(i), 'rb') as f:
+            return f.read()
+
+    def run(self, srt):
+        resp = self.app.app.test_client().post("/api/analyze-srt", content_type="multipart/form-data",
+                                               data={"srtFile": (io.BytesIO(srt), "bench.srt")})
+        assert resp.status_code == 200 and resp.get_json()["clips"], resp.get_data(as_text=True)[:300]
+
+
+class ApiAnalyzeStream(ApiAnalyze):
+    """POST /api/analyze/stream; also reports the time to the first clip event"""
+
+    endpoint = "/api/analyze/stream"
+
+    def run(self, video_url):
+        start = time.perf_counter()
+        resp = self.app.app.test_client().post(self.endpoint, json={"videoUrl": video_url}, buffered=False)
+        first_clip = None
+        body = []
+        try:
+            for chunk in resp.response:
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if first_clip is None and "event: clip" in chunk:
+                    first_clip = time.perf_counter() - start
+                body.append(chunk)
+        finally:
+            resp.close()
+        text = "".join(body)
+        assert "event: summary" in text and "Unknown Content" not in text, text[-300:]
+        return {"firstClip": first_clip}
+
+
+class ApiDownloadClip(Case):
+    """POST /api/download-clip through the fake yt-dlp (a distinct clip every time)"""
+
+    sized = False
+
+    def prepare(self, i):
+        return {"videoUrl": "https://www.youtube.com/watch?v=bench-download",
+                "startTime": self.app.seconds_to_time(60 * i), "endTime": self.app.seconds_to_time(60 * i + 30)}
+
+    def run(self, body):
+        resp = self.app.app.test_client().post("/api/download-clip", json=body)
+        assert resp.status_code == 200, resp.get_data(as_text=True)[:300]
+        assert len(resp.get_data()) == self.config["clipBytes"]
+
+
+class ApiDownloadClips(Case):
+    """POST /api/download-clips for five clips (fake yt-dlp, then five fake ffmpeg cuts)"""
+
+    sized = False
+
+    def prepare(self, i):
+        clips = [{"startTime": self.app.seconds_to_time(60 * k), "endTime": self.app.seconds_to_time(60 * k + 30),
+                  "hookText": f"clip {k}"} for k in range(5)]
+        return {"videoUrl": f"https://www.youtube.com/watch?v=bench-zip-{i}", "clips": clips}
+
+    def run(self, body):
+        resp = self.app.app.test_client().post("/api/download-clips", json=body)
+        assert resp.status_code == 200, resp.get_data(as_text=True)[:300]
+        names = zipfile.ZipFile(io.BytesIO(resp.get_data())).namelist()
+        assert len(names) == 5, names
+
+
+CASES = {
+    "parse_srt": ParseSrt,
+    "analyze_transcript": AnalyzeTranscript,
+    "api_analyze": ApiAnalyze,
+    "api_analyze_srt": ApiAnalyzeSrt,
+    "api_analyze_stream": ApiAnalyzeStream,
+    "api_download_clip": ApiDownloadClip,
+    "api_download_clips": ApiDownloadClips,
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def stage_deltas(before, after, requests):
+    """Per-request seconds and calls for every stage between two histogram snapshots"""
+    stages = {}
+    for key, (total, count) in after.items():
+        prev_total, prev_count = before.get(key, (0.0, 0))
+        if count > prev_count:
+            stages[dict(key).get("stage", "all")] = {
+                "seconds": round((total - prev_total) / requests, 6),
+                "calls": round((count - prev_count) / requests, 2),
+            }
+    return stages
+
+
+def run_worker(case_name, size, config, result_path):
+    """Run one case in this (fresh) process and write its result as JSON"""
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.chdir(workdir)  # uploads/ and output_clips/ land here, not in the repo
+    os.environ.update({
+        "HUGGINGFACE_API_TOKEN": "stub",
+        "SCORER_BACKEND": "remote",
+        "HF_API_URL": config["hfUrl"],
+        "YOUTUBE_BASE_URL": config["youtubeUrl"],
+        "CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+        "PATH": config["binDir"] + os.pathsep + os.environ.get("PATH", ""),
+    })
+    sys.path.insert(0, ROOT)
+    import app
+    import metrics
+
+    case = CASES[case_name](app, size, workdir, config)
+    requests, concurrency = config["requests"], config["concurrency"]
+    # Warm up imports, keyword tables and connection pools on a small input
+    warmup = CASES[case_name](app, min(size, 100) if size else None, workdir, config)
+    warmup.run(warmup.prepare(0))
+
+    inputs = [case.prepare(i) for i in range(1, requests + 1)]
+    stages_before = metrics.STAGE_SECONDS.totals()
+    hf_before = metrics.HF_REQUEST_SECONDS.totals()
+
+    def timed_run(data):
+        start = time.perf_counter()
+        extra = case.run(data) or {}
+        return time.perf_counter() - start, extra
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        runs = list(pool.map(timed_run, inputs))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for seconds, _ in runs]
+    result = {
+        "case": case_name,
+        "size": size,
+        "requests": requests,
+        "concurrency": concurrency,
+        "mean": round(sum(latencies) / len(latencies), 6),
+        "p50": round(percentile(latencies, 50), 6),
+        "p95": round(percentile(latencies, 95), 6),
+        "throughput": round(requests / elapsed, 3),
+        "peakRssMb": round(peak_rss_mb(), 1),
+        "stages": stage_deltas(stages_before, metrics.STAGE_SECONDS.totals(), requests),
+    }
+    if size:
+        result["captionsPerSecond"] = round(size * requests / elapsed, 1)
+    hf_calls = stage_deltas(hf_before, metrics.HF_REQUEST_SECONDS.totals(), requests)
+    if hf_calls:
+        result["hfRequests"] = hf_calls["all"]
+    first_clips = [extra["firstClip"] for _, extra in runs if extra.get("firstClip") is not None]
+    if first_clips:
+        result["firstClipP50"] = round(percentile(first_clips, 50), 6)
+
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_case(case_name, size, config, verbose):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", case_name, str(size or 0),
+               json.dumps(config), result_path]
+        output = None if verbose else subprocess.DEVNULL
+        proc = subprocess.run(cmd, stdout=output, stderr=None if verbose else subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{case_name} (size {size}) failed:\n{(proc.stderr or '')[-2000:]}")
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_key(result):
+    return result["case"], result["size"]
+
+
+def compare(results, settings, baseline, threshold, min_delta):
+    """Print the change against the baseline per case; returns the regressions.
+
+    Latency and throughput changes only count when p50 moved by at least
+    ``min_delta`` seconds, so sub-millisecond cases don't flap.
+    """
+    previous = {result_key(r): r for r in baseline["results"]}
+    changed = [name for name in settings if baseline["settings"].get(name) != settings[name]]
+    if changed:
+        print(f"warning: baseline was run with different {', '.join(changed)}")
+
+    regressions = []
+    print(f"\n{'case':<22}{'size':>8}  {'metric':<12}{'baseline':>12}{'now':>12}{'change':>9}")
+    for result in results:
+        before = previous.get(result_key(result))
+        if not before:
+            continue
+        timing_noise = abs(result["p50"] - before["p50"]) < min_delta
+        for metric, higher_is_better in COMPARED.items():
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            significant = metric == "peakRssMb" or not timing_noise
+            flag = "  REGRESSION" if worse > threshold and significant else ""
+            if flag:
+                regressions.append((result_key(result), metric, change))
+            print(f"{result['case']:<22}{result['size'] or '-':>8}  {metric:<12}{old:>12.4g}{new:>12.4g}"
+                  f"{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        case_name, size, config, result_path = sys.argv[2:6]
+        run_worker(case_name, int(size) or None, json.loads(config), result_path)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="captions/cues per transcript")
+    parser.add_argument("--requests", type=int, default=3, help="measured requests per case and size")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--hf-latency", type=float, default=0.02, help="stub seconds per HF request")
+    parser.add_argument("--youtube-latency", type=float, default=0.05, help="stub seconds per YouTube request")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="seconds per fake yt-dlp/ffmpeg run")
+    parser.add_argument("--clip-mb", type=float, default=4, help="size of each fake downloaded/cut file")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed regression, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=0.005,
+                        help="ignore latency/throughput changes when p50 moved less than this (s)")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own output")
+    args = parser.parse_args()
+
+    hf, hf_url = start_stub(make_hf_handler(args.hf_latency))
+    youtube, youtube_url = start_stub(make_youtube_handler(
+        args.youtube_latency, lambda video_id: int(video_id.split("-")[1])))
+    bin_dir = tempfile.mkdtemp(prefix="bench_bin_")
+    settings = {
+        "hfLatency": args.hf_latency,
+        "youtubeLatency": args.youtube_latency,
+        "toolLatency": args.tool_latency,
+        "clipBytes": int(args.clip_mb * 1024 * 1024),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    install_fake_tools(bin_dir, args.tool_latency, settings["clipBytes"])
+    config = dict(settings, hfUrl=hf_url + "/", youtubeUrl=youtube_url, binDir=bin_dir)
+
+    results = []
+    print(f"{'case':<22}{'size':>8}{'p50 s':>10}{'p95 s':>10}{'req/s':>9}{'rss MB':>9}  slowest stages")
+    try:
+        for case_name in args.cases:
+            for size in (args.sizes if CASES[case_name].sized else [None]):
+                result = run_case(case_name, size, config, args.verbose)
+                results.append(result)
+                stages = sorted(result["stages"].items(), key=lambda item: -item[1]["seconds"])[:3]
+                summary = ", ".join(f"{name} {info['seconds']:.3f}s" for name, info in stages)
+                print(f"{case_name:<22}{size or '-':>8}{result['p50']:>10.4f}{result['p95']:>10.4f}"
+                      f"{result['throughput']:>9.2f}{result['peakRssMb']:>9.1f}  {summary}", flush=True)
+    finally:
+        hf.shutdown()
+        youtube.shutdown()
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    report = {
+        "meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "settings": settings,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, settings, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
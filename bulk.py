@@ -0,0 +1,104 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+
+class _ZipSink:
+    """Unseekable write target that hands buffered ZIP bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def merged_span(clips):
+    """Return (start, end) seconds covering every clip range"""
+    return min(c["start"] for c in clips), max(c["end"] for c in clips)
+
+
+def cut_segment(source, output_path, start, end, timeout=300):
+    """Cut [start, end) seconds out of a local file with ffmpeg stream copy"""
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-ss', f"{start:.3f}", '-i', source,
+        '-t', f"{end - start:.3f}",
+        '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+        output_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False, "Cut timeout"
+    if result.returncode != 0 or not os.path.exists(output_path):
+        return False, result.stderr
+    return True, "Success"
+
+
+def stream_clips_zip(source, clips, offset, workdir, max_workers=4, cleanup=True, cut=cut_segment):
+    """Cut clips from a local source in parallel and yield a ZIP as each one finishes.
+
+    ``clips`` are dicts with ``start``/``end`` in seconds of the original video and an
+    ``name`` for the archive entry; ``offset`` is where ``source`` starts in that
+    timeline. Files are copied into the archive in chunks, so neither the archive
+    nor any clip is held in memory. ``cut(source, output_path, start, end)`` does
+    each cut (plain stream copy by default).
+    """
+    sink = _ZipSink()
+    ext = os.path.splitext(source)[1] or '.mp4'
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool, \
+                zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            futures = {}
+            for i, clip in enumerate(clips):
+                output_path = os.path.join(workdir, f"clip_{i}{ext}")
+                future = pool.submit(cut, source, output_path,
+                                     max(0.0, clip["start"] - offset), clip["end"] - offset)
+                futures[future] = (clip, output_path)
+
+            failures = []
+            for future in as_completed(futures):
+                clip, output_path = futures[future]
+                success, message = future.result()
+                if not success:
+                    print(f"Cut failed for {clip['name']}: {message}")
+                    failures.append(f"{clip['name']}: {message}")
+                    continue
+
+                with open(output_path, 'rb') as src, \
+                        archive.open(clip["name"] + ext, 'w', force_zip64=True) as dst:
+                    while True:
+                        chunk = src.read(ZIP_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield sink.drain()
+                os.remove(output_path)
+                yield sink.drain()
+
+            if failures:
+                archive.writestr("errors.txt", "\n".join(failures) + "\n")
+        yield sink.drain()
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def make_workdir(parent):
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix="bulk_", dir=parent)
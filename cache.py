@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def content_key(*parts):
+    """Hash the given strings/bytes into a stable cache key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def stream_key(stream, chunk_size=1024 * 1024):
+    """Hash a seekable binary stream in chunks, then rewind it"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    # Same key content_key() gives for the whole content as one part
+    digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Persistent JSON cache in SQLite with TTL expiry and LRU eviction by size"""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._bytes = None
+        self._counters = {}
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    ns TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (ns, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, ns, hits, misses):
+        with self._lock:
+            counter = self._counters.setdefault(ns, {"hits": 0, "misses": 0})
+            counter["hits"] += hits
+            counter["misses"] += misses
+
+    def get_many(self, ns, keys):
+        """Return {key: value} for the keys that are cached and not expired"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        conn = self._conn()
+        now = time.time()
+        found = {}
+        expired = []
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value, created FROM entries WHERE ns = ? AND key IN ({placeholders})",
+                [ns, *chunk]
+            ).fetchall()
+            for key, value, created in rows:
+                if self.ttl and now - created > self.ttl:
+                    expired.append(key)
+                else:
+                    found[key] = json.loads(value)
+
+        if found:
+            touched = list(found)
+            for i in range(0, len(touched), 500):
+                chunk = touched[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(
+                    f"UPDATE entries SET accessed = ? WHERE ns = ? AND key IN ({placeholders})",
+                    [now, ns, *chunk]
+                )
+        if expired:
+            self.delete_many(ns, expired)
+
+        self._count(ns, len(found), len(keys) - len(found))
+        return found
+
+    def get(self, ns, key):
+        return self.get_many(ns, [key]).get(key)
+
+    def set_many(self, ns, items):
+        """Store {key: value}, then evict least recently used entries over the size budget"""
+        if not items:
+            return
+
+        conn = self._conn()
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            data = json.dumps(value, separators=(',', ':'))
+            rows.append((ns, key, data, len(data), now, now))
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._total_bytes(conn)
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+            # Overwrites make this an overestimate; _evict recounts exactly before deleting
+            self._bytes += sum(row[3] for row in rows)
+            if self.max_bytes and self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def set(self, ns, key, value):
+        self.set_many(ns, {key: value})
+
+    def delete_many(self, ns, keys):
+        conn = self._conn()
+        with self._lock:
+            for key in keys:
+                conn.execute("DELETE FROM entries WHERE ns = ? AND key = ?", (ns, key))
+            self._bytes = None
+
+    def _total_bytes(self, conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self, conn):
+        """Drop expired entries, then oldest-accessed until under 90% of the budget"""
+        if self.ttl:
+            conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,))
+        self._bytes = self._total_bytes(conn)
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = conn.execute(
+                "SELECT ns, key, size FROM entries ORDER BY accessed LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM entries WHERE ns = ? AND key = ?",
+                             [(ns, key) for ns, key, _ in rows])
+            self._bytes -= sum(size for _, _, size in rows)
+
+    def stats(self):
+        """Per-namespace hit/miss counters for this process plus on-disk totals"""
+        with self._lock:
+            counters = {ns: dict(c) for ns, c in self._counters.items()}
+        try:
+            # Nothing written yet: report an empty cache rather than create it
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone() if os.path.exists(self.path) else (0, 0)
+        except (sqlite3.Error, OSError) as e:
+            return {"error": str(e), "namespaces": counters}
+        return {
+            "entries": entries,
+            "bytes": size,
+            "maxBytes": self.max_bytes,
+            "hits": sum(c["hits"] for c in counters.values()),
+            "misses": sum(c["misses"] for c in counters.values()),
+            "namespaces": counters
+        }
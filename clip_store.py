@@ -0,0 +1,223 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from cache import content_key
+
+
+class _Flight:
+    """A download in progress that concurrent identical requests can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+        self.message = None
+        # The leader's own request was cancelled: waiters retry rather than share that result
+        self.cancelled = False
+
+
+class ClipStore:
+    """Downloaded clips keyed by (video, start, end, format) with LRU eviction by disk usage"""
+
+    def __init__(self, folder, max_bytes=2 * 1024 * 1024 * 1024):
+        # Absolute, so send_file doesn't resolve paths against the app root instead of the cwd
+        self.folder = os.path.abspath(folder)
+        self.index_path = os.path.join(self.folder, "index.sqlite3")
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._counters = {"hits": 0, "misses": 0, "shared": 0, "evicted": 0}
+
+    @staticmethod
+    def key(video_id, start, end, fmt):
+        return content_key(video_id, str(start), str(end), fmt)[:32]
+
+    @staticmethod
+    def clip_id(path):
+        """The key a stored clip's file is named after (its ID for lookup)"""
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.folder, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    video_id TEXT,
+                    start TEXT,
+                    end TEXT,
+                    format TEXT,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS clips_accessed ON clips (accessed)")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def lookup(self, key):
+        """Return the cached file for a key, or None (dropping index rows whose file vanished)"""
+        conn = self._conn()
+        row = conn.execute("SELECT path FROM clips WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if not os.path.exists(row[0]):
+            conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE clips SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def get_or_create(self, key, producer, meta=None, cancelled=None):
+        """Return (path, message) for a clip, downloading it at most once at a time.
+
+        ``producer(workdir)`` downloads into a private directory and returns
+        ``(success, message, path)``. Concurrent callers for the same key wait on
+        the first caller's download instead of starting their own. If that
+        caller is cancelled, they start over and one of them takes its place.
+        """
+        while True:
+            path, flight, leader = self._begin(key)
+            if path:
+                return path, "Cached"
+            if leader:
+                break
+            while not flight.done.wait(0.5):
+                if cancelled is not None and cancelled.is_set():
+                    return None, "Cancelled"
+            if not flight.cancelled:
+                return flight.path, flight.message
+
+        workdir = None
+        try:
+            workdir = self._workdir(key)
+            self._store(key, flight, producer(workdir), meta)
+        except Exception as e:
+            flight.message = str(e)
+        finally:
+            flight.cancelled = flight.path is None and cancelled is not None and cancelled.is_set()
+            self._end(key, flight, workdir)
+        return flight.path, flight.message
+
+    async def get_or_create_async(self, key, producer, meta=None):
+        """get_or_create for asyncio: ``producer(workdir)`` is a coroutine function"""
+        import asyncio
+
+        while True:
+            path, flight, leader = self._begin(key)
+            if path:
+                return path, "Cached"
+            if leader:
+                break
+            # The leader may be a worker thread or another task: poll rather than block the loop
+            while not flight.done.is_set():
+                await asyncio.sleep(0.2)
+            if not flight.cancelled:
+                return flight.path, flight.message
+
+        workdir = None
+        try:
+            workdir = self._workdir(key)
+            self._store(key, flight, await producer(workdir), meta)
+        except asyncio.CancelledError:
+            flight.cancelled = True
+            raise
+        except Exception as e:
+            flight.message = str(e)
+        finally:
+            self._end(key, flight, workdir)
+        return flight.path, flight.message
+
+    def _begin(self, key):
+        """(cached path, flight, is leader) for a request"""
+        path = self.lookup(key)
+        if path:
+            self._count("hits")
+            return path, None, False
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        self._count("misses" if leader else "shared")
+        return None, flight, leader
+
+    def _workdir(self, key):
+        os.makedirs(self.folder, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f".{key}.", dir=self.folder)
+
+    def _store(self, key, flight, produced, meta):
+        success, message, path = produced
+        flight.message = message
+        if success and path and os.path.exists(path):
+            dest = os.path.join(self.folder, key + os.path.splitext(path)[1])
+            os.replace(path, dest)
+            self._record(key, dest, meta or {})
+            flight.path = dest
+        elif success:
+            flight.message = "Downloaded file not found"
+
+    def _end(self, key, flight, workdir):
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.done.set()
+
+    def _record(self, key, path, meta):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, path, os.path.getsize(path), meta.get("videoId"), str(meta.get("start")),
+             str(meta.get("end")), meta.get("format"), now, now)
+        )
+        self._evict(conn, keep=key)
+
+    def _evict(self, conn, keep):
+        """Delete least recently used clips until the folder is within budget"""
+        if not self.max_bytes:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, path, size in conn.execute(
+            "SELECT key, path, size FROM clips WHERE key != ? ORDER BY accessed", (keep,)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Clip eviction error for {path}: {e}")
+                continue
+            conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+            total -= size
+            self._count("evicted")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        try:
+            # Nothing stored yet: report an empty store rather than create it
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips"
+            ).fetchone() if os.path.exists(self.index_path) else (0, 0)
+        except (sqlite3.Error, OSError) as e:
+            return {"error": str(e), **counters}
+        return {"entries": entries, "bytes": size, "maxBytes": self.max_bytes, **counters}
@@ -0,0 +1,29 @@
+"""Environment settings, resolved once at startup.
+
+A ``.env`` file is loaded only when there is one (python-dotenv is imported
+just for that), then the environment is copied into a read-only mapping.
+Modules read their settings from ``ENV`` at import time, so every one of them
+sees the same values and nothing re-reads the environment per request.
+"""
+import os
+from types import MappingProxyType
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_env(paths=None):
+    """Load the first existing .env (cwd, then next to the app) and snapshot os.environ"""
+    for path in paths or (os.path.join(os.getcwd(), ".env"), os.path.join(ROOT, ".env")):
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            break
+    return MappingProxyType(dict(os.environ))
+
+
+def flag(value):
+    """Truthy env value: 1/true/yes"""
+    return (value or "").lower() in ("1", "true", "yes")
+
+
+ENV = load_env()
@@ -0,0 +1,221 @@
+import bisect
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# Video codecs we can re-encode a GOP head in. Head and tail are written as
+# Matroska and joined by the concat demuxer, which moves H.264 parameter sets
+# in-band so the re-encoded head and the copied tail can each carry their own.
+HEAD_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18"],
+    "hevc": ["-c:v", "libx265", "-preset", "veryfast", "-crf", "20"],
+    "vp9": ["-c:v", "libvpx-vp9", "-crf", "30", "-b:v", "0", "-deadline", "realtime", "-cpu-used", "8"],
+}
+# Whole-clip re-encode when the codec can't be smart-cut, per output container
+FALLBACK_ENCODERS = {
+    ".webm": ["-c:v", "libvpx-vp9", "-crf", "30", "-b:v", "0", "-deadline", "realtime", "-cpu-used", "8",
+              "-c:a", "libopus"],
+    "": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-c:a", "aac"],
+}
+# ffprobe's H.264 profile names -> x264's, so the re-encoded head matches the copied tail
+X264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+                 "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444"}
+DEFAULT_FRAME_SECONDS = 1 / 30
+
+
+class MediaInfo:
+    """What a cut needs to know about a local media file, probed once"""
+
+    def __init__(self, keyframes, codec=None, profile=None, pix_fmt=None, frame_seconds=DEFAULT_FRAME_SECONDS):
+        self.keyframes = keyframes
+        self.codec = codec
+        self.profile = profile
+        self.pix_fmt = pix_fmt
+        self.frame_seconds = frame_seconds
+
+    def keyframe_at_or_after(self, seconds):
+        """First keyframe time >= seconds (within half a frame), or None"""
+        i = bisect.bisect_left(self.keyframes, seconds - self.frame_seconds / 2)
+        return self.keyframes[i] if i < len(self.keyframes) else None
+
+
+def frame_seconds(rate):
+    """Seconds per frame from an ffprobe rate like "30000/1001" """
+    try:
+        num, _, den = rate.partition("/")
+        fps = float(num) / float(den or 1)
+    except (AttributeError, ValueError, ZeroDivisionError):
+        return DEFAULT_FRAME_SECONDS
+    return 1 / fps if fps > 0 else DEFAULT_FRAME_SECONDS
+
+
+def probe_media(path, timeout=120):
+    """Read stream details and every video keyframe time with ffprobe (packets only, no decoding)"""
+    streams_cmd = ['ffprobe', '-v', 'error', '-show_entries',
+                   'stream=index,codec_type,codec_name,profile,pix_fmt,avg_frame_rate', '-of', 'json', path]
+    result = subprocess.run(streams_cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()[-300:]}")
+    streams = json.loads(result.stdout).get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise RuntimeError("No video stream")
+
+    packets_cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+                   '-of', 'csv=p=0', path]
+    result = subprocess.run(packets_cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.strip()[-300:]}")
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+
+    return MediaInfo(
+        sorted(set(keyframes)),
+        codec=video.get("codec_name"),
+        profile=video.get("profile"),
+        pix_fmt=video.get("pix_fmt"),
+        frame_seconds=frame_seconds(video.get("avg_frame_rate")),
+    )
+
+
+def _run(cmd, timeout):
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return False, "Cut timeout"
+    if result.returncode != 0:
+        return False, result.stderr
+    return True, "Success"
+
+
+def _seconds(value):
+    return f"{value:.6f}"
+
+
+class ClipCutter:
+    """Frame-accurate cuts from local media that stream-copy everything they can.
+
+    Keyframe times are probed once per file (keyed by path, size and mtime)
+    and kept for the ``max_files`` most recently cut files. A cut that starts
+    on a keyframe is a plain stream copy. Otherwise only the head, up to the
+    next keyframe, is re-encoded; the rest of the video is copied and the two
+    are joined, and the audio is copied over the whole range.
+    """
+
+    def __init__(self, max_files=64, timeout=300):
+        self.max_files = max_files
+        self.timeout = timeout
+        self._media = OrderedDict()
+        self._lock = threading.Lock()
+
+    def media_info(self, path):
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            info = self._media.get(key)
+            if info is not None:
+                self._media.move_to_end(key)
+                return info
+        with metrics.timed("keyframe_probe"):
+            info = probe_media(path, timeout=self.timeout)
+        with self._lock:
+            self._media[key] = info
+            while len(self._media) > self.max_files:
+                self._media.popitem(last=False)
+        return info
+
+    def cut(self, source, output_path, start, end):
+        """Cut [start, end) seconds of source into output_path; returns (success, message)"""
+        with metrics.timed("cut"):
+            try:
+                info = self.media_info(source)
+            except Exception as e:
+                print(f"Keyframe probe failed for {source}: {e}")
+                return self.reencode(source, output_path, start, end)
+
+            keyframe = info.keyframe_at_or_after(start)
+            # No frame falls between start and the keyframe: the cut already lines up
+            if keyframe is not None and keyframe - start < info.frame_seconds:
+                return self.copy(source, output_path, keyframe, end)
+            if keyframe is None or keyframe >= end - info.frame_seconds or info.codec not in HEAD_ENCODERS:
+                # No keyframe inside the clip (or no encoder to match): the whole clip is the head
+                return self.reencode(source, output_path, start, end)
+            return self.smart_cut(source, output_path, start, end, keyframe, info)
+
+    def copy(self, source, output_path, start, end):
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-ss', _seconds(start), '-i', source, '-t', _seconds(end - start),
+            '-map', '0:v:0', '-map', '0:a:0?', '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+            output_path
+        ]
+        return self._finish(_run(cmd, self.timeout), output_path)
+
+    def reencode(self, source, output_path, start, end):
+        ext = os.path.splitext(output_path)[1].lower()
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-ss', _seconds(start), '-i', source, '-t', _seconds(end - start),
+            '-map', '0:v:0', '-map', '0:a:0?', *FALLBACK_ENCODERS.get(ext, FALLBACK_ENCODERS[""]),
+            output_path
+        ]
+        return self._finish(_run(cmd, self.timeout), output_path)
+
+    def smart_cut(self, source, output_path, start, end, keyframe, info):
+        """Re-encode [start, keyframe), copy [keyframe, end), then copy the audio over the lot"""
+        workdir = tempfile.mkdtemp(prefix="cut_", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            head = os.path.join(workdir, "head.mkv")
+            tail = os.path.join(workdir, "tail.mkv")
+            parts = os.path.join(workdir, "parts.txt")
+
+            head_cmd = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+                '-ss', _seconds(start), '-i', source, '-t', _seconds(keyframe - start),
+                '-map', '0:v:0', '-an', *HEAD_ENCODERS[info.codec]
+            ]
+            if info.pix_fmt:
+                head_cmd += ['-pix_fmt', info.pix_fmt]
+            if info.codec == "h264" and info.profile in X264_PROFILES:
+                head_cmd += ['-profile:v', X264_PROFILES[info.profile]]
+            head_cmd.append(head)
+
+            # Seek a hair past the keyframe so rounding can't land on the GOP before it
+            tail_start = keyframe + min(0.001, info.frame_seconds / 4)
+            tail_cmd = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+                '-ss', _seconds(tail_start), '-i', source, '-t', _seconds(end - keyframe),
+                '-map', '0:v:0', '-an', '-c', 'copy', tail
+            ]
+            for cmd in (head_cmd, tail_cmd):
+                success, message = _run(cmd, self.timeout)
+                if not success:
+                    return False, message
+
+            with open(parts, 'w') as f:
+                f.write(f"file '{head}'\nfile '{tail}'\n")
+            join_cmd = [
+                'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+                '-f', 'concat', '-safe', '0', '-i', parts,
+                '-ss', _seconds(start), '-i', source,
+                '-map', '0:v:0', '-map', '1:a:0?', '-c', 'copy', '-t', _seconds(end - start),
+                output_path
+            ]
+            return self._finish(_run(join_cmd, self.timeout), output_path)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _finish(self, outcome, output_path):
+        success, message = outcome
+        if success and not os.path.exists(output_path):
+            return False, "Cut produced no file"
+        return success, message
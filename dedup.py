@@ -0,0 +1,177 @@
+import re
+
+import numpy as np
+
+SHINGLE_CHARS = 5
+NUM_PERM = 96
+BANDS = 16
+# Candidates whose MinHash agreement is this far under the threshold skip the exact check
+ESTIMATE_SLACK = 0.15
+# Texts hashed per pass, which bounds the temporary arrays
+CHUNK_TEXTS = 2048
+# Fixed multiply-shift hash functions (odd multipliers), so groups are the same from run to run
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+_NOISE_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Lowercase, without punctuation and with single spaces"""
+    return _SPACE_RE.sub(" ", _NOISE_RE.sub(" ", text.lower())).strip()
+
+
+def shingles(text, size=SHINGLE_CHARS):
+    """Character shingles of normalized text (short texts are padded to one shingle)"""
+    text = text.ljust(size)
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def shingle_hashes(texts, size=SHINGLE_CHARS):
+    """32-bit hash of every shingle of every normalized text, and where each text's run starts"""
+    texts = [text.ljust(size) for text in texts]
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    text_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    counts = lengths - size + 1
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # Position of each shingle's first character in the joined text
+    positions = np.arange(int(counts.sum())) + np.repeat(text_starts - offsets, counts)
+
+    # Polynomial hash of the window, wrapping at 64 bits, then folded to 32
+    hashes = np.zeros(len(positions), dtype=np.uint64)
+    for k in range(size):
+        hashes = hashes * np.uint64(1000003) + codes[positions + k]
+    hashes = (hashes * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+    return hashes, offsets
+
+
+def minhash_signatures(texts):
+    """(len(texts), NUM_PERM) MinHash signatures over the shingles of normalized texts"""
+    signatures = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for start in range(0, len(texts), CHUNK_TEXTS):
+        hashes, offsets = shingle_hashes(texts[start:start + CHUNK_TEXTS])
+        block = signatures[start:start + CHUNK_TEXTS]
+        for p in range(NUM_PERM):
+            permuted = (_A[p] * hashes + _B[p]) >> np.uint64(32)
+            block[:, p] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+def _shingle_set(sets, texts, i):
+    shingle_set = sets.get(i)
+    if shingle_set is None:
+        shingle_set = sets[i] = shingles(texts[i])
+    return shingle_set
+
+
+class _Groups:
+    """Union-find whose root is always the group's lowest index"""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def duplicate_groups(texts, threshold=0.8):
+    """Group near-duplicate texts; returns each text's representative index.
+
+    Texts that are identical once normalized are grouped outright. The rest are
+    compared by MinHash over character shingles, bucketed with LSH so only
+    texts sharing a bucket are checked, and joined when the Jaccard similarity
+    of their shingles is at least ``threshold``. The representative is the
+    first text of each group; empty texts are their own group. Roughly linear
+    in the number of texts.
+    """
+    n = len(texts)
+    groups = _Groups(n)
+    first_seen = {}
+    distinct = []
+    norms = []
+    for i, text in enumerate(texts):
+        norm = normalize_text(text) if text else ""
+        if not norm:
+            continue
+        if norm in first_seen:
+            groups.union(first_seen[norm], i)
+        else:
+            first_seen[norm] = i
+            distinct.append(i)
+            norms.append(norm)
+
+    if threshold < 1 and len(distinct) > 1:
+        signatures = minhash_signatures(norms)
+        sets = {}
+        rows = NUM_PERM // BANDS
+        for band in range(BANDS):
+            # One 64-bit key per band (wrapping multiply-add of its rows)
+            keys = np.zeros(len(norms), dtype=np.uint64)
+            for r in range(band * rows, (band + 1) * rows):
+                keys = keys * np.uint64(0x100000001B3) + signatures[:, r]
+            _, buckets = np.unique(keys, return_inverse=True)
+            buckets = buckets.reshape(-1)
+            # Only texts sharing a bucket with a text from another group need a closer look,
+            # and then only one text per group in that bucket
+            shared = np.flatnonzero(np.bincount(buckets)[buckets] > 1)
+            if not len(shared):
+                continue
+            roots = np.fromiter((groups.find(distinct[k]) for k in shared.tolist()), dtype=np.int64,
+                                count=len(shared))
+            order = np.lexsort((roots, buckets[shared]))
+            shared, roots = shared[order], roots[order]
+            first = np.ones(len(shared), dtype=bool)
+            first[1:] = (np.diff(buckets[shared]) != 0) | (np.diff(roots) != 0)
+            shared = shared[first]
+            shared = shared[np.bincount(buckets[shared])[buckets[shared]] > 1]
+            heads, current = [], None
+            for k, bucket in zip(shared.tolist(), buckets[shared].tolist()):
+                if bucket != current:
+                    heads, current = [], bucket
+                # Check each member against the bucket's distinct clusters so far, not every pair,
+                # and only those whose signatures roughly agree against the exact shingles
+                root = groups.find(distinct[k])
+                close = []
+                if heads:
+                    agreement = np.count_nonzero(signatures[heads] == signatures[k], axis=1) / NUM_PERM
+                    close = [heads[x] for x in np.flatnonzero(agreement >= threshold - ESTIMATE_SLACK)]
+                for h in close:
+                    if groups.find(distinct[h]) == root or \
+                            jaccard(_shingle_set(sets, norms, h), _shingle_set(sets, norms, k)) >= threshold:
+                        groups.union(distinct[h], distinct[k])
+                        break
+                else:
+                    heads.append(k)
+
+    return np.fromiter((groups.find(i) for i in range(n)), dtype=np.int64, count=n)
+
+
+def representatives(groups):
+    """Indices of the texts that stand for their group"""
+    return np.flatnonzero(groups == np.arange(len(groups)))
+
+
+def spread(values, reps, groups):
+    """Per-text array from one value per representative"""
+    out = np.zeros(len(groups), dtype=np.float64)
+    out[reps] = values
+    return out[groups]
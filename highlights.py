@@ -0,0 +1,234 @@
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+from ranking import SegmentRanker
+
+SAMPLE_RATE = 16000
+# Audio decoded per read from ffmpeg, so memory stays flat however long the track is
+CHUNK_SECONDS = 10
+# Loudness is measured per frame, then features are kept per step
+FRAME_SECONDS = 0.02
+STEP_SECONDS = 1.0
+# A step's loudness is compared with the average of this much audio around it
+BASELINE_SECONDS = 60
+# Speech rate is averaged over this much audio (a second holds only a few syllables)
+RATE_SECONDS = 3
+# Frames this far above the track's noise floor are voiced
+VOICED_DB = 10.0
+SILENCE_DBFS = -60.0
+# A syllable nucleus is a voiced loudness peak rising this far above the dip just before it
+NUCLEUS_RISE_DB = 4.0
+NUCLEUS_LOOKBACK_SECONDS = 0.2
+# Share of the highlight score from loudness; the rest is speech rate
+LOUDNESS_WEIGHT = 0.6
+# Windows with less voiced audio than this are never highlights
+MIN_VOICED = 0.25
+
+
+def pcm_chunks(source, sample_rate=SAMPLE_RATE, chunk_seconds=CHUNK_SECONDS, timeout=None):
+    """Decode source's first audio stream to mono float32 PCM with ffmpeg, chunk_seconds at a time.
+
+    ``source`` is a file path or a URL ffmpeg can read. The decoder is killed
+    if it runs past ``timeout`` seconds or the generator is closed early.
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin', '-i', source,
+        '-map', '0:a:0', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-'
+    ]
+    chunk_bytes = int(sample_rate * chunk_seconds) * 2
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        try:
+            while True:
+                data = process.stdout.read(chunk_bytes)
+                if not data:
+                    break
+                samples = np.frombuffer(data, dtype='<i2', count=len(data) // 2)
+                yield samples.astype(np.float32) / 32768
+        finally:
+            if timer:
+                timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            returncode = process.wait()
+        if timed_out.is_set():
+            raise RuntimeError("Audio decode timeout")
+        if returncode != 0:
+            errors.seek(0)
+            raise RuntimeError(f"ffmpeg failed: {errors.read().decode(errors='replace').strip()[-300:]}")
+
+
+class AudioFeatures:
+    """Per-step loudness (dBFS), speech rate (syllables per second) and voiced fraction of a track"""
+
+    def __init__(self, loudness, speech_rate, voiced, step=STEP_SECONDS):
+        self.loudness = np.asarray(loudness, dtype=np.float64)
+        self.speech_rate = np.asarray(speech_rate, dtype=np.float64)
+        self.voiced = np.asarray(voiced, dtype=np.float64)
+        self.step = step
+
+    def __len__(self):
+        return len(self.loudness)
+
+    @property
+    def duration(self):
+        return len(self) * self.step
+
+    def to_dict(self):
+        return {
+            "step": self.step,
+            "loudness": np.round(self.loudness, 2).tolist(),
+            "speechRate": np.round(self.speech_rate, 2).tolist(),
+            "voiced": np.round(self.voiced, 3).tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["loudness"], data["speechRate"], data["voiced"], step=data["step"])
+
+
+def frame_energies(chunks, sample_rate=SAMPLE_RATE, frame_seconds=FRAME_SECONDS):
+    """Mean-square energy of each frame across a stream of PCM chunks"""
+    frame = max(1, int(round(sample_rate * frame_seconds)))
+    energies = []
+    carry = np.zeros(0, dtype=np.float32)
+    for chunk in chunks:
+        samples = np.concatenate((carry, chunk)) if len(carry) else chunk
+        usable = len(samples) // frame * frame
+        if usable:
+            frames = samples[:usable].reshape(-1, frame).astype(np.float64)
+            energies.append(np.einsum('ij,ij->i', frames, frames) / frame)
+        carry = samples[usable:]
+    if len(carry):
+        energies.append([float(np.mean(carry.astype(np.float64) ** 2))])
+    return np.concatenate(energies) if energies else np.zeros(0)
+
+
+def extract_features(chunks, sample_rate=SAMPLE_RATE, step=STEP_SECONDS):
+    """AudioFeatures of a stream of PCM chunks (see pcm_chunks)"""
+    return features_from_energies(frame_energies(chunks, sample_rate), FRAME_SECONDS, step)
+
+
+def features_from_energies(energy, frame_seconds=FRAME_SECONDS, step=STEP_SECONDS):
+    """Loudness, speech rate and voiced fraction per step from per-frame energies"""
+    if not len(energy):
+        return AudioFeatures([], [], [], step=step)
+    db = 10 * np.log10(energy + 1e-10)
+    floor = max(float(np.percentile(db, 10)), SILENCE_DBFS)
+    voiced = db > floor + VOICED_DB
+
+    # Syllable nuclei: peaks of the smoothed loudness in voiced frames that rise
+    # clearly above the dip before them, so each syllable counts once
+    smooth = np.convolve(db, np.ones(3) / 3, mode='same')
+    peaks = np.zeros(len(db), dtype=bool)
+    peaks[1:-1] = (smooth[1:-1] > smooth[:-2]) & (smooth[1:-1] >= smooth[2:])
+    lookback = max(1, int(round(NUCLEUS_LOOKBACK_SECONDS / frame_seconds)))
+    padded = np.concatenate((np.full(lookback, smooth[0]), smooth))
+    dips = np.lib.stride_tricks.sliding_window_view(padded, lookback + 1).min(axis=1)
+    nuclei = peaks & voiced & (smooth - dips >= NUCLEUS_RISE_DB)
+
+    per_step = max(1, int(round(step / frame_seconds)))
+    edges = np.arange(0, len(db), per_step)
+    counts = np.diff(np.append(edges, len(db)))
+    loudness = 10 * np.log10(np.add.reduceat(energy, edges) / counts + 1e-10)
+    speech_rate = np.add.reduceat(nuclei.astype(np.float64), edges) / (counts * frame_seconds)
+    voiced_fraction = np.add.reduceat(voiced.astype(np.float64), edges) / counts
+    return AudioFeatures(loudness, speech_rate, voiced_fraction, step=step)
+
+
+def rolling_mean(values, half, weights=None):
+    """(Weighted) mean of values[i - half : i + half + 1] (clipped to the ends) for every i"""
+    n = len(values)
+    if weights is None:
+        weights = np.ones(n)
+    prefix = np.concatenate(([0], np.cumsum(values * weights, dtype=np.float64)))
+    weight_prefix = np.concatenate(([0], np.cumsum(weights, dtype=np.float64)))
+    index = np.arange(n)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + half + 1, n)
+    totals = weight_prefix[hi] - weight_prefix[lo]
+    return (prefix[hi] - prefix[lo]) / np.maximum(totals, 1e-9)
+
+
+def percentile_ranks(values):
+    """Each value's rank in [0, 1]"""
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks / max(len(values) - 1, 1)
+
+
+def score_features(features):
+    """(score in [0, 1], loudness over the local baseline in dB, smoothed speech rate) per step.
+
+    A step scores high when it is louder than the audio around it and the
+    speech is fast, relative to the rest of the track; mostly silent steps
+    are scaled down.
+    """
+    if not len(features):
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    # Baseline over the voiced audio around a step, so pauses don't make their neighbours look loud
+    half = max(1, int(round(BASELINE_SECONDS / features.step / 2)))
+    baseline = rolling_mean(features.loudness, half, weights=features.voiced)
+    excess = np.where(features.voiced > 0, features.loudness - baseline, 0.0)
+    rate = rolling_mean(features.speech_rate, max(0, int(round(RATE_SECONDS / features.step / 2))))
+    scores = LOUDNESS_WEIGHT * percentile_ranks(excess) + (1 - LOUDNESS_WEIGHT) * percentile_ranks(rate)
+    return scores * np.minimum(1.0, features.voiced / 0.5), excess, rate
+
+
+def top_highlights(features, clip_seconds, k):
+    """Best k non-overlapping windows of about clip_seconds, best first.
+
+    Each is a dict with ``start``/``end`` seconds, ``score`` (0-100, the
+    window's mean step score), ``peak`` (start of its best step), and its
+    mean ``loudnessDb``, peak ``excessDb`` and mean ``speechRate``.
+    """
+    if not len(features):
+        return []
+    scores, excess, rate = score_features(features)
+    starts = np.arange(len(features)) * features.step
+    ranker = SegmentRanker(starts, starts + features.step, scores * 100, voiced=features.voiced)
+    _, firsts, lasts = ranker.window_scores(clip_seconds)
+    keep = ranker.window_sum('voiced', clip_seconds) / (lasts - firsts) >= MIN_VOICED
+    windows = ranker.top_windows(clip_seconds, k, min_seconds=min(clip_seconds, features.duration) / 2,
+                                 keep=keep)
+
+    highlights = []
+    for score, first, last in windows:
+        best = first + int(np.argmax(scores[first:last]))
+        highlights.append({
+            "start": float(starts[first]),
+            "end": float(starts[last - 1] + features.step),
+            "score": float(score),
+            "peak": float(starts[best]),
+            "loudnessDb": float(np.mean(features.loudness[first:last])),
+            "excessDb": float(np.max(excess[first:last])),
+            "speechRate": float(np.mean(rate[first:last])),
+        })
+    return highlights
+
+
+def caption_energy(features, starts, ends):
+    """Mean step score (0-1) under each caption's [start, end) span"""
+    if not len(features):
+        return np.zeros(len(starts))
+    scores, _, _ = score_features(features)
+    prefix = np.concatenate(([0], np.cumsum(scores)))
+    n = len(features)
+    first = np.clip(np.floor(np.asarray(starts) / features.step).astype(np.int64), 0, n - 1)
+    last = np.clip(np.ceil(np.asarray(ends) / features.step).astype(np.int64), first + 1, n)
+    # Captions past the end of the audio get no energy
+    return np.where(np.asarray(starts) < features.duration, (prefix[last] - prefix[first]) / (last - first), 0.0)
@@ -0,0 +1,184 @@
+import queue
+import re
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+
+# yt-dlp's own downloader with --newline: "[download]  42.3% of ..."
+YTDLP_PROGRESS_RE = re.compile(r'\[download\]\s+(\d+(?:\.\d+)?)%')
+# --download-sections hands off to ffmpeg, which reports "time=00:00:12.34"
+FFMPEG_TIME_RE = re.compile(r'time=(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+class Job:
+    """One queued unit of work and its observable state"""
+
+    def __init__(self, params):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.file_path = None
+        self.created = time.time()
+        self.finished = None
+        self.process = None
+        self.cancelled = threading.Event()
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 1),
+            "error": self.error,
+            "ready": self.status == "done",
+            "createdAt": self.created,
+            "finishedAt": self.finished
+        }
+
+
+class JobManager:
+    """FIFO job queue drained by a fixed number of worker threads"""
+
+    def __init__(self, handler, max_workers=2, max_queue=20, retention=3600):
+        self.handler = handler
+        self.max_workers = max(1, max_workers)
+        self.retention = retention
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def _ensure_workers(self):
+        # Started on first submit so importing the app doesn't spawn threads
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, params):
+        """Queue a job, raising QueueFull when the backlog is at capacity"""
+        self._ensure_workers()
+        self._prune()
+        job = Job(params)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} waiting)")
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job, killing its child process if any"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status in ("queued", "running"):
+            job.cancelled.set()
+            process = job.process
+            if process is not None and process.poll() is None:
+                process.kill()
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+        return job
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "capacity": self._queue.maxsize,
+            "workers": self.max_workers
+        }
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        job.process = None
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished < cutoff]:
+                del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job.cancelled.is_set():
+                    continue
+                job.status = "running"
+                success, message = self.handler(job)
+                if job.cancelled.is_set():
+                    self._finish(job, "cancelled")
+                elif success:
+                    job.progress = 100.0
+                    self._finish(job, "done")
+                else:
+                    self._finish(job, "failed", message)
+            except Exception as e:
+                print(f"Job {job.id} error: {e}")
+                self._finish(job, "failed", str(e))
+            finally:
+                self._queue.task_done()
+
+
+def run_with_progress(job, cmd, duration=None, timeout=300):
+    """Run a yt-dlp command for a job, updating job.progress from its output"""
+    print(f"Running: {' '.join(cmd)}")
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, errors='replace', bufsize=1)
+    job.process = process
+    if job.cancelled.is_set():
+        process.kill()
+
+    # Enforce the timeout without blocking the output reader
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.start()
+    tail = deque(maxlen=20)
+    try:
+        for line in process.stdout:
+            tail.append(line)
+            match = YTDLP_PROGRESS_RE.search(line)
+            if match:
+                job.progress = min(99.0, float(match.group(1)))
+                continue
+            match = FFMPEG_TIME_RE.search(line)
+            if match and duration:
+                hours, minutes, seconds = match.groups()
+                elapsed = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                job.progress = min(99.0, 100.0 * elapsed / duration)
+        process.wait()
+    finally:
+        timer.cancel()
+
+    if job.cancelled.is_set():
+        return False, "Cancelled"
+    if timed_out.is_set():
+        return False, "Download timeout"
+    if process.returncode != 0:
+        return False, ''.join(tail)
+    return True, "Success"
@@ -0,0 +1,152 @@
+import json
+import re
+
+
+class KeywordMatcher:
+    """Single-pass keyword engine reporting which groups a text hits.
+
+    One compiled regex splits the lowercased text into word tokens (plus any
+    punctuation used as a keyword, like "?"), and every token is looked up in
+    hash tables of keywords, phrases and prefixes. Matching is on whole words, so
+    "i" no longer matches inside "strategy"; a trailing ``*`` makes a keyword a
+    prefix ("trade*" matches trades, trader). Each group gets one bit and ``scan``
+    returns the OR of every group hit. Per-token masks are memoized.
+    """
+
+    WORD = r"\w+(?:['’]\w+)*"
+
+    def __init__(self, groups):
+        self.names = list(groups)
+        self._phrases = {}
+        self._stems = {}
+        symbols = set()
+
+        entries = []
+        for bit, name in enumerate(self.names):
+            for keyword in groups[name]:
+                keyword = keyword.lower().strip()
+                if keyword:
+                    entries.append((bit, keyword))
+                    symbols.update(c for c in keyword.rstrip('*') if not (c.isalnum() or c in " _'’"))
+
+        alternatives = [self.WORD] + [re.escape(c) for c in sorted(symbols)]
+        self._token_re = re.compile('|'.join(alternatives))
+
+        for bit, keyword in entries:
+            if keyword.endswith('*'):
+                stem = keyword.rstrip('*')
+                self._stems[stem] = self._stems.get(stem, 0) | (1 << bit)
+            else:
+                phrase = tuple(self._token_re.findall(keyword))
+                if phrase:
+                    self._phrases[phrase] = self._phrases.get(phrase, 0) | (1 << bit)
+
+        self._stem_lengths = sorted({len(stem) for stem in self._stems})
+        # Phrase lengths keyed by their first word, so most tokens skip phrase checks
+        self._phrase_starts = {}
+        for phrase in self._phrases:
+            if len(phrase) > 1:
+                self._phrase_starts.setdefault(phrase[0], set()).add(len(phrase))
+        # Transcript vocabulary is small and repetitive: memoize per-token masks
+        self._token_masks = {}
+
+    def _token_mask(self, token):
+        mask = self._phrases.get((token,), 0)
+        for length in self._stem_lengths:
+            if length > len(token):
+                break
+            mask |= self._stems.get(token[:length], 0)
+        if len(self._token_masks) > 100000:
+            self._token_masks.clear()
+        self._token_masks[token] = mask
+        return mask
+
+    def scan(self, text):
+        """Return the bitmask of groups whose keywords appear in text"""
+        if not text:
+            return 0
+        tokens = self._token_re.findall(text.lower())
+        token_masks = self._token_masks
+        phrase_starts = self._phrase_starts
+        mask = 0
+        for i, token in enumerate(tokens):
+            token_mask = token_masks.get(token)
+            if token_mask is None:
+                token_mask = self._token_mask(token)
+            mask |= token_mask
+            if token in phrase_starts:
+                for n in phrase_starts[token]:
+                    mask |= self._phrases.get(tuple(tokens[i:i + n]), 0)
+        return mask
+
+    def bit(self, name):
+        return 1 << self.names.index(name)
+
+    def hit_names(self, mask):
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+
+class KeywordTables:
+    """Trigger, category, title, relevance and bonus tables sharing one matcher"""
+
+    def __init__(self, config):
+        self.config = config
+        groups = {}
+        for trigger in config["triggers"]:
+            groups[f"trigger:{trigger['name']}"] = trigger.get("keywords", [])
+        for category in config["categories"]:
+            groups[f"category:{category['name']}"] = category["keywords"]
+        for i, title in enumerate(config["titles"]):
+            groups[f"title:{i}"] = title["keywords"]
+        groups["relevance"] = config["relevance"]
+        # One group per bonus keyword: the bonus counts distinct keywords hit
+        for keyword in config["bonus"]["keywords"]:
+            groups[f"bonus:{keyword}"] = [keyword]
+        self.matcher = KeywordMatcher(groups)
+
+        # Triggers with minScore fire on the sentiment score instead of keywords
+        self.trigger_bits = [(t["name"], self.matcher.bit(f"trigger:{t['name']}"), t.get("minScore"))
+                             for t in config["triggers"]]
+        self.category_bits = [(c["name"], self.matcher.bit(f"category:{c['name']}")) for c in config["categories"]]
+        self.title_bits = [(t["titles"], self.matcher.bit(f"title:{i}")) for i, t in enumerate(config["titles"])]
+        self.relevance_bit = self.matcher.bit("relevance")
+        self.bonus_mask = sum(self.matcher.bit(f"bonus:{k}") for k in config["bonus"]["keywords"])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def scan(self, text):
+        return self.matcher.scan(text)
+
+    def triggers(self, hits, score):
+        """Trigger names for a segment in table order"""
+        triggers = []
+        for name, bit, min_score in self.trigger_bits:
+            if (score > min_score) if min_score is not None else (hits & bit):
+                triggers.append(name)
+        if not triggers:
+            triggers = list(self.config.get("defaultTriggers", []))
+        return triggers[:self.config.get("maxTriggers", 3)]
+
+    def category(self, hits):
+        for name, bit in self.category_bits:
+            if hits & bit:
+                return name
+        return self.config.get("defaultCategory", "General Content")
+
+    def title(self, hits, clip_id):
+        titles = self.config["defaultTitles"]
+        for candidates, bit in self.title_bits:
+            if hits & bit:
+                titles = candidates
+                break
+        # Pick title based on clip ID for consistency
+        return titles[clip_id % len(titles)].format(id=clip_id)
+
+    def is_relevant(self, hits):
+        return bool(hits & self.relevance_bit)
+
+    def bonus(self, hits):
+        return bin(hits & self.bonus_mask).count('1') * self.config["bonus"].get("points", 5)
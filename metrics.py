@@ -0,0 +1,194 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds: from a cached lookup (~1ms) up to a long yt-dlp run
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Bytes: JSON responses up to full-length clips and ZIPs
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9)
+
+# Stage timings for the current request, when it asked for a profile
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        if not values:
+            values = {(): 0}
+        for key, value in sorted(values.items()):
+            yield self.name + "_total", key, value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def totals(self):
+        """{label tuple: (sum, count)} for every series observed so far"""
+        with self._lock:
+            return {key: (total, count) for key, (_, total, count) in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        if not series:
+            series = {(): ([0] * (len(self.buckets) + 1), 0.0, 0)}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield self.name + "_bucket", key + (("le", _number(bound)),), cumulative
+            yield self.name + "_sum", key, total
+            yield self.name + "_count", key, count
+
+
+class Registry:
+    """Holds every metric and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=TIME_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "clip_agent_stage_seconds",
+    "Time spent in each analysis/download stage")
+HF_REQUEST_SECONDS = REGISTRY.histogram(
+    "clip_agent_hf_request_seconds",
+    "Latency of each sentiment inference request to the HF API")
+SERVED_BYTES = REGISTRY.histogram(
+    "clip_agent_served_bytes",
+    "Response body size per endpoint", buckets=SIZE_BUCKETS)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "clip_agent_request_seconds",
+    "Time until each response starts, per endpoint")
+DUPLICATE_CAPTIONS = REGISTRY.counter(
+    "clip_agent_duplicate_captions",
+    "Captions that took a near-duplicate's sentiment score instead of being scored")
+FALLBACKS = REGISTRY.counter(
+    "clip_agent_fallbacks",
+    "Results made up when the real path failed (default scores, mock clips)")
+
+
+def start_profile(enabled=True):
+    """Begin a request: collect its stage timings only if it asked for a profile"""
+    _profile.set({} if enabled else None)
+
+
+def current_profile():
+    """{stage: (seconds, calls)} for the current request, or None when not profiling"""
+    return _profile.get()
+
+
+def record_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    profile = _profile.get()
+    if profile is not None:
+        total, calls = profile.get(stage, (0.0, 0))
+        profile[stage] = (total + seconds, calls + 1)
+
+
+@contextmanager
+def timed(stage):
+    """Time a block as one run of ``stage`` (histogram, plus the request's profile)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing(stages, total=None):
+    """Format stage timings as a Server-Timing header value (milliseconds)"""
+    parts = [f'{stage};dur={seconds * 1000:.1f};desc="{calls}x"' for stage, (seconds, calls) in stages.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def count_bytes(chunks, **labels):
+    """Pass a streamed body through, recording its size once it is fully sent"""
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        SERVED_BYTES.observe(size, **labels)
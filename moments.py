@@ -0,0 +1,215 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from cache import content_key
+
+# Columns compared when re-indexing a video, in table order
+MOMENT_FIELDS = ("text", "title", "score", "virality", "triggers", "category")
+# bm25 weight per FTS column: text, title, triggers, category
+FTS_WEIGHTS = (1.0, 2.0, 1.0, 0.5)
+
+_WORD_RE = re.compile(r"(\w+)(\*?)")
+
+
+def fts_query(text):
+    """FTS5 query matching every word of free text (``word*`` matches a prefix)"""
+    return " ".join(f'"{word}"{star}' for word, star in _WORD_RE.findall(text))
+
+
+class MomentIndex:
+    """Library of analyzed captions and clips across videos, searchable with SQLite FTS5.
+
+    A video's moments are stored with millisecond timestamps and replaced as
+    a set when it is indexed again. Re-indexing is idempotent and incremental:
+    unchanged content is detected by hash and skipped, and otherwise only the
+    moments that were added, changed or dropped are written, in one
+    transaction.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    video_url TEXT,
+                    source_type TEXT,
+                    content_hash TEXT NOT NULL,
+                    moments INTEGER NOT NULL,
+                    indexed REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS moments (
+                    id INTEGER PRIMARY KEY,
+                    video_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    score REAL,
+                    virality INTEGER,
+                    triggers TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    UNIQUE (video_id, kind, start_ms, end_ms)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS moments_fts USING fts5(
+                    text, title, triggers, category,
+                    content='moments', content_rowid='id', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS moments_ai AFTER INSERT ON moments BEGIN
+                    INSERT INTO moments_fts (rowid, text, title, triggers, category)
+                    VALUES (new.id, new.text, new.title, new.triggers, new.category);
+                END;
+                CREATE TRIGGER IF NOT EXISTS moments_ad AFTER DELETE ON moments BEGIN
+                    INSERT INTO moments_fts (moments_fts, rowid, text, title, triggers, category)
+                    VALUES ('delete', old.id, old.text, old.title, old.triggers, old.category);
+                END;
+                CREATE TRIGGER IF NOT EXISTS moments_au AFTER UPDATE ON moments BEGIN
+                    INSERT INTO moments_fts (moments_fts, rowid, text, title, triggers, category)
+                    VALUES ('delete', old.id, old.text, old.title, old.triggers, old.category);
+                    INSERT INTO moments_fts (rowid, text, title, triggers, category)
+                    VALUES (new.id, new.text, new.title, new.triggers, new.category);
+                END;
+            """)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _rows(moments):
+        """{(kind, start_ms, end_ms): field tuple}, joining the text of moments sharing a span"""
+        rows = {}
+        for moment in moments:
+            key = (moment["kind"], int(moment["startMs"]), int(moment["endMs"]))
+            row = (
+                moment.get("text") or "",
+                moment.get("title") or "",
+                None if moment.get("score") is None else round(float(moment["score"]), 4),
+                moment.get("virality"),
+                json.dumps(moment.get("triggers") or []),
+                moment.get("category") or "",
+            )
+            if key in rows:
+                row = (rows[key][0] + " " + row[0],) + rows[key][1:]
+            rows[key] = row
+        return rows
+
+    def index_video(self, video_id, moments, video_url=None, source_type=None):
+        """Make moments the video's indexed set; returns counts of added/updated/removed moments.
+
+        Each moment is a dict with ``kind`` ("caption" or "clip"), ``startMs``,
+        ``endMs`` and ``text``, plus optional ``title``, ``score`` (0-1),
+        ``virality``, ``triggers`` and ``category``.
+        """
+        rows = self._rows(moments)
+        digest = content_key(video_url or "", source_type or "",
+                             json.dumps(sorted(rows.items()), separators=(',', ':')))
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": False}
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = conn.execute("SELECT content_hash FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            if stored and stored[0] == digest:
+                conn.execute("COMMIT")
+                counts["unchanged"] = True
+                return counts
+
+            existing = {}
+            for moment_id, kind, start_ms, end_ms, *fields in conn.execute(
+                    f"SELECT id, kind, start_ms, end_ms, {', '.join(MOMENT_FIELDS)} FROM moments "
+                    "WHERE video_id = ?", (video_id,)):
+                existing[(kind, start_ms, end_ms)] = (moment_id, tuple(fields))
+
+            removed = [(moment_id,) for key, (moment_id, _) in existing.items() if key not in rows]
+            added = [(video_id, *key, *row) for key, row in rows.items() if key not in existing]
+            updated = [(*row, existing[key][0]) for key, row in rows.items()
+                       if key in existing and existing[key][1] != row]
+
+            conn.executemany("DELETE FROM moments WHERE id = ?", removed)
+            conn.executemany(
+                f"INSERT INTO moments (video_id, kind, start_ms, end_ms, {', '.join(MOMENT_FIELDS)}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", added)
+            conn.executemany(
+                f"UPDATE moments SET {', '.join(f'{field} = ?' for field in MOMENT_FIELDS)} WHERE id = ?",
+                updated)
+            conn.execute("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                         (video_id, video_url, source_type, digest, len(rows), time.time()))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        counts.update(added=len(added), updated=len(updated), removed=len(removed))
+        return counts
+
+    def search(self, query, limit=20, offset=0, kind=None, video_id=None, category=None):
+        """Moments matching every word of query, best first.
+
+        Ranked by BM25 (title matches count double), boosted by the moment's
+        score: a caption's sentiment score or a clip's virality.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = f"""
+            SELECT m.video_id, v.video_url, v.source_type, m.kind, m.start_ms, m.end_ms, m.text, m.title,
+                   m.score, m.virality, m.triggers, m.category,
+                   snippet(moments_fts, 0, '[', ']', '...', 12),
+                   bm25(moments_fts, {', '.join(map(str, FTS_WEIGHTS))}) * (1 + COALESCE(m.score, 0.5)) AS rank
+            FROM moments_fts
+            JOIN moments m ON m.id = moments_fts.rowid
+            JOIN videos v ON v.video_id = m.video_id
+            WHERE moments_fts MATCH ?
+        """
+        params = [match]
+        for column, value in (("m.kind", kind), ("m.video_id", video_id), ("m.category", category)):
+            if value:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        results = []
+        for (video_id_, video_url, source_type, kind_, start_ms, end_ms, text, title, score, virality,
+             triggers, category_, snippet, rank) in self._conn().execute(sql, params):
+            results.append({
+                "videoId": video_id_,
+                "videoUrl": video_url,
+                "sourceType": source_type,
+                "kind": kind_,
+                "startMs": start_ms,
+                "endMs": end_ms,
+                "text": text,
+                "snippet": snippet,
+                "title": title,
+                "score": score,
+                "viralityScore": virality,
+                "triggers": json.loads(triggers),
+                "category": category_,
+                "rank": round(-rank, 4),
+            })
+        return results
+
+    def stats(self):
+        try:
+            # Nothing indexed yet: report an empty index rather than create it
+            videos, moments = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(moments), 0) FROM videos"
+            ).fetchone() if os.path.exists(self.path) else (0, 0)
+        except (sqlite3.Error, OSError) as e:
+            return {"error": str(e)}
+        return {"videos": videos, "moments": moments}
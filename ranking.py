@@ -0,0 +1,140 @@
+import bisect
+
+import numpy as np
+
+DEFAULT_CAPTION_SECONDS = 3.0
+
+
+def caption_bounds(transcript):
+    """Return (starts, ends) arrays for captions, using 'end', 'duration' or the next start"""
+    n = len(transcript)
+    starts = np.fromiter((float(c.get('start', 0)) for c in transcript), dtype=np.float64, count=n)
+    ends = np.empty(n, dtype=np.float64)
+    for i, caption in enumerate(transcript):
+        if caption.get('end') is not None:
+            ends[i] = float(caption['end'])
+        elif caption.get('duration') is not None:
+            ends[i] = starts[i] + float(caption['duration'])
+        elif i + 1 < n:
+            ends[i] = starts[i + 1]
+        else:
+            ends[i] = starts[i] + DEFAULT_CAPTION_SECONDS
+    return starts, np.maximum(ends, starts)
+
+
+class SegmentRanker:
+    """Ranks time windows over per-caption columns using prefix sums.
+
+    Captions are held as columnar NumPy arrays (sorted by start time). Every
+    caption is valued once; window bounds for a length come from one
+    ``searchsorted`` and any numeric column can be summed over all windows with
+    a prefix-sum difference, so scoring and filtering every candidate window is
+    a handful of vector operations. Results are memoized per window length.
+    """
+
+    def __init__(self, starts, ends, values, texts=None, hits=None, **columns):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        # Per-caption inputs kept for building details of the winning clips
+        self.texts = texts
+        self.hits = hits
+        self.columns = {name: np.asarray(column) for name, column in columns.items()}
+        self.columns['values'] = self.values
+        self._prefix = {}
+        self._bounds = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def prefix(self, name):
+        prefix = self._prefix.get(name)
+        if prefix is None:
+            column = self.columns[name]
+            prefix = np.concatenate(([0], np.cumsum(column, dtype=np.float64)))
+            self._prefix[name] = prefix
+        return prefix
+
+    def window_bounds(self, window_seconds):
+        """(first, last+1) caption index arrays for the window starting at each caption"""
+        bounds = self._bounds.get(window_seconds)
+        if bounds is None:
+            first = np.arange(len(self.starts))
+            last = np.searchsorted(self.starts, self.starts + window_seconds, side='left')
+            last = np.maximum(last, first + 1)
+            bounds = self._bounds[window_seconds] = (first, last)
+        return bounds
+
+    def window_sum(self, name, window_seconds):
+        """Sum of a column over every window"""
+        first, last = self.window_bounds(window_seconds)
+        prefix = self.prefix(name)
+        return prefix[last] - prefix[first]
+
+    def window_scores(self, window_seconds):
+        """(mean value, first, last+1) arrays for the window starting at each caption"""
+        first, last = self.window_bounds(window_seconds)
+        return self.window_sum('values', window_seconds) / (last - first), first, last
+
+    def window_spans(self, window_seconds):
+        """Snapped duration of every window: first caption start to last caption end"""
+        first, last = self.window_bounds(window_seconds)
+        return self.ends[last - 1] - self.starts[first]
+
+    def top_windows(self, window_seconds, k, min_seconds=0, keep=None, rank=None, taken=(),
+                    max_similarity=None):
+        """Best k non-overlapping windows as (rank, first, last+1), best first.
+
+        Windows are snapped to caption boundaries: they start at a caption start
+        and end at the end of their last caption. ``rank`` orders candidates
+        (mean value by default, which also breaks ties); windows shorter than
+        ``min_seconds`` or masked out by ``keep`` are never candidates, and
+        none overlaps the ``(start, end)`` spans already ``taken``.
+
+        With ``max_similarity`` and a ``groups`` column (near-duplicate group
+        per caption), a window is also skipped when the Jaccard similarity of
+        its caption groups to a taken or chosen window's is above it, so the
+        same lines repeated later in a video don't come back as another clip.
+        """
+        means, first, last = self.window_scores(window_seconds)
+        if rank is None:
+            rank = means
+        candidates = self.window_spans(window_seconds) >= min_seconds
+        if keep is not None:
+            candidates &= keep
+        indices = np.flatnonzero(candidates)
+        if k <= 0 or not len(indices):
+            return []
+        order = indices[np.lexsort((-means[indices], -rank[indices]))]
+
+        chosen = []
+        taken = sorted(taken)
+        taken_starts = [start for start, _ in taken]
+        taken_ends = [end for _, end in taken]
+        groups = self.columns.get('groups') if max_similarity is not None else None
+        chosen_groups = []
+        if groups is not None:
+            for start, end in taken:
+                i, j = np.searchsorted(self.starts, (start, end), side='left')
+                chosen_groups.append(set(groups[i:j].tolist()))
+        # Overlap checks are the only per-window Python work, and stop after k picks
+        for w in order.tolist():
+            i, j = int(first[w]), int(last[w])
+            start, end = self.starts[i], self.ends[j - 1]
+            pos = bisect.bisect_left(taken_starts, start)
+            if pos > 0 and taken_ends[pos - 1] > start:
+                continue
+            if pos < len(taken_starts) and taken_starts[pos] < end:
+                continue
+            if groups is not None:
+                window_groups = set(groups[i:j].tolist())
+                if any(len(window_groups & other) > max_similarity * len(window_groups | other)
+                       for other in chosen_groups):
+                    continue
+                chosen_groups.append(window_groups)
+            taken_starts.insert(pos, start)
+            taken_ends.insert(pos, end)
+            chosen.append((float(rank[w]), i, j))
+            if len(chosen) == k:
+                break
+        return chosen
@@ -0,0 +1,407 @@
+import os
+import threading
+import time
+import metrics
+from cache import content_key
+from concurrent.futures import ThreadPoolExecutor
+
+# requests, asyncio, httpx and torch are imported by the backends that use them, so
+# importing this module (and the app) stays cheap
+
+HF_API_URL = "https://api-inference.huggingface.co/models/{model}"
+DEFAULT_RESULT = {"label": "POSITIVE", "score": 0.7}
+
+
+def pick_best(scores):
+    """Return the highest scoring label from one item's score list"""
+    # Single-input responses come back nested one level deeper: [[{...}, ...]]
+    if isinstance(scores, list) and len(scores) == 1 and isinstance(scores[0], list):
+        scores = scores[0]
+    if isinstance(scores, dict) and 'score' in scores:
+        return scores
+    if isinstance(scores, list) and scores and all(isinstance(s, dict) for s in scores):
+        return max(scores, key=lambda x: x.get('score', 0))
+    return None
+
+
+def with_defaults(best):
+    """Fill results nothing could score with DEFAULT_RESULT, counting each one"""
+    defaults = sum(b is None for b in best)
+    if defaults:
+        metrics.FALLBACKS.inc(defaults, kind="default_score")
+    return [b if b is not None else dict(DEFAULT_RESULT) for b in best]
+
+
+class SentimentScorer:
+    """Scores many texts per request on a bounded pool over one pooled session"""
+
+    def __init__(self, token, model, batch_size=16, max_workers=4, timeout=10, api_url=None,
+                 fallback=None):
+        self.token = token
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.api_url = api_url or HF_API_URL.format(model=model)
+        self.fallback = fallback
+        self._session = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers["Authorization"] = f"Bearer {self.token}"
+                    self._session = session
+        return self._session
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="hf-score")
+        return self._pool
+
+    def _post(self, inputs):
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(self.api_url, json={"inputs": inputs}, timeout=self.timeout)
+        finally:
+            metrics.HF_REQUEST_SECONDS.observe(time.perf_counter() - start)
+        if resp.status_code != 200:
+            print(f"HF API error: {resp.status_code} - {resp.text}")
+            return None
+        return resp.json()
+
+    def _score_one(self, text):
+        try:
+            return pick_best(self._post(text))
+        except Exception as e:
+            print(f"Analyze text error: {e}")
+            return None
+
+    def _score_batch(self, texts):
+        """Score one batch, falling back per item for anything the API didn't answer"""
+        try:
+            result = self._post(texts)
+        except Exception as e:
+            print(f"Batch scoring error: {e}")
+            result = None
+
+        if isinstance(result, list) and len(result) == len(texts):
+            best = [pick_best(item) for item in result]
+        elif self.fallback is not None:
+            # The whole request failed (rate limit, outage); don't hammer the API per item
+            best = [None] * len(texts)
+            return self._fill_missing(best, texts)
+        else:
+            best = [None] * len(texts)
+
+        best = [b if b is not None else self._score_one(text) for b, text in zip(best, texts)]
+        return self._fill_missing(best, texts)
+
+    def _fill_missing(self, best, texts):
+        missing = [i for i, b in enumerate(best) if b is None]
+        if missing and self.fallback is not None:
+            try:
+                recovered = self.fallback.score([texts[i] for i in missing])
+            except Exception as e:
+                print(f"Fallback scorer error: {e}")
+                recovered = [None] * len(missing)
+            for i, result in zip(missing, recovered):
+                best[i] = result
+        return with_defaults(best)
+
+    def score(self, texts):
+        """Score texts, returning one result dict per text in input order"""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._score_batch(batches[0])
+
+        results = []
+        for batch_result in self.pool.map(self._score_batch, batches):
+            results.extend(batch_result)
+        return results
+
+
+class AsyncSentimentScorer:
+    """SentimentScorer for asyncio: batches are awaited over one pooled httpx.AsyncClient.
+
+    At most ``max_connections`` requests are in flight per process, shared by
+    every concurrent analysis. Needs httpx (see requirements-async.txt).
+    """
+
+    def __init__(self, token, model, batch_size=16, max_connections=32, timeout=10, api_url=None,
+                 fallback=None):
+        self.token = token
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.api_url = api_url or HF_API_URL.format(model=model)
+        self.fallback = fallback
+        self._client = None
+        self._slots = None
+
+    @property
+    def client(self):
+        # Created inside the running event loop, which it is then bound to
+        if self._client is None:
+            import asyncio
+            import httpx
+
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(headers={"Authorization": f"Bearer {self.token}"},
+                                             limits=limits, timeout=self.timeout)
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, inputs):
+        client = self.client
+        async with self._slots:
+            start = time.perf_counter()
+            try:
+                resp = await client.post(self.api_url, json={"inputs": inputs})
+            finally:
+                metrics.HF_REQUEST_SECONDS.observe(time.perf_counter() - start)
+        if resp.status_code != 200:
+            print(f"HF API error: {resp.status_code} - {resp.text}")
+            return None
+        return resp.json()
+
+    async def _score_one(self, text):
+        try:
+            return pick_best(await self._post(text))
+        except Exception as e:
+            print(f"Analyze text error: {e}")
+            return None
+
+    async def _score_batch(self, texts):
+        """Score one batch, falling back per item for anything the API didn't answer"""
+        import asyncio
+        try:
+            result = await self._post(texts)
+        except Exception as e:
+            print(f"Batch scoring error: {e}")
+            result = None
+
+        if isinstance(result, list) and len(result) == len(texts):
+            best = [pick_best(item) for item in result]
+        elif self.fallback is not None:
+            # The whole request failed (rate limit, outage); don't hammer the API per item
+            return await self._fill_missing([None] * len(texts), texts)
+        else:
+            best = [None] * len(texts)
+
+        missing = [i for i, b in enumerate(best) if b is None]
+        if missing:
+            retried = await asyncio.gather(*(self._score_one(texts[i]) for i in missing))
+            for i, result in zip(missing, retried):
+                best[i] = result
+        return await self._fill_missing(best, texts)
+
+    async def _fill_missing(self, best, texts):
+        import asyncio
+        missing = [i for i, b in enumerate(best) if b is None]
+        if missing and self.fallback is not None:
+            try:
+                # The fallback (local model) is CPU-bound: keep it off the event loop
+                recovered = await asyncio.to_thread(self.fallback.score, [texts[i] for i in missing])
+            except Exception as e:
+                print(f"Fallback scorer error: {e}")
+                recovered = [None] * len(missing)
+            for i, result in zip(missing, recovered):
+                best[i] = result
+        return with_defaults(best)
+
+    async def score(self, texts):
+        """Score texts, returning one result dict per text in input order"""
+        import asyncio
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = []
+        for batch_result in await asyncio.gather(*(self._score_batch(batch) for batch in batches)):
+            results.extend(batch_result)
+        return results
+
+
+class ThreadedScorer:
+    """Async wrapper running a blocking scorer (the local model) in a worker thread"""
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+
+    async def score(self, texts):
+        import asyncio
+        return await asyncio.to_thread(self.scorer.score, list(texts))
+
+    async def aclose(self):
+        pass
+
+
+_local_models = {}
+_local_lock = threading.Lock()
+
+
+def load_local_model(model, threads):
+    """Load tokenizer and model once per worker process"""
+    key = (model, os.getpid())
+    loaded = _local_models.get(key)
+    if loaded is None:
+        with _local_lock:
+            loaded = _local_models.get(key)
+            if loaded is None:
+                import torch
+                from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+                if threads:
+                    torch.set_num_threads(threads)
+                tokenizer = AutoTokenizer.from_pretrained(model)
+                classifier = AutoModelForSequenceClassification.from_pretrained(model)
+                classifier.eval()
+                loaded = (tokenizer, classifier)
+                _local_models[key] = loaded
+                print(f"Loaded local sentiment model {model} ({torch.get_num_threads()} threads)")
+    return loaded
+
+
+class LocalSentimentScorer:
+    """Scores texts with an in-process CPU model on padded batches"""
+
+    def __init__(self, model, batch_size=16, threads=None, max_length=128):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.threads = threads
+        self.max_length = max_length
+
+    def score(self, texts):
+        """Score texts, returning one result dict per text in input order"""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        import torch
+
+        tokenizer, classifier = load_local_model(self.model, self.threads)
+        id2label = classifier.config.id2label
+
+        # Batch texts of similar length together so each batch pads less
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [None] * len(texts)
+        for offset in range(0, len(order), self.batch_size):
+            indices = order[offset:offset + self.batch_size]
+            encoded = tokenizer([texts[i] for i in indices], padding=True, truncation=True,
+                                max_length=self.max_length, return_tensors="pt")
+            with torch.inference_mode():
+                probs = classifier(**encoded).logits.softmax(dim=-1)
+            scores, labels = probs.max(dim=-1)
+            for i, score, label in zip(indices, scores.tolist(), labels.tolist()):
+                results[i] = {"label": id2label[label], "score": score}
+        return results
+
+
+def make_scorer(backend, token, model, batch_size=16, max_workers=4, threads=None, api_url=None):
+    """Build the scorer for a backend name: remote, local, or auto (remote, local fallback)"""
+    backend = (backend or "remote").lower()
+    if backend == "local":
+        return LocalSentimentScorer(model, batch_size=batch_size, threads=threads)
+    if backend == "auto":
+        local = LocalSentimentScorer(model, batch_size=batch_size, threads=threads)
+        return SentimentScorer(token, model, batch_size=batch_size, max_workers=max_workers,
+                               api_url=api_url, fallback=local)
+    if backend != "remote":
+        raise ValueError(f"Unknown scorer backend: {backend}")
+    return SentimentScorer(token, model, batch_size=batch_size, max_workers=max_workers, api_url=api_url)
+
+
+def make_async_scorer(backend, token, model, batch_size=16, max_connections=32, threads=None,
+                      api_url=None):
+    """Async counterpart of make_scorer for the ASGI server"""
+    backend = (backend or "remote").lower()
+    if backend == "local":
+        return ThreadedScorer(LocalSentimentScorer(model, batch_size=batch_size, threads=threads))
+    if backend == "auto":
+        local = LocalSentimentScorer(model, batch_size=batch_size, threads=threads)
+        return AsyncSentimentScorer(token, model, batch_size=batch_size, max_connections=max_connections,
+                                    api_url=api_url, fallback=local)
+    if backend != "remote":
+        raise ValueError(f"Unknown scorer backend: {backend}")
+    return AsyncSentimentScorer(token, model, batch_size=batch_size, max_connections=max_connections,
+                                api_url=api_url)
+
+
+class CachedScorer:
+    """Wraps a scorer so each distinct text is only scored once per scorer configuration"""
+
+    def __init__(self, scorer, cache, config_key):
+        self.scorer = scorer
+        self.cache = cache
+        self.config_key = config_key
+
+    def _lookup(self, texts):
+        """Cache keys for texts, the cached results, and {key: text} still to score"""
+        keys = [content_key(self.config_key, text) for text in texts]
+        try:
+            cached = self.cache.get_many("score", keys)
+        except Exception as e:
+            print(f"Score cache read error: {e}")
+            cached = {}
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                todo.setdefault(key, text)
+        return keys, cached, todo
+
+    def _store(self, cached, fresh):
+        # Don't pin the default placeholder score in the cache
+        keep = {k: v for k, v in fresh.items() if v != DEFAULT_RESULT}
+        try:
+            self.cache.set_many("score", keep)
+        except Exception as e:
+            print(f"Score cache write error: {e}")
+        cached.update(fresh)
+
+    def score(self, texts):
+        texts = list(texts)
+        keys, cached, todo = self._lookup(texts)
+        if todo:
+            self._store(cached, dict(zip(todo, self.scorer.score(list(todo.values())))))
+        return [dict(cached[key]) for key in keys]
+
+
+class AsyncCachedScorer(CachedScorer):
+    """CachedScorer around an async scorer; cache reads and writes run in worker threads"""
+
+    async def score(self, texts):
+        import asyncio
+        texts = list(texts)
+        keys, cached, todo = await asyncio.to_thread(self._lookup, texts)
+        if todo:
+            fresh = dict(zip(todo, await self.scorer.score(list(todo.values()))))
+            await asyncio.to_thread(self._store, cached, fresh)
+        return [dict(cached[key]) for key in keys]
@@ -8,6 +8,7 @@ class AppState {
         this.analysisComplete = false;
         this.currentTab = 'url';
         this.canDownloadClips = false;
+        this.downloadJobs = {};
     }
 
     updatePlatform(platform) {
@@ -82,6 +83,7 @@ const elements = {
     minScore: document.getElementById('minScore'),
     minScoreValue: document.getElementById('minScoreValue'),
     retryBtn: document.getElementById('retryBtn'),
+    downloadAllBtn: document.getElementById('downloadAllBtn'),
     errorMessage: document.getElementById('errorMessage')
 };
 
@@ -215,22 +217,27 @@ function setupDragAndDrop() {
         const files = e.dataTransfer.files;
         if (files.length > 0) {
             const file = files[0];
-            if (file.name.toLowerCase().endsWith('.srt')) {
+            if (/\.(srt|vtt)$/i.test(file.name)) {
                 elements.srtFile.files = files;
                 handleSrtFileSelect();
             } else {
-                showNotification('❌ Please upload a .srt file', 'error');
+                showNotification('❌ Please upload a .srt or .vtt file', 'error');
             }
         }
     });
 }
 
 // Enhanced Clip Actions
+const PREVIEW_QUALITY = '480';
+
 function previewClip(clipId) {
     const clip = appState.clips.find(c => c.id == clipId);
     if (!clip) return;
     
-    if (clip.sourceType === "YouTube" && clip.previewUrl) {
+    if (appState.canDownloadClips && clip.videoUrl) {
+        // Play the actual clip inline (cut on the server, streamed with range requests)
+        showVideoPreview(clip);
+    } else if (clip.sourceType === "YouTube" && clip.previewUrl) {
         // Open YouTube at specific timestamp
         window.open(clip.previewUrl, '_blank');
     } else {
@@ -239,6 +246,141 @@ function previewClip(clipId) {
     }
 }
 
+// Stored clip ID for a clip at preview quality, queueing its download on first use
+async function fetchPreviewClipId(clip) {
+    if (clip.previewClipId) return clip.previewClipId;
+    
+    const response = await fetch(`${API_BASE}/api/jobs/download-clip`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            videoUrl: clip.videoUrl,
+            startTime: clip.startTime,
+            endTime: clip.endTime,
+            hookText: clip.hookText,
+            quality: `bestvideo[height<=${PREVIEW_QUALITY}]+bestaudio/best[height<=${PREVIEW_QUALITY}]`
+        })
+    });
+    const job = await readJsonResponse(response, 'Failed to start preview');
+    if (response.status === 429) {
+        throw new Error('Server is busy with other downloads, please try again shortly');
+    }
+    
+    const finished = await pollDownloadJob(job.jobId, PREVIEW_QUALITY);
+    if (finished.status !== 'done' || !finished.clipId) {
+        throw new Error(finished.error || `Preview ${finished.status}`);
+    }
+    clip.previewClipId = finished.clipId;
+    return clip.previewClipId;
+}
+
+function showVideoPreview(clip) {
+    const modal = document.createElement('div');
+    modal.style.cssText = `
+        position: fixed;
+        top: 0;
+        left: 0;
+        width: 100%;
+        height: 100%;
+        background: rgba(0,0,0,0.8);
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        z-index: 1000;
+    `;
+    
+    modal.innerHTML = `
+        <div style="
+            background: white;
+            padding: 30px;
+            border-radius: 10px;
+            max-width: 720px;
+            width: 90%;
+            max-height: 90vh;
+            overflow-y: auto;
+        ">
+            <h3 style="color: #007cba; margin-bottom: 15px;">🎬 ${clip.title}</h3>
+            <div style="margin-bottom: 10px; color: #666; font-size: 14px;">
+                <strong>Timestamp:</strong> ${clip.startTime} - ${clip.endTime}
+                &nbsp;·&nbsp;
+                <strong>Virality Score:</strong> ${clip.viralityScore}%
+            </div>
+            <video controls playsinline preload="metadata" style="
+                width: 100%;
+                max-height: 60vh;
+                background: #000;
+                border-radius: 8px;
+                display: none;
+            "></video>
+            <div class="preview-status" style="
+                padding: 40px 15px;
+                text-align: center;
+                color: #666;
+                background: #f8f9fa;
+                border-radius: 8px;
+            ">⏳ Preparing preview...</div>
+            <div style="text-align: center; margin-top: 20px;">
+                <button class="preview-details" style="
+                    background: #6c757d;
+                    color: white;
+                    border: none;
+                    padding: 10px 20px;
+                    border-radius: 5px;
+                    cursor: pointer;
+                    margin-right: 10px;
+                ">Details</button>
+                <button class="preview-close" style="
+                    background: #007cba;
+                    color: white;
+                    border: none;
+                    padding: 10px 20px;
+                    border-radius: 5px;
+                    cursor: pointer;
+                ">Close Preview</button>
+            </div>
+        </div>
+    `;
+    
+    const video = modal.querySelector('video');
+    const status = modal.querySelector('.preview-status');
+    const close = () => {
+        // Stop the range requests for the rest of the file
+        video.pause();
+        video.removeAttribute('src');
+        video.load();
+        modal.remove();
+        document.removeEventListener('keydown', closeOnEscape);
+    };
+    const closeOnEscape = (e) => {
+        if (e.key === 'Escape') close();
+    };
+    
+    modal.querySelector('.preview-close').addEventListener('click', close);
+    modal.querySelector('.preview-details').addEventListener('click', () => {
+        close();
+        showTextPreview(clip);
+    });
+    modal.addEventListener('click', (e) => {
+        if (e.target === modal) close();
+    });
+    document.addEventListener('keydown', closeOnEscape);
+    document.body.appendChild(modal);
+    
+    fetchPreviewClipId(clip)
+        .then(clipId => {
+            if (!modal.isConnected) return;
+            video.src = `${API_BASE}/api/clips/${clipId}`;
+            video.style.display = 'block';
+            status.remove();
+            video.play().catch(() => {});
+        })
+        .catch(error => {
+            console.error('Preview error:', error);
+            status.textContent = `❌ Preview unavailable: ${error.message}`;
+        })
+        .finally(() => updateStatus('Ready'));
+}
+
 function showTextPreview(clip) {
     // Create modal for text preview
     const modal = document.createElement('div');
@@ -415,9 +557,9 @@ async function downloadVideoClip(clipId, quality = '1080') {
     };
 
     try {
-        showNotification(`🎬 Downloading ${quality}p clip... This may take a moment.`, 'info');
+        showNotification(`🎬 Queued ${quality}p clip... This may take a moment.`, 'info');
 
-        const response = await fetch(`${API_BASE}/api/download-clip`, {
+        const response = await fetch(`${API_BASE}/api/jobs/download-clip`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -429,35 +571,135 @@ async function downloadVideoClip(clipId, quality = '1080') {
             })
         });
 
-        if (!response.ok) {
-            const contentType = response.headers.get("content-type");
-            if (contentType && contentType.includes("application/json")) {
-                const errorData = await response.json();
-                throw new Error(errorData.error || 'Failed to download clip');
-            } else {
-                throw new Error('Server error occurred');
-            }
+        const job = await readJsonResponse(response, 'Failed to start download');
+        if (response.status === 429) {
+            throw new Error('Server is busy with other downloads, please try again shortly');
+        }
+
+        const finished = await pollDownloadJob(job.jobId, quality);
+        if (finished.status !== 'done') {
+            throw new Error(finished.error || `Download ${finished.status}`);
         }
 
-        // Download the file
-        const blob = await response.blob();
-        const url = URL.createObjectURL(blob);
+        // Let the browser stream the finished file straight to disk. The server adds the
+        // extension of the container it actually downloaded (mp4, webm...) to the name
+        const name = `${sanitizeFilename(clip.hookText)}_${quality}p_clip_${clip.id}`;
         const a = document.createElement('a');
-        a.href = url;
-        a.download = `${sanitizeFilename(clip.hookText)}_${quality}p_clip_${clip.id}.mp4`;
+        a.href = `${API_BASE}/api/jobs/${finished.jobId}/file?name=${encodeURIComponent(name)}`;
+        a.download = '';
         document.body.appendChild(a);
         a.click();
         document.body.removeChild(a);
-        URL.revokeObjectURL(url);
 
+        updateStatus('Ready');
         showNotification(`🎉 ${quality}p clip downloaded successfully!`, 'success');
 
     } catch (error) {
         console.error('Download error:', error);
+        updateStatus('Ready');
         showNotification(`❌ Download failed: ${error.message}`, 'error');
     }
 }
 
+async function readJsonResponse(response, fallbackMessage) {
+    const contentType = response.headers.get("content-type");
+    if (!contentType || !contentType.includes("application/json")) {
+        throw new Error('Server error occurred');
+    }
+    const data = await response.json();
+    if (!response.ok && response.status !== 429) {
+        throw new Error(data.error || fallbackMessage);
+    }
+    return data;
+}
+
+// Poll a download job until it finishes, fails or is cancelled
+async function pollDownloadJob(jobId, quality, intervalMs = 1000) {
+    appState.downloadJobs[jobId] = true;
+    try {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+            const response = await fetch(`${API_BASE}/api/jobs/${jobId}`);
+            const job = await readJsonResponse(response, 'Lost track of download');
+
+            if (job.status === 'queued') {
+                updateStatus(`${quality}p clip queued...`);
+            } else if (job.status === 'running') {
+                updateStatus(`Downloading ${quality}p clip: ${Math.round(job.progress)}%`);
+            } else {
+                return job;
+            }
+        }
+    } finally {
+        delete appState.downloadJobs[jobId];
+    }
+}
+
+function cancelDownloadJobs() {
+    Object.keys(appState.downloadJobs).forEach(jobId => {
+        fetch(`${API_BASE}/api/jobs/${jobId}`, { method: 'DELETE', keepalive: true }).catch(() => {});
+    });
+}
+
+// Download every clip from the current analysis as one ZIP
+function downloadAllClips(quality = '720') {
+    const clips = appState.clips.filter(c => c.videoUrl);
+    if (!clips.length) {
+        showNotification('❌ No video URL available for download', 'error');
+        return;
+    }
+
+    // A form post into a hidden frame lets the browser stream the ZIP straight to disk
+    // (fetch + blob() would hold all of it in memory). Only an error page loads in the frame.
+    let frame = document.getElementById('bulkDownloadFrame');
+    if (!frame) {
+        frame = document.createElement('iframe');
+        frame.id = frame.name = 'bulkDownloadFrame';
+        frame.style.display = 'none';
+        frame.addEventListener('load', () => {
+            let message = 'Failed to download clips';
+            try {
+                const text = frame.contentDocument.body.textContent.trim();
+                if (!text) return;  // the blank page the frame starts with
+                try {
+                    message = JSON.parse(text).error || message;
+                } catch (error) {
+                    message = text.slice(0, 200);
+                }
+            } catch (error) {
+                // API on another origin: its error page can't be read
+            }
+            updateStatus('Ready');
+            showNotification(`❌ Download failed: ${message}`, 'error');
+        });
+        document.body.appendChild(frame);
+    }
+
+    const form = document.createElement('form');
+    form.method = 'POST';
+    form.action = `${API_BASE}/api/download-clips`;
+    form.target = frame.name;
+    const payload = document.createElement('input');
+    payload.type = 'hidden';
+    payload.name = 'payload';
+    payload.value = JSON.stringify({
+        videoUrl: clips[0].videoUrl,
+        quality: `bestvideo[height<=${quality}]+bestaudio/best[height<=${quality}]`,
+        clips: clips.map(clip => ({
+            startTime: clip.startTime,
+            endTime: clip.endTime,
+            hookText: clip.hookText
+        }))
+    });
+    form.appendChild(payload);
+    document.body.appendChild(form);
+    form.submit();
+    document.body.removeChild(form);
+
+    updateStatus('Ready');
+    showNotification(`📦 Preparing ${clips.length} clips... The ZIP download starts once the video is fetched.`, 'info');
+}
+
 // Download text info about clip
 function downloadClip(clipId) {
     const clip = appState.clips.find(c => c.id == clipId);
@@ -681,13 +923,17 @@ function createClipCard(clip, isHighlight = false) {
     return card;
 }
 
-function renderClips(clips) {
+function renderClips(clips, append = false) {
     if (!elements.clipsContainer || !elements.highlightsGrid) return;
     
-    elements.clipsContainer.innerHTML = '';
+    if (!append) {
+        elements.clipsContainer.innerHTML = '';
+    } else {
+        elements.clipsContainer.querySelector('.empty-state')?.remove();
+    }
     elements.highlightsGrid.innerHTML = '';
 
-    if (clips.length === 0) {
+    if (!append && clips.length === 0) {
         elements.clipsContainer.innerHTML = `
             <div class="empty-state">
                 <i class="fas fa-search" style="font-size: 3rem; color: #ccc; margin-bottom: 1rem;"></i>
@@ -698,8 +944,9 @@ function renderClips(clips) {
         return;
     }
 
-    // Render top 5 highlights
-    const highlights = clips.slice(0, 5);
+    // Render top 5 highlights (out of every clip received so far when appending)
+    const shown = append ? [...appState.clips].sort((a, b) => b.viralityScore - a.viralityScore) : clips;
+    const highlights = shown.slice(0, 5);
     highlights.forEach(clip => {
         const card = createClipCard(clip, true);
         elements.highlightsGrid.appendChild(card);
@@ -711,7 +958,14 @@ function renderClips(clips) {
         elements.clipsContainer.appendChild(card);
     });
 
-    updateSummaryStats(clips);
+    updateSummaryStats(shown);
+    updateDownloadAllButton();
+}
+
+function updateDownloadAllButton() {
+    if (!elements.downloadAllBtn) return;
+    const available = appState.canDownloadClips && appState.clips.some(c => c.videoUrl);
+    elements.downloadAllBtn.classList.toggle('hidden', !available);
 }
 
 function updateSummaryStats(clips) {
@@ -772,6 +1026,82 @@ function applyFilters() {
 }
 
 // Analysis Functions
+
+// Read a text/event-stream response, calling onEvent(event, data) for each event
+async function readEventStream(response, onEvent, fallbackMessage) {
+    const contentType = response.headers.get("content-type");
+    if (!contentType || !contentType.includes("text/event-stream")) {
+        await readJsonResponse(response, fallbackMessage);
+        throw new Error(fallbackMessage);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// Stream an analysis: cards appear as clips arrive, progress comes from the server
+async function runStreamingAnalysis(response, fallbackMessage) {
+    let summary = null;
+    await readEventStream(response, (event, data) => {
+        switch (event) {
+            case 'progress':
+                if (data.stage === 'scoring') {
+                    const percentage = 20 + Math.round(75 * data.scored / data.total);
+                    const text = `Scoring segments ${data.scored} of ${data.total}...`;
+                    updateProgress(3, percentage, text);
+                    updateStatus(text);
+                } else {
+                    updateProgress(2, 20, data.message);
+                }
+                break;
+            case 'clip': {
+                const first = appState.clips.length === 0;
+                appState.clips.push(data);
+                if (first) showSection(elements.resultsSection);
+                renderClips([data], !first);
+                break;
+            }
+            case 'summary':
+                summary = data;
+                break;
+            case 'error':
+                throw new Error(data.error || fallbackMessage);
+        }
+    }, fallbackMessage);
+
+    if (!summary) {
+        throw new Error(fallbackMessage);
+    }
+    appState.analysisComplete = true;
+    appState.canDownloadClips = summary.canDownloadClips || false;
+    showSection(elements.resultsSection);
+    if (appState.clips.length) {
+        applyFilters();
+    } else {
+        renderClips([]);
+    }
+    return summary;
+}
+
 async function analyzeUrl() {
     if (appState.isAnalyzing) return;
     
@@ -788,8 +1118,10 @@ async function analyzeUrl() {
         return;
     }
 
+    appState.reset();
     appState.isAnalyzing = true;
     appState.currentVideoUrl = videoUrl;
+    appState.canDownloadClips = true;
 
     try {
         updateStatus('Analyzing...');
@@ -797,51 +1129,19 @@ async function analyzeUrl() {
 
         updateProgress(1, 10, 'Connecting to YouTube API...');
 
-        const response = await fetch(`${API_BASE}/api/analyze`, {
+        const response = await fetch(`${API_BASE}/api/analyze/stream`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ videoUrl, platform })
         });
 
-        updateProgress(2, 30, 'Extracting transcript...');
-
-        const contentType = response.headers.get("content-type");
-        if (!contentType || !contentType.includes("application/json")) {
-            const text = await response.text();
-            throw new Error('Server returned non-JSON response');
-        }
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'Analysis failed');
-        }
-
-        updateProgress(3, 60, 'Analyzing content with AI...');
+        await runStreamingAnalysis(response, 'Analysis failed');
+        updateStatus('Analysis Complete');
 
-        const data = await response.json();
-
-        updateProgress(4, 90, 'Calculating virality scores...');
-
-        if (data.success && data.clips) {
-            appState.clips = data.clips;
-            appState.analysisComplete = true;
-            appState.canDownloadClips = data.canDownloadClips || false;
-
-            updateProgress(4, 100, 'Analysis complete!');
-
-            setTimeout(() => {
-                showSection(elements.resultsSection);
-                renderClips(data.clips);
-                updateStatus('Analysis Complete');
-                
-                const downloadMsg = appState.canDownloadClips ? 
-                    ' Click any quality button to download video clips directly!' : 
-                    ' Use FFmpeg commands to extract clips.';
-                showNotification(`✅ Found ${data.clips.length} viral clips!${downloadMsg}`, 'success');
-            }, 1000);
-        } else {
-            throw new Error(data.error || 'Analysis failed');
-        }
+        const downloadMsg = appState.canDownloadClips ? 
+            ' Click any quality button to download video clips directly!' : 
+            ' Use FFmpeg commands to extract clips.';
+        showNotification(`✅ Found ${appState.clips.length} viral clips!${downloadMsg}`, 'success');
 
     } catch (error) {
         console.error('Analysis error:', error);
@@ -862,13 +1162,14 @@ async function analyzeSrt() {
         return;
     }
 
+    appState.reset();
     appState.isAnalyzing = true;
 
     try {
         updateStatus('Analyzing SRT file...');
         showSection(elements.progressSection);
 
-        updateProgress(1, 20, 'Uploading SRT file...');
+        updateProgress(1, 10, 'Uploading SRT file...');
 
         const formData = new FormData();
         formData.append('srtFile', srtFileInput.files[0]);
@@ -876,52 +1177,22 @@ async function analyzeSrt() {
         // Add video URL if provided
         if (videoUrl && isValidYouTubeUrl(videoUrl)) {
             formData.append('videoUrl', videoUrl);
-            updateProgress(1, 25, 'Uploading SRT file with video URL...');
+            appState.canDownloadClips = true;
+            updateProgress(1, 15, 'Uploading SRT file with video URL...');
         }
 
-        updateProgress(2, 40, 'Parsing subtitle content...');
-
-        const response = await fetch(`${API_BASE}/api/analyze-srt`, {
+        const response = await fetch(`${API_BASE}/api/analyze-srt/stream`, {
             method: 'POST',
             body: formData
         });
 
-        updateProgress(3, 70, 'Analyzing content with AI...');
-
-        const contentType = response.headers.get("content-type");
-        if (!contentType || !contentType.includes("application/json")) {
-            throw new Error('Server returned non-JSON response');
-        }
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'SRT analysis failed');
-        }
+        const summary = await runStreamingAnalysis(response, 'SRT analysis failed');
+        updateStatus('SRT Analysis Complete');
 
-        const data = await response.json();
-
-        updateProgress(4, 90, 'Calculating virality scores...');
-
-        if (data.success && data.clips) {
-            appState.clips = data.clips;
-            appState.analysisComplete = true;
-            appState.canDownloadClips = data.canDownloadClips || false;
-
-            updateProgress(4, 100, 'Analysis complete!');
-
-            setTimeout(() => {
-                showSection(elements.resultsSection);
-                renderClips(data.clips);
-                updateStatus('SRT Analysis Complete');
-                
-                const videoMessage = data.canDownloadClips ? 
-                    ' Video clips can be downloaded directly!' : 
-                    ' Add a YouTube URL to enable direct video downloads.';
-                showNotification(`✅ Found ${data.clips.length} viral clips!${videoMessage}`, 'success');
-            }, 1000);
-        } else {
-            throw new Error(data.error || 'SRT analysis failed');
-        }
+        const videoMessage = summary.canDownloadClips ? 
+            ' Video clips can be downloaded directly!' : 
+            ' Add a YouTube URL to enable direct video downloads.';
+        showNotification(`✅ Found ${appState.clips.length} viral clips!${videoMessage}`, 'success');
 
     } catch (error) {
         console.error('SRT Analysis error:', error);
@@ -1044,6 +1315,10 @@ function initializeEventListeners() {
         });
     }
 
+    if (elements.downloadAllBtn) {
+        elements.downloadAllBtn.addEventListener('click', () => downloadAllClips('720'));
+    }
+
     // Retry button
     if (elements.retryBtn) {
         elements.retryBtn.addEventListener('click', () => {
@@ -1143,76 +1418,6 @@ const cssAnimations = `
     margin-bottom: 8px;
 }
 
-.btn {
-    border: none;
-    padding: 8px 12px;
-    border-radius: 4px;
-    cursor: pointer;
-    font-size: 12px;
-    transition: all 0.2s ease;
-    text-decoration: none;
-    display: inline-block;
-}
-
-.btn-primary {
-    background: #007cba;
-    color: white;
-}
-
-.btn-primary:hover {
-    background: #005a8b;
-}
-
-.btn-secondary {
-    background: #6c757d;
-    color: white;
-}
-
-.btn-secondary:hover {
-    background: #545b62;
-}
-
-.btn-success {
-    background: #28a745;
-    color: white;
-}
-
-.btn-success:hover {
-    background: #218838;
-}
-
-.btn-danger {
-    background: #dc3545;
-    color: white;
-}
-
-.btn-danger:hover {
-    background: #c82333;
-}
-
-.btn-warning {
-    background: #fd7e14;
-    color: white;
-}
-
-.btn-warning:hover {
-    background: #e8690b;
-}
-
-.btn-info {
-    background: #17a2b8;
-    color: white;
-}
-
-.btn-info:hover {
-    background: #138496;
-}
-
-.btn-small {
-    padding: 6px 10px;
-    font-size: 11px;
-}
-
 .video-download-section {
     margin: 15px 0;
     padding: 10px;
@@ -1256,6 +1461,9 @@ const styleSheet = document.createElement('style');
 styleSheet.textContent = cssAnimations;
 document.head.appendChild(styleSheet);
 
+// Don't leave downloads running on the server after the page goes away
+window.addEventListener('pagehide', cancelDownloadJobs);
+
 // Start the application when DOM is loaded
 if (document.readyState === 'loading') {
     document.addEventListener('DOMContentLoaded', initializeApp);
@@ -0,0 +1,76 @@
+import io
+import re
+
+# HH:MM:SS,mmm / MM:SS.mmm (SRT uses a comma, WebVTT a dot; VTT may omit hours)
+_TS = r'(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:[,.](\d{1,3}))?'
+TIMESTAMP_RE = re.compile(rf'^{_TS}$')
+# Both timestamps of a cue line in one match; VTT cue settings may follow
+CUE_RE = re.compile(rf'^\s*{_TS}\s+-->\s+{_TS}(?:\s|$)')
+TAG_RE = re.compile(r'<[^>]+>')
+
+MIN_TEXT_LENGTH = 6  # Only include meaningful text
+
+
+def parse_timestamp(value):
+    """Convert an SRT/VTT timestamp to seconds, keeping milliseconds; None if malformed"""
+    match = TIMESTAMP_RE.match(value.strip())
+    if not match:
+        return None
+    return _to_seconds(*match.groups())
+
+
+def _to_seconds(hours, minutes, seconds, millis):
+    total = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+    if millis:
+        total += int(millis.ljust(3, '0')) / 1000
+    return total
+
+
+def _make_cue(start, end, text_lines):
+    text = ' '.join(text_lines)
+    if '<' in text:
+        text = TAG_RE.sub('', text).strip()
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    return {'start': start, 'end': end, 'text': text}
+
+
+def iter_subtitles(lines):
+    """Yield {'start', 'end', 'text'} cues from SRT or WebVTT lines, one block at a time"""
+    start = end = None
+    text_lines = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if text_lines:
+                cue = _make_cue(start, end, text_lines)
+                if cue:
+                    yield cue
+                text_lines = []
+            start = None
+        elif start is not None:
+            text_lines.append(line)
+        elif '-->' in line:
+            # Index lines, WEBVTT headers and NOTE/STYLE blocks have no arrow and are skipped
+            match = CUE_RE.match(line)
+            if match:
+                groups = match.groups()
+                start = _to_seconds(*groups[:4])
+                end = _to_seconds(*groups[4:])
+
+    if start is not None and text_lines:
+        cue = _make_cue(start, end, text_lines)
+        if cue:
+            yield cue
+
+
+def iter_subtitle_stream(stream, encoding='utf-8'):
+    """Yield cues from a binary file-like object without reading it all into memory"""
+    text = io.TextIOWrapper(stream, encoding=encoding + '-sig' if encoding == 'utf-8' else encoding,
+                            errors='replace', newline=None)
+    try:
+        yield from iter_subtitles(text)
+    finally:
+        # Don't let the wrapper close the caller's stream
+        text.detach()
@@ -0,0 +1,80 @@
+import html
+import json
+import re
+import xml.etree.ElementTree as ElementTree
+
+YOUTUBE_BASE_URL = "https://www.youtube.com"
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+class TranscriptUnavailable(Exception):
+    """Raised when a video has no usable caption track"""
+
+
+def parse_caption_tracks(page):
+    """Caption tracks listed in a watch page's player response"""
+    if '"captions":' not in page:
+        raise TranscriptUnavailable("No captions available for this video")
+    captions = page.split('"captions":', 1)[1].split(',"videoDetails', 1)[0]
+    try:
+        renderer = json.loads(captions)["playerCaptionsTracklistRenderer"]
+    except (ValueError, KeyError) as e:
+        raise TranscriptUnavailable(f"Unreadable caption list: {e}")
+    tracks = renderer.get("captionTracks") or []
+    if not tracks:
+        raise TranscriptUnavailable("No transcript found for this video")
+    return tracks
+
+
+def pick_track(tracks, languages=("en",)):
+    """Prefer a manual track in one of the languages, then a generated one, then any"""
+    def matches(track):
+        return track.get("languageCode", "").split("-")[0] in languages
+
+    for track in tracks:
+        if matches(track) and track.get("kind") != "asr":
+            return track
+    for track in tracks:
+        if matches(track):
+            return track
+    return tracks[0]
+
+
+def parse_timedtext(document):
+    """Timed-text XML to [{'text', 'start', 'duration'}], like youtube-transcript-api"""
+    transcript = []
+    for element in ElementTree.fromstring(document):
+        if element.tag != "text" or not element.text:
+            continue
+        text = TAG_RE.sub('', html.unescape(element.text)).strip()
+        if text:
+            transcript.append({
+                "text": text,
+                "start": float(element.attrib.get("start", 0)),
+                "duration": float(element.attrib.get("dur", 0))
+            })
+    return transcript
+
+
+def watch_url(video_id, base_url=None):
+    return f"{base_url or YOUTUBE_BASE_URL}/watch?v={video_id}"
+
+
+def fetch_transcript(session, video_id, base_url=None, timeout=15):
+    """Fetch a transcript over a requests session"""
+    page = session.get(watch_url(video_id, base_url), timeout=timeout)
+    page.raise_for_status()
+    track = pick_track(parse_caption_tracks(page.text))
+    document = session.get(html.unescape(track["baseUrl"]), timeout=timeout)
+    document.raise_for_status()
+    return parse_timedtext(document.text)
+
+
+async def fetch_transcript_async(client, video_id, base_url=None):
+    """Fetch a transcript over an httpx.AsyncClient without blocking the event loop"""
+    page = await client.get(watch_url(video_id, base_url))
+    page.raise_for_status()
+    track = pick_track(parse_caption_tracks(page.text))
+    document = await client.get(html.unescape(track["baseUrl"]))
+    document.raise_for_status()
+    return parse_timedtext(document.text)